@@ -1,23 +1,66 @@
 
+import os
 import asyncio
 import logging
 
 from pkg.big_query.services.table_search import BQSearchTable
+from pkg.big_query.services.hybrid_table_search import HybridBQSearchTable
+from pkg.big_query.services.sharded_table_search import ShardedBQSearchTable
 from pkg.big_query.services.table_search_test import load_sample_data
+from pkg.big_query.services.catalogue_ingestion import ingest_catalogue
 from pkg.agentic.service.agent_interface import BQAgenticDataCatalogueInterface
+from pkg.agentic.service.http_server import BQCatalogueHTTPServer
+from domains.utils.stage_metrics import stage_metrics
+from domains.values.ranking_mode import RankingMode
+from domains.values.retrieval_mode import RetrievalMode
+from domains.values.shard_partition import ShardPartition
 
 
-async def demo_bq_agentic_workflow():
+def build_search_engine(index_snapshot: str = None, catalogue_tables: str = None,
+                        catalogue_columns: str = None, compact_storage: bool = False,
+                        ranking: str = "tf_idf", retrieval: str = "keyword",
+                        shards: int = 1, shard_partition: str = "table_name",
+                        recency_weight: float = 0.0) -> BQSearchTable:
+    retrieval = RetrievalMode(retrieval)
+    if index_snapshot and os.path.exists(index_snapshot):
+        print(f"Opening index snapshot {index_snapshot}...")
+        if retrieval is RetrievalMode.KEYWORD:
+            return BQSearchTable.load_snapshot(index_snapshot, compact_storage=compact_storage)
+        search_engine = HybridBQSearchTable.load_snapshot(index_snapshot, compact_storage=compact_storage)
+        search_engine.retrieval = retrieval
+        return search_engine
     
-    # Initialize the search engine with sample data
-    search_engine = BQSearchTable()
-    sample_tables = load_sample_data()
+    if shards > 1:
+        search_engine = ShardedBQSearchTable(shards, shard_partition, ranking=ranking, compact_storage=compact_storage,
+                                             recency_weight=recency_weight)
+    elif retrieval is RetrievalMode.KEYWORD:
+        search_engine = BQSearchTable(compact_storage=compact_storage, ranking=ranking, recency_weight=recency_weight)
+    else:
+        search_engine = HybridBQSearchTable(compact_storage=compact_storage, ranking=ranking,
+                                            recency_weight=recency_weight, retrieval=retrieval)
+    
+    if catalogue_tables or catalogue_columns:
+        print("Streaming catalogue export...")
+        ingested = ingest_catalogue(search_engine, catalogue_tables, catalogue_columns)
+        print(f"Ingested {ingested} tables")
+    else:
+        sample_tables = load_sample_data()
+        
+        print(f"Loading {len(sample_tables)} sample tables...")
+        search_engine.add_tables(sample_tables)
     
-    for table in sample_tables:
-        search_engine.add_table(table)
+    if index_snapshot:
+        print(f"Saving index snapshot {index_snapshot}...")
+        search_engine.save_snapshot(index_snapshot)
+    
+    return search_engine
+
+
+async def demo_bq_agentic_workflow(search_engine: BQSearchTable, max_workers: int = None,
+                                   executor_kind: str = "thread"):
     
     # Initialize the interface
-    interface = BQAgenticDataCatalogueInterface(search_engine)
+    interface = BQAgenticDataCatalogueInterface(search_engine, max_workers, executor_kind)
     
     print("🤖 BigQuery Agentic AI Data Catalogue Demo")
     print("=" * 50)
@@ -46,6 +89,8 @@ async def demo_bq_agentic_workflow():
     diagnostics = interface.get_agent_diagnostics()
     for key, value in diagnostics.items():
         print(f"  {key}: {value}")
+    
+    await interface.orchestrator.shutdown()
 
 
 # =====================================================
@@ -59,13 +104,45 @@ def main():
     
     parser = argparse.ArgumentParser(description='BigQuery Agentic AI Data Catalogue')
     parser.add_argument('mode', nargs='?', default='cli', 
-                       choices=['cli', 'demo'], 
-                       help='Run mode: cli (interactive) or demo (demonstration)')
+                       choices=['cli', 'demo', 'serve'], 
+                       help='Run mode: cli (interactive), demo (demonstration) or serve (HTTP/JSON API)')
+    parser.add_argument('--index-snapshot', default=None,
+                       help='Index snapshot file: opened if it exists, written after loading otherwise')
+    parser.add_argument('--catalogue-tables', default=None,
+                       help='INFORMATION_SCHEMA.TABLES export (JSONL/CSV, optionally .gz)')
+    parser.add_argument('--catalogue-columns', default=None,
+                       help='INFORMATION_SCHEMA.COLUMN_FIELD_PATHS export (JSONL/CSV, optionally .gz)')
+    parser.add_argument('--compact-storage', action='store_true',
+                       help='Keep table metadata in a compact columnar store')
+    parser.add_argument('--ranking', default='tf_idf', choices=[mode.value for mode in RankingMode],
+                       help='Relevance ranking: tf_idf, bm25 or bm25f with per field weights (snapshots keep their own)')
+    parser.add_argument('--recency-weight', type=float, default=0.0,
+                       help='Score boost of a table modified today, halving every 30 days (snapshots keep their own)')
+    parser.add_argument('--retrieval', default='keyword', choices=[mode.value for mode in RetrievalMode],
+                       help='Retrieval: keyword index, dense vectors, or both fused (snapshots then need their .vectors file)')
+    parser.add_argument('--shards', type=int, default=1,
+                       help='Partition the keyword index over this many shard processes (no snapshots)')
+    parser.add_argument('--shard-partition', default='table_name', choices=[partition.value for partition in ShardPartition],
+                       help='Assign tables to shards by hash of the full table name or of the dataset')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Concurrent workflows and search executor workers (default: CPU count)')
+    parser.add_argument('--executor', default='thread', choices=['thread', 'process'],
+                       help='Run searches in a thread pool or a process pool')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind in serve mode')
+    parser.add_argument('--port', type=int, default=8080, help='Port to bind in serve mode')
+    parser.add_argument('--request-timeout', type=float, default=30.0,
+                       help='Seconds allowed to read and answer one request in serve mode')
+    parser.add_argument('--keep-alive-timeout', type=float, default=15.0,
+                       help='Seconds an idle keep-alive connection is held open in serve mode')
+    parser.add_argument('--metrics-sample-rate', type=float, default=1.0,
+                       help='Fraction of pipeline stages timed for latency histograms (0 disables)')
     parser.add_argument('--log-level', default='INFO', 
                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
                        help='Logging level')
     
     args = parser.parse_args()
+    if args.shards > 1 and (args.index_snapshot or args.retrieval != 'keyword' or args.executor == 'process'):
+        parser.error('--shards needs keyword retrieval, the thread executor and no --index-snapshot')
     
     # Configure logging
     logging.basicConfig(
@@ -77,21 +154,26 @@ def main():
     print(f"Mode: {args.mode}")
     print(f"Log Level: {args.log_level}")
     
-    # Initialize search engine with sample data
-    search_engine = BQSearchTable()
-    sample_tables = load_sample_data()
+    stage_metrics.sample_rate = args.metrics_sample_rate
     
-    print(f"Loading {len(sample_tables)} sample tables...")
-    for table in sample_tables:
-        search_engine.add_table(table)
+    # Initialize search engine from the snapshot, a catalogue export or the sample data
+    search_engine = build_search_engine(args.index_snapshot, args.catalogue_tables,
+                                        args.catalogue_columns, args.compact_storage, args.ranking,
+                                        args.retrieval, args.shards, args.shard_partition, args.recency_weight)
     
     # Initialize interface
-    interface = BQAgenticDataCatalogueInterface(search_engine)
+    interface = BQAgenticDataCatalogueInterface(search_engine, args.workers, args.executor)
     
     if args.mode == 'demo':
         # Run demo
         print("Running demonstration mode...")
-        asyncio.run(demo_bq_agentic_workflow())
+        asyncio.run(demo_bq_agentic_workflow(search_engine, args.workers, args.executor))
+    elif args.mode == 'serve':
+        # Serve chat, raw search and diagnostics over HTTP until SIGINT/SIGTERM
+        server = BQCatalogueHTTPServer(interface, args.host, args.port,
+                                       request_timeout=args.request_timeout,
+                                       keep_alive_timeout=args.keep_alive_timeout)
+        asyncio.run(server.serve_forever())
     else:
         # Run interactive CLI
         print("Starting interactive CLI mode...")
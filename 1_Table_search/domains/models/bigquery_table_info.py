@@ -4,7 +4,7 @@ from typing import List, Dict
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class BQTableInfo:
     dataset: str
     table_name: str
@@ -0,0 +1,125 @@
+
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from domains.models.bigquery_table_info import BQTableInfo
+
+
+class LazyRecord(Mapping):
+    """Read-only mapping whose fields are computed on first access and
+    then cached. Subclasses name their fields in FIELDS, each computed by
+    the method get_<field>. Copies, pickles and reprs are plain dicts
+    holding every field."""
+
+    __slots__ = ('cache',)
+    FIELDS: Tuple[str, ...] = ()
+    getters: Dict[str, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.getters = {name: getattr(cls, f"get_{name}") for name in cls.FIELDS}
+
+    def __getitem__(self, name: str) -> Any:
+        cache = self.cache
+        if cache is not None and name in cache:
+            return cache[name]
+
+        getter = self.getters.get(name)
+        if getter is None:
+            return self.get_missing(name)
+
+        if cache is None:
+            cache = self.cache = {}
+        value = cache[name] = getter(self)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __contains__(self, name: object) -> bool:
+        # membership never computes a field
+        return name in self.getters
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+    def get_missing(self, name: str) -> Any:
+        raise KeyError(name)
+
+
+    def copy(self) -> Dict:
+        return dict(self)
+
+
+    def materialize(self, *names: str):
+        # computes fields now, e.g. on a worker thread, rather than on the
+        # thread that first reads them
+        for name in names:
+            self[name]
+
+        return self
+
+
+class TableSearchResult(LazyRecord):
+    """A search hit read from its table on access, so hits that are never
+    rendered cost one small object. The modified_day and usage_code
+    attributes carry the table's index time attributes (see
+    table_attributes) without being result fields."""
+
+    __slots__ = ('table', 'relevance_score', 'query_keywords', 'modified_day', 'usage_code')
+    FIELDS = ('table_name', 'dataset', 'description', 'columns', 'tags', 'last_modified', 'row_count',
+              'relevance_score', 'matched_keywords')
+
+    def __init__(self, table: BQTableInfo, relevance_score: float, query_keywords: List[str],
+        modified_day: int, usage_code: int):
+        self.cache: Optional[Dict] = None
+        self.table = table
+        self.relevance_score = relevance_score
+        self.query_keywords = query_keywords
+        self.modified_day = modified_day
+        self.usage_code = usage_code
+
+
+    def get_table_name(self) -> str:
+        return self.table.get_full_name()
+
+
+    def get_dataset(self) -> str:
+        return self.table.dataset
+
+
+    def get_description(self) -> str:
+        return self.table.description
+
+
+    def get_columns(self) -> int:
+        return len(self.table.columns)
+
+
+    def get_tags(self) -> List[str]:
+        return self.table.tags
+
+
+    def get_last_modified(self) -> str:
+        return self.table.last_modified
+
+
+    def get_row_count(self) -> int:
+        return self.table.row_count
+
+
+    def get_relevance_score(self) -> float:
+        return self.relevance_score
+
+
+    def get_matched_keywords(self) -> List[str]:
+        description = self.table.description.lower()
+        table_name = self.table.table_name.lower()
+        return [kw for kw in self.query_keywords if kw in description or kw in table_name]
@@ -7,17 +7,21 @@ import asyncio
 from domains.values.agent_status import AgentStatus
 from domains.models.agent_task import AgentTask
 from domains.models.agent_message import AgentMessage
+from domains.utils.stage_metrics import stage_metrics
 
 
 class BaseAgent(ABC):
     
-    def __init__(self, name: str, capabilities: List[str]):
+    def __init__(self, name: str, capabilities: List[str], max_concurrency: int = 4, queue_size: int = 100):
         self.name = name
         self.capabilities = capabilities
         self.status = AgentStatus.IDLE
-        self.message_queue = asyncio.Queue()
+        self.message_queue = asyncio.Queue(maxsize=queue_size)
         self.task_history: List[AgentTask] = []
         self.logger = logging.getLogger(f"Agent.{name}")
+        self.max_concurrency = max_concurrency
+        self.concurrency = asyncio.Semaphore(max_concurrency)
+        self.active_tasks = 0
 
     
     @abstractmethod
@@ -25,6 +29,39 @@ class BaseAgent(ABC):
         pass
     
 
+    async def run_task(self, task: AgentTask) -> AgentTask:
+        # at most max_concurrency tasks of this agent run at once, the rest
+        # wait here; status reflects whether any task is still in flight
+        async with self.concurrency:
+            self.active_tasks += 1
+            try:
+                with stage_metrics.span(f"agent.{self.name}"):
+                    return await self.process_task(task)
+            finally:
+                self.active_tasks -= 1
+                self.status = AgentStatus.WORKING if self.active_tasks else AgentStatus.IDLE
+    
+
+    async def receive_message(self, message: AgentMessage):
+        # blocks the sender while the queue is full
+        await self.message_queue.put(message)
+    
+
+    async def consume_messages(self):
+        while True:
+            message = await self.message_queue.get()
+            try:
+                await self.handle_message(message)
+            except Exception as e:
+                self.logger.error(f"Message {message.id} from {message.sender} failed: {e}")
+            finally:
+                self.message_queue.task_done()
+    
+
+    async def handle_message(self, message: AgentMessage):
+        self.logger.debug(f"Received {message.message_type} message from {message.sender}")
+    
+
     async def send_message(self, recipient: str, message_type: str, content: Any, orchestrator):
         message = AgentMessage(
             sender=self.name,
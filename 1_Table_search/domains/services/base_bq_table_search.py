@@ -1,29 +1,33 @@
 
 
-import re
-from typing import List, Dict, Any
+from array import array
+from functools import partial
+from typing import List, Dict, Optional
 from collections import defaultdict
 from abc import ABC, abstractmethod
 
 from domains.models.bigquery_table_info import BQTableInfo
-from domains.values.constant.common_stop_words import STOP_WORDS
+from domains.utils.tokenizer import Tokenizer
 
 class BaseBQSearchTable(ABC): 
-    def __init__(self):
+    def __init__(self, tokenizer: Optional[Tokenizer] = None):
         self.tables: List[BQTableInfo] = []
-        self.tables_keywords: list[Any] = []
-        self.keyword_index: Dict[str, List[int]] = defaultdict(list)
-        self.stop_words = STOP_WORDS
+        # keyword -> sorted table indexes, each table stored at most once,
+        # with the matching term frequencies kept in a parallel array
+        self.keyword_index: Dict[str, array] = defaultdict(partial(array, 'I'))
+        self.term_frequencies: Dict[str, array] = defaultdict(partial(array, 'I'))
+        self.document_frequency: Dict[str, int] = defaultdict(int)
+        self.doc_lengths = array('I')
+        # the same tokenizer must serve indexing and queries
+        self.tokenizer = tokenizer or Tokenizer()
 
     
-    def extract_keywords(self, text: str):
-        if not text:
-            return []
-        
-        words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-        self.tables_keywords = [word for word in words if word not in self.stop_words and len(word) > 2]
-        
-        return self.tables_keywords
+    def extract_keywords(self, text: str) -> List[str]:
+        return self.tokenizer.tokenize(text)
+
+    
+    def extract_query_keywords(self, query: str) -> List[str]:
+        return self.tokenizer.tokenize_query(query)
 
     
     @abstractmethod
@@ -37,6 +41,6 @@ class BaseBQSearchTable(ABC):
     
 
     @abstractmethod
-    def search(self, query: str, limit: int = 10) -> List[Dict]:
+    def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
         pass
 
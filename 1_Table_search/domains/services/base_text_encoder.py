@@ -0,0 +1,26 @@
+
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+import numpy as np
+
+
+class BaseTextEncoder(ABC):
+    """Local text encoder for dense retrieval.
+
+    encode() returns one L2-normalized float32 row of length dimension per
+    text, so inner products are cosine similarities. get_config() must
+    identify the encoder well enough to re-create it for a persisted index.
+    """
+
+    dimension: int
+
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        pass
+
+
+    @abstractmethod
+    def get_config(self) -> Dict:
+        pass
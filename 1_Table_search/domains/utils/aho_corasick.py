@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Any, Dict, Hashable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher.
+
+    Patterns are compiled into a trie with failure links, so one pass over
+    the text reports every occurrence of every pattern, whatever the number
+    of patterns. Each pattern carries a list of values (the same pattern may
+    be registered under several values).
+    """
+
+    def __init__(self):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.failure: List[int] = [0]
+        self.outputs: List[List[Tuple[str, Any]]] = [[]]
+        self.built = True
+
+    def add(self, pattern: str, value: Hashable):
+        if not pattern:
+            raise ValueError("Empty patterns cannot be matched")
+
+        state = 0
+        for char in pattern:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][char] = next_state
+                self.transitions.append({})
+                self.failure.append(0)
+                self.outputs.append([])
+            state = next_state
+
+        if (pattern, value) not in self.outputs[state]:
+            self.outputs[state].append((pattern, value))
+        self.built = False
+
+    def build(self):
+        # breadth first, so a state's failure target is final before its
+        # children are linked; outputs of the failure chain are merged in
+        queue = deque(self.transitions[0].values())
+        for state in queue:
+            self.failure[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                fallback = self.failure[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.failure[fallback]
+                target = self.transitions[fallback].get(char, 0)
+                self.failure[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + [
+                    output for output in self.outputs[self.failure[next_state]]
+                    if output not in self.outputs[next_state]
+                ]
+                queue.append(next_state)
+
+        self.built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, Any]]:
+        """Yield (start, pattern, value) for every occurrence in text."""
+        if not self.built:
+            self.build()
+
+        transitions, failure, outputs = self.transitions, self.failure, self.outputs
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in transitions[state]:
+                state = failure[state]
+            state = transitions[state].get(char, 0)
+            for pattern, value in outputs[state]:
+                yield position - len(pattern) + 1, pattern, value
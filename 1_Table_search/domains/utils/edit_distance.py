@@ -0,0 +1,56 @@
+from typing import Optional
+
+
+def bounded_edit_distance(source: str, target: str, max_distance: int) -> Optional[int]:
+    """Edit distance counting insertions, deletions, substitutions and
+    adjacent transpositions (optimal string alignment), or None when it is
+    above max_distance.
+
+    Only the band of max_distance cells around the diagonal is filled and
+    the walk stops as soon as a whole row is out of bounds.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return None
+    if source == target:
+        return 0
+
+    # a common prefix or suffix never changes the distance
+    prefix = 0
+    while prefix < len(source) and prefix < len(target) and source[prefix] == target[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < len(source) - prefix and suffix < len(target) - prefix and source[-1 - suffix] == target[-1 - suffix]:
+        suffix += 1
+    source, target = source[prefix:len(source) - suffix], target[prefix:len(target) - suffix]
+
+    out_of_bounds = max_distance + 1
+    target_length = len(target)
+    before_previous = None
+    previous = [column if column <= max_distance else out_of_bounds for column in range(target_length + 1)]
+    for row in range(1, len(source) + 1):
+        current = [out_of_bounds] * (target_length + 1)
+        if row <= max_distance:
+            current[0] = row
+        row_minimum = current[0]
+        source_char = source[row - 1]
+        for column in range(max(1, row - max_distance), min(target_length, row + max_distance) + 1):
+            target_char = target[column - 1]
+            # comparisons instead of min(): this loop is the hot path
+            distance = previous[column - 1] if source_char == target_char else previous[column - 1] + 1
+            if previous[column] + 1 < distance:
+                distance = previous[column] + 1
+            if current[column - 1] + 1 < distance:
+                distance = current[column - 1] + 1
+            if row > 1 and column > 1 and source_char == target[column - 2] and source[row - 2] == target_char \
+                and before_previous[column - 2] + 1 < distance:
+                distance = before_previous[column - 2] + 1
+            if distance > out_of_bounds:
+                distance = out_of_bounds
+            current[column] = distance
+            if distance < row_minimum:
+                row_minimum = distance
+        if row_minimum > max_distance:
+            return None
+        before_previous, previous = previous, current
+
+    return previous[target_length] if previous[target_length] <= max_distance else None
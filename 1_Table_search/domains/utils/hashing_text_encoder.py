@@ -0,0 +1,114 @@
+import math
+import zlib
+from functools import lru_cache
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from domains.utils.tokenizer import Tokenizer
+from domains.services.base_text_encoder import BaseTextEncoder
+from domains.values.constant.vector_search_parameter import ENCODER_DIMENSION
+from domains.values.constant.encoder_concept_group import ENCODER_CONCEPT_GROUPS
+
+
+class HashingTextEncoder(BaseTextEncoder):
+    """Feature hashing encoder, no model or training needed.
+
+    Each word contributes a signed hashed feature for itself, for its
+    character trigrams (so user / users or typos stay close) and for its
+    concept group (so revenue / sales or customer / client match). Word
+    counts are dampened with 1 + log(tf) and rows are L2-normalized.
+    """
+
+    def __init__(self, dimension: int = ENCODER_DIMENSION, word_weight: float = 1.0,
+        trigram_weight: float = 0.5, concept_weight: float = 1.0, memo_size: int = 65536):
+        self.dimension = dimension
+        self.word_weight = word_weight
+        self.trigram_weight = trigram_weight
+        self.concept_weight = concept_weight
+        self.memo_size = memo_size
+        # snake_case names are split by mapping underscores to spaces, which
+        # keeps the plain word pattern (split_identifiers is far slower)
+        self.tokenizer = Tokenizer(min_length=2)
+        self.concepts = {word: group for group, words in enumerate(ENCODER_CONCEPT_GROUPS) for word in words}
+        self.word_features_cached = lru_cache(maxsize=memo_size)(self.get_word_features)
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state.pop('word_features_cached')
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self.word_features_cached = lru_cache(maxsize=self.memo_size)(self.get_word_features)
+
+
+    def get_config(self) -> Dict:
+        return {
+            "kind": "hashing",
+            "dimension": self.dimension,
+            "word_weight": self.word_weight,
+            "trigram_weight": self.trigram_weight,
+            "concept_weight": self.concept_weight
+        }
+
+
+    def hash_feature(self, feature: str) -> Tuple[int, float]:
+        # the top bit picks the sign, so colliding features cancel on average
+        digest = zlib.crc32(feature.encode('utf-8'))
+        return digest % self.dimension, -1.0 if digest & 0x80000000 else 1.0
+
+
+    def get_word_features(self, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        features = [(f"w:{word}", self.word_weight)]
+        padded = f"#{word}#"
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        features.extend((f"t:{trigram}", self.trigram_weight / len(trigrams)) for trigram in trigrams)
+        concept = self.concepts.get(word)
+        if concept is not None:
+            features.append((f"c:{concept}", self.concept_weight))
+
+        indexes = np.empty(len(features), dtype=np.int64)
+        values = np.empty(len(features), dtype=np.float32)
+        for position, (feature, weight) in enumerate(features):
+            indexes[position], sign = self.hash_feature(feature)
+            values[position] = sign * weight
+
+        return indexes, values
+
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        # features of every word of every text go through one bincount
+        indexes, values, lengths, offsets, scales = [], [], [], [], []
+        for row, text in enumerate(texts):
+            for word, tf in Counter(self.tokenizer.tokenize(text.replace('_', ' '))).items():
+                word_indexes, word_values = self.word_features_cached(word)
+                indexes.append(word_indexes)
+                values.append(word_values)
+                lengths.append(len(word_indexes))
+                offsets.append(row * self.dimension)
+                scales.append(1.0 + math.log(tf))
+
+        vectors = np.zeros(len(texts) * self.dimension)
+        if indexes:
+            vectors = np.bincount(
+                np.concatenate(indexes) + np.repeat(offsets, lengths),
+                weights=np.concatenate(values) * np.repeat(scales, lengths),
+                minlength=len(texts) * self.dimension
+            )
+        vectors = vectors.reshape(len(texts), self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+        return vectors.astype(np.float32)
+
+
+def create_text_encoder(config: Optional[Dict] = None) -> BaseTextEncoder:
+    """Re-creates an encoder from its get_config()."""
+    config = dict(config or {"kind": "hashing"})
+    kind = config.pop("kind")
+    if kind != "hashing":
+        raise ValueError(f"Unknown text encoder {kind!r}, pass the encoder the index was built with")
+
+    return HashingTextEncoder(**config)
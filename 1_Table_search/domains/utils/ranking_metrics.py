@@ -0,0 +1,34 @@
+import math
+from typing import Dict, Iterable, List
+
+
+def dcg_at_k(grades: List[float], k: int) -> float:
+    # graded gain 2^rel - 1, discounted by log2 of the 1-based rank + 1
+    return sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(grades[:k]))
+
+
+def ndcg_at_k(ranked: List[str], judgments: Dict[str, float], k: int) -> float:
+    """DCG of the first k ranked names over the DCG of the ideal ranking
+    of the judged ones; 0.0 when nothing is judged relevant."""
+    ideal = dcg_at_k(sorted((grade for grade in judgments.values() if grade > 0), reverse=True), k)
+    if not ideal:
+        return 0.0
+
+    return dcg_at_k([judgments.get(name, 0) for name in ranked], k) / ideal
+
+
+def reciprocal_rank(ranked: List[str], relevant: Iterable[str]) -> float:
+    relevant = set(relevant)
+    for rank, name in enumerate(ranked, 1):
+        if name in relevant:
+            return 1.0 / rank
+
+    return 0.0
+
+
+def recall_at_k(ranked: List[str], relevant: Iterable[str], k: int) -> float:
+    relevant = set(relevant)
+    if not relevant:
+        return 0.0
+
+    return len(relevant.intersection(ranked[:k])) / len(relevant)
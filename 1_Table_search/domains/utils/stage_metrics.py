@@ -0,0 +1,141 @@
+import time
+import random
+import threading
+from bisect import bisect_left
+from typing import Dict, List
+
+
+# upper bounds in seconds, Prometheus style; the last bucket is +Inf
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with interpolated quantiles."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        bucket = bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[bucket - 1] if bucket else 0.0
+                upper = self.buckets[bucket] if bucket < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+
+class Span:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics: "StageMetrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class StageMetrics:
+    """Per-stage latency histograms fed by sampled timing spans.
+
+    sample_rate is the fraction of spans that are timed: 1.0 times every
+    span, 0.0 turns instrumentation off and leaves only a random() call
+    and a shared no-op context manager on the hot path.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.lock = threading.Lock()
+
+    def span(self, stage: str):
+        if self.sample_rate >= 1.0 or (self.sample_rate > 0.0 and random.random() < self.sample_rate):
+            return Span(self, stage)
+
+        return NULL_SPAN
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())}
+
+    def to_prometheus(self, name: str = "bq_stage_latency_seconds") -> str:
+        lines: List[str] = [
+            f"# HELP {name} Latency of agent pipeline and search stages.",
+            f"# TYPE {name} histogram"
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            with histogram.lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for upper, bucket_count in zip(histogram.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if upper == float("inf") else repr(upper)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+stage_metrics = StageMetrics()
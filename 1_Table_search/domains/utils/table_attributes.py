@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from typing import List
+
+from domains.values.usage_recommendation import UsageRecommendation
+from domains.values.constant.table_freshness_parameter import (
+    FRESHNESS_LABELS, LAST_MODIFIED_FORMAT, UNKNOWN_MODIFIED_DAY
+)
+
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_epoch_day(last_modified: str) -> int:
+    """Days since 1970-01-01 of a YYYY-MM-DD date, UNKNOWN_MODIFIED_DAY
+    when it is missing or does not parse."""
+    if not last_modified:
+        return UNKNOWN_MODIFIED_DAY
+
+    try:
+        return (datetime.strptime(last_modified, LAST_MODIFIED_FORMAT).date() - EPOCH).days
+    except (TypeError, ValueError):
+        return UNKNOWN_MODIFIED_DAY
+
+
+def today_epoch_day() -> int:
+    return (date.today() - EPOCH).days
+
+
+def describe_freshness(modified_day: int, today: int) -> str:
+    if modified_day == UNKNOWN_MODIFIED_DAY:
+        return "Unknown"
+
+    days_old = today - modified_day
+    for max_days, label in FRESHNESS_LABELS:
+        if days_old <= max_days:
+            return label
+
+    return f"Older ({days_old} days)"
+
+
+def classify_usage(tags: List[str], row_count: int) -> UsageRecommendation:
+    row_count = row_count or 0
+    if "daily" in tags and row_count > 10000:
+        return UsageRecommendation.HIGH_VOLUME_DAILY
+    elif "campaign" in tags:
+        return UsageRecommendation.CAMPAIGN
+    elif row_count < 1000:
+        return UsageRecommendation.REFERENCE
+    else:
+        return UsageRecommendation.GENERAL
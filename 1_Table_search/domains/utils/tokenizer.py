@@ -0,0 +1,71 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from domains.values.constant.common_stop_words import STOP_WORDS
+
+
+# whole alphabetic words of at least {} letters; letters glued to digits or
+# underscores (user_id, v2) are not words, as keyword extraction always did
+WORD_PATTERN = r'\b[a-z]{{{},}}\b'
+# case and separator boundaries inside identifiers: user_id, userId,
+# HTTPServer -> user id, user id, http server
+IDENTIFIER_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+')
+
+
+class Tokenizer:
+    """Stateless keyword tokenizer with an LRU memo for query strings.
+
+    tokenize() lowercases, keeps alphabetic words of at least min_length
+    characters and drops stop words. With split_identifiers, snake_case and
+    camelCase identifiers are split into their words first.
+    """
+
+    def __init__(self, min_length: int = 3, stop_words: Optional[Iterable[str]] = None,
+        split_identifiers: bool = False, memo_size: int = 4096):
+        self.min_length = min_length
+        self.stop_words = frozenset(STOP_WORDS if stop_words is None else stop_words)
+        self.split_identifiers = split_identifiers
+        self.memo_size = memo_size
+        self.word_pattern = re.compile(WORD_PATTERN.format(max(min_length, 1)))
+        self.tokenize_query_cached = lru_cache(maxsize=memo_size)(self.tokenize_tuple)
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state.pop('tokenize_query_cached')
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self.tokenize_query_cached = lru_cache(maxsize=self.memo_size)(self.tokenize_tuple)
+
+    def get_config(self) -> Dict:
+        return {
+            "min_length": self.min_length,
+            "stop_words": sorted(self.stop_words),
+            "split_identifiers": self.split_identifiers
+        }
+
+    def tokenize(self, text: str) -> List[str]:
+        if not text:
+            return []
+
+        stop_words = self.stop_words
+        if self.split_identifiers:
+            min_length = self.min_length
+            return [
+                word for word in (part.lower() for part in IDENTIFIER_PATTERN.findall(text))
+                if len(word) >= min_length and word not in stop_words
+            ]
+
+        return [word for word in self.word_pattern.findall(text.lower()) if word not in stop_words]
+
+    def tokenize_tuple(self, text: str) -> Tuple[str, ...]:
+        return tuple(self.tokenize(text))
+
+    def tokenize_query(self, text: str) -> List[str]:
+        """tokenize() memoized on the exact query string."""
+        return list(self.tokenize_query_cached(text))
+
+    def cache_info(self):
+        return self.tokenize_query_cached.cache_info()
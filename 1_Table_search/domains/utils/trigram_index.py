@@ -0,0 +1,137 @@
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from domains.utils.edit_distance import bounded_edit_distance
+
+
+# terms are indexed as "$$term$", so the leading grams anchor prefixes
+START_PADDING = "$$"
+END_PADDING = "$"
+
+
+def get_trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Character trigram postings over a growing vocabulary of terms.
+
+    Candidates for substring, prefix and bounded edit distance lookups are
+    the terms sharing enough trigrams with the pattern; only those are
+    verified, instead of scanning the whole vocabulary. Postings are split
+    by term length, so similarity lookups only count terms of a close length.
+    """
+
+    def __init__(self):
+        self.terms: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        # trigram -> term length -> term ids, and trigram -> term count
+        self.postings: Dict[str, Dict[int, array]] = defaultdict(dict)
+        self.trigram_counts: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def from_terms(cls, terms: Iterable[str]):
+        index = cls()
+        for term in terms:
+            index.add(term)
+
+        return index
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.term_ids
+
+    def add(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.term_ids[term] = term_id
+            self.terms.append(term)
+            for trigram in get_trigrams(START_PADDING + term + END_PADDING):
+                length_postings = self.postings[trigram]
+                if len(term) not in length_postings:
+                    length_postings[len(term)] = array('I')
+                length_postings[len(term)].append(term_id)
+                self.trigram_counts[trigram] += 1
+
+        return term_id
+
+    def get_term_ids(self, trigrams: Set[str], min_length: int = 0) -> List[int]:
+        # term ids present in every trigram's postings, rarest trigram first
+        trigrams = sorted(trigrams, key=lambda trigram: self.trigram_counts.get(trigram, 0))
+        if not trigrams or not self.trigram_counts.get(trigrams[0], 0):
+            return []
+
+        term_ids = None
+        for trigram in trigrams:
+            trigram_terms = set()
+            for length, length_terms in self.postings[trigram].items():
+                if length >= min_length:
+                    trigram_terms.update(length_terms)
+            if term_ids is None:
+                term_ids = trigram_terms
+            else:
+                term_ids &= trigram_terms
+            if not term_ids:
+                break
+
+        return sorted(term_ids)
+
+    def get_containing(self, substring: str) -> List[str]:
+        if len(substring) < 3:
+            return [term for term in self.terms if substring in term]
+
+        terms = self.terms
+        return [
+            terms[term_id] for term_id in self.get_term_ids(get_trigrams(substring), len(substring))
+            if substring in terms[term_id]
+        ]
+
+    def get_prefixed(self, prefix: str) -> List[str]:
+        if not prefix:
+            return []
+
+        terms = self.terms
+        return [
+            terms[term_id] for term_id in self.get_term_ids(get_trigrams(START_PADDING + prefix), len(prefix))
+            if terms[term_id].startswith(prefix)
+        ]
+
+    def get_similar(self, term: str, max_distance: int) -> List[Tuple[int, str]]:
+        """(distance, term) of the terms within max_distance edits, closest first.
+
+        Candidates must share the trigrams left after one adjacent
+        transposition (up to four changed trigrams) and max_distance - 1
+        other edits (up to three each), so a term two transpositions away
+        is not found.
+        """
+        trigrams = get_trigrams(START_PADDING + term + END_PADDING)
+        lengths = range(max(len(term) - max_distance, 0), len(term) + max_distance + 1)
+        min_shared = len(trigrams) - 3 * max_distance - 1
+        if min_shared > 0:
+            shared = Counter()
+            for trigram in trigrams:
+                length_postings = self.postings.get(trigram)
+                if length_postings:
+                    for length in lengths:
+                        shared.update(length_postings.get(length, ()))
+            # the bound holds both ways, a candidate padded to n + 1 trigrams
+            # shares at least n - 3 * max_distance of them
+            terms = self.terms
+            term_ids = sorted(
+                term_id for term_id, count in shared.items()
+                if count >= min_shared and count >= len(terms[term_id]) - 3 * max_distance
+            )
+        else:
+            term_ids = [term_id for term_id, other in enumerate(self.terms) if len(other) in lengths]
+
+        similar = []
+        for term_id in term_ids:
+            distance = bounded_edit_distance(term, self.terms[term_id], max_distance)
+            if distance is not None:
+                similar.append((distance, self.terms[term_id]))
+
+        return sorted(similar, key=lambda item: item[0])
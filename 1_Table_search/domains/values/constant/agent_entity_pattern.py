@@ -0,0 +1,10 @@
+
+
+AGENT_TIME_REFERENCES = ["daily", "weekly", "monthly", "yearly", "today", "yesterday"]
+
+AGENT_METRIC_TERMS = ["revenue", "performance", "clicks", "impressions", "conversions"]
+
+AGENT_DOMAIN_TERMS = ["table", "dataset", "column", "data", "bigquery"]
+
+# recognized when the analyzer runs without a catalogue
+AGENT_DEFAULT_DATASETS = ["marketing", "sales", "analytics"]
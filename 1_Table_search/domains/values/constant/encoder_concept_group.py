@@ -0,0 +1,22 @@
+
+
+# words sharing a concept also share one encoder feature, so tables and
+# queries that use different words for it still land close together
+ENCODER_CONCEPT_GROUPS = [
+    ["revenue", "sales", "sale", "amount", "income", "earnings", "turnover", "gmv"],
+    ["customer", "customers", "user", "users", "client", "clients", "buyer", "buyers", "account", "accounts", "member", "members"],
+    ["order", "orders", "purchase", "purchases", "transaction", "transactions", "checkout"],
+    ["product", "products", "item", "items", "sku", "catalog", "catalogue", "inventory"],
+    ["price", "prices", "pricing", "cost", "costs", "spend", "fee", "fees"],
+    ["campaign", "campaigns", "ads", "advertising", "marketing", "promotion", "promotions"],
+    ["click", "clicks", "impression", "impressions", "views", "view", "traffic", "visits"],
+    ["conversion", "conversions", "signup", "signups", "acquisition", "funnel"],
+    ["session", "sessions", "event", "events", "activity", "behavior", "behaviour", "engagement"],
+    ["employee", "employees", "staff", "headcount", "hr", "payroll"],
+    ["daily", "day", "date", "weekly", "week", "monthly", "month", "yearly", "year", "time", "timestamp"],
+    ["location", "region", "country", "city", "geo", "geography", "address"],
+    ["churn", "retention", "cohort", "lifetime", "ltv"],
+    ["invoice", "invoices", "billing", "payment", "payments", "refund", "refunds"],
+    ["shipment", "shipments", "shipping", "delivery", "logistics", "warehouse"],
+    ["performance", "metrics", "metric", "kpi", "kpis", "stats", "statistics"]
+]
@@ -0,0 +1,6 @@
+
+
+# shortest query keyword allowed one, then two, typos
+FUZZY_ONE_EDIT_MIN_LENGTH = 4
+
+FUZZY_TWO_EDITS_MIN_LENGTH = 8
@@ -0,0 +1,5 @@
+INDEX_SNAPSHOT_MAGIC = b"BQIDXSNP"
+INDEX_SNAPSHOT_VERSION = 5
+
+VECTOR_INDEX_MAGIC = b"BQVECIDX"
+VECTOR_INDEX_VERSION = 1
@@ -0,0 +1,19 @@
+
+
+BM25_K1 = 1.2
+
+BM25_B = 0.75
+
+# in the order of BQSearchTable.get_text_sources
+TABLE_TEXT_FIELDS = ["table_name", "description", "column_names", "column_descriptions", "tags"]
+
+BM25F_FIELD_WEIGHTS = {
+    "table_name": 3.0,
+    "description": 1.5,
+    "column_names": 1.5,
+    "column_descriptions": 1.0,
+    "tags": 2.0
+}
+
+# age in days at which the recency boost of a table has halved
+RECENCY_HALF_LIFE_DAYS = 30.0
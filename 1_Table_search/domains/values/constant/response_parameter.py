@@ -0,0 +1,2 @@
+# search results the table search response renders in full
+RENDERED_RESULT_COUNT = 5
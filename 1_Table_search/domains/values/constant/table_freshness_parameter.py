@@ -0,0 +1,13 @@
+
+
+LAST_MODIFIED_FORMAT = "%Y-%m-%d"
+
+# epoch day of tables without a parsable last_modified (int32 minimum)
+UNKNOWN_MODIFIED_DAY = -2 ** 31
+
+# (maximum age in days, label) from freshest, older tables get their age
+FRESHNESS_LABELS = [
+    (1, "Very Fresh (< 1 day)"),
+    (7, "Fresh (< 1 week)"),
+    (30, "Recent (< 1 month)")
+]
@@ -0,0 +1,9 @@
+from domains.values.usage_recommendation import UsageRecommendation
+
+
+USAGE_RECOMMENDATION_MESSAGES = {
+    UsageRecommendation.HIGH_VOLUME_DAILY: "High-volume daily data - suitable for trend analysis",
+    UsageRecommendation.CAMPAIGN: "Marketing campaign data - good for performance analysis",
+    UsageRecommendation.REFERENCE: "Small reference table - suitable for lookup operations",
+    UsageRecommendation.GENERAL: "General purpose table - verify data recency before use"
+}
@@ -0,0 +1,24 @@
+
+
+ENCODER_DIMENSION = 256
+
+# reciprocal rank fusion: score = sum of 1 / (RRF_K + rank) over the result
+# lists, each list cut at FUSION_DEPTH (and at least the requested limit)
+RRF_K = 60
+
+FUSION_DEPTH = 50
+
+# vectors are scanned exhaustively until IVF_MIN_TRAIN_SIZE are indexed;
+# the lists are retrained once the unclustered vectors exceed
+# IVF_REBUILD_RATIO of the clustered ones
+IVF_MIN_TRAIN_SIZE = 1024
+
+IVF_REBUILD_RATIO = 0.5
+
+IVF_PROBE_LISTS = 16
+
+IVF_TRAIN_ITERATIONS = 10
+
+# cosine similarities below this are hashing collisions rather than shared
+# words or concepts, and are not returned
+DENSE_MIN_SIMILARITY = 0.1
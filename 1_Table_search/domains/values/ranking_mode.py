@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class RankingMode(Enum):
+    TF_IDF = "tf_idf"
+    BM25 = "bm25"
+    BM25F = "bm25f"
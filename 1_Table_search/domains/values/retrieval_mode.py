@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class RetrievalMode(Enum):
+    KEYWORD = "keyword"
+    DENSE = "dense"
+    HYBRID = "hybrid"
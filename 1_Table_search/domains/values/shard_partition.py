@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class ShardPartition(Enum):
+    TABLE_NAME = "table_name"
+    DATASET = "dataset"
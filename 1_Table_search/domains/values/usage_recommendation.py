@@ -0,0 +1,9 @@
+from enum import IntEnum
+
+
+# stored per table as a one byte code
+class UsageRecommendation(IntEnum):
+    HIGH_VOLUME_DAILY = 0
+    CAMPAIGN = 1
+    REFERENCE = 2
+    GENERAL = 3
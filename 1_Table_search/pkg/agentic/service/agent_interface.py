@@ -1,18 +1,26 @@
 
 
+import time
 import logging
-from typing import Dict, List
-from datetime import datetime
+from collections import deque
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 
 from pkg.big_query.services.table_search import BQSearchTable
 from pkg.agentic.service.orchestrator_agent import BQAgentOrchestrator
+from domains.utils.stage_metrics import stage_metrics
 
 
 class BQAgenticDataCatalogueInterface:
     
-    def __init__(self, search_engine: BQSearchTable):
-        self.orchestrator = BQAgentOrchestrator(search_engine)
-        self.session_history = []
+    def __init__(self, search_engine: BQSearchTable, max_workers: Optional[int] = None,
+        executor_kind: str = "thread"):
+        self.orchestrator = BQAgentOrchestrator(search_engine, max_workers=max_workers, executor_kind=executor_kind)
+        # bounded so a long running server does not keep every query
+        self.session_history = deque(maxlen=1000)
+        self.session_queries = 0
+        self.started_at = datetime.now()
+        self.started_clock = time.monotonic()
         self.logger = logging.getLogger("BQInterface")
         
         logging.basicConfig(
@@ -22,28 +30,51 @@ class BQAgenticDataCatalogueInterface:
     
     async def chat(self, user_query: str, user_id: str = "default") -> str:
 
-        self.session_history.append({
+        entry = {
             "timestamp": datetime.now(),
             "user_query": user_query,
             "user_id": user_id
-        })
+        }
+        self.session_history.append(entry)
+        self.session_queries += 1
         
         response = await self.orchestrator.process_query(user_query, user_id)
-        self.session_history[-1]["response"] = response
+        entry["response"] = response
         
         return response
 
     
+    async def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        return await self.orchestrator.search(query, limit, filters)
+
+    
+    async def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        return await self.orchestrator.suggest(prefix, limit)
+
+    
     def get_agent_diagnostics(self) -> Dict:
         return {
             "agent_status": self.orchestrator.get_agent_status(),
-            "session_queries": len(self.session_history),
-            "system_uptime": datetime.now().isoformat()
+            "session_queries": self.session_queries,
+            "result_cache": self.orchestrator.get_cache_stats(),
+            "started_at": self.started_at.isoformat(),
+            "system_uptime": str(timedelta(seconds=int(time.monotonic() - self.started_clock))),
+            "metrics_sample_rate": stage_metrics.sample_rate,
+            "stage_latency": stage_metrics.snapshot()
         }
 
     
+    def get_metrics_text(self) -> str:
+        uptime = time.monotonic() - self.started_clock
+        return stage_metrics.to_prometheus() + (
+            "# HELP bq_uptime_seconds Seconds since the interface started.\n"
+            "# TYPE bq_uptime_seconds gauge\n"
+            f"bq_uptime_seconds {uptime:.3f}\n"
+        )
+
+    
     def get_session_history(self) -> List[Dict]:
-        return self.session_history.copy()
+        return list(self.session_history)
 
     
     async def run_cli(self):
@@ -119,6 +150,12 @@ class BQAgenticDataCatalogueInterface:
         print(f"\n Session Stats:")
         print(f"  • Queries processed: {status['session_queries']}")
         print(f"  • System uptime: {status['system_uptime']}")
+        print(f"  • Result cache: {status['result_cache']['hits']} hits / {status['result_cache']['misses']} misses")
+        
+        if status["stage_latency"]:
+            print(f"\n Stage Latency (sample rate {status['metrics_sample_rate']}):")
+            for stage, latency in status["stage_latency"].items():
+                print(f"  • {stage}: n={latency['count']} p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms")
 
     
     def _show_session_history(self):
@@ -129,7 +166,7 @@ class BQAgenticDataCatalogueInterface:
         print(f"\n Session History ({len(self.session_history)} queries):")
         print("─" * 50)
         
-        for i, entry in enumerate(self.session_history[-5:], 1):  # Show last 5
+        for i, entry in enumerate(list(self.session_history)[-5:], 1):  # Show last 5
             timestamp = entry["timestamp"].strftime("%H:%M:%S")
             query = entry["user_query"][:50] + "..." if len(entry["user_query"]) > 50 else entry["user_query"]
             print(f"{i}. [{timestamp}] {query}")
\ No newline at end of file
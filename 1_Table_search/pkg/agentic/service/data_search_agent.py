@@ -1,17 +1,77 @@
 
 
-from typing import List, Dict
+import os
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Iterator, List, Dict, Mapping, Optional
 from datetime import datetime
 
 from domains.values.agent_status import AgentStatus
 from domains.models.agent_task import AgentTask
+from domains.models.table_search_result import LazyRecord
 from domains.services.base_agent import BaseAgent
-from pkg.big_query.services.table_search import BQSearchTable
+from domains.utils.stage_metrics import stage_metrics
+from domains.utils.table_attributes import classify_usage, describe_freshness, to_epoch_day, today_epoch_day
+from domains.values.usage_recommendation import UsageRecommendation
+from domains.values.constant.response_parameter import RENDERED_RESULT_COUNT
+from domains.values.constant.usage_recommendation_message import USAGE_RECOMMENDATION_MESSAGES
+from pkg.big_query.services.table_search import (
+    BQSearchTable, datasets_worker, init_search_worker, search_worker, suggest_worker
+)
+
+
+class EnrichedSearchResult(LazyRecord):
+    """A search result with the agent's enrichment fields, computed only
+    for results whose enrichment is actually read. Fields not materialized
+    by the agent are computed on the thread that reads them; related_tables
+    takes the engine's index_lock."""
+
+    __slots__ = ('result', 'agent')
+    FIELDS = ('usage_recommendation', 'data_freshness', 'related_tables')
+    # the fields the response agent renders for its top results, search
+    # result fields included
+    RENDERED_FIELDS = ('table_name', 'description', 'relevance_score', 'tags', 'usage_recommendation')
+
+    def __init__(self, result: Mapping, agent: 'BQDataSearchAgent'):
+        self.cache: Optional[Dict] = None
+        self.result = result
+        self.agent = agent
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.result
+        yield from self.FIELDS
+
+    def __len__(self) -> int:
+        return len(self.result) + len(self.FIELDS)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.getters or name in self.result
+
+
+    def get_missing(self, name: str) -> Any:
+        return self.result[name]
+
+
+    def get_usage_recommendation(self) -> str:
+        return self.agent._get_usage_recommendation(self.result)
+
+
+    def get_data_freshness(self) -> str:
+        return self.agent._calculate_data_freshness(self.result)
+
+
+    def get_related_tables(self) -> List[str]:
+        return self.agent._find_related_tables(self.result)
 
 
 class BQDataSearchAgent(BaseAgent):
     
-    def __init__(self, search_engine: BQSearchTable):
+    def __init__(self, search_engine: BQSearchTable, executor_kind: str = "thread",
+        max_workers: Optional[int] = None, max_concurrency: int = 4,
+        related_tables_limit: int = 3, related_min_shared_tags: int = 2):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {executor_kind}")
+
         super().__init__(
             name="BQDataSearcher",
             capabilities=[
@@ -19,9 +79,73 @@ class BQDataSearchAgent(BaseAgent):
                 "metadata_retrieval",
                 "similarity_matching",
                 "result_ranking"
-            ]
+            ],
+            max_concurrency=max_concurrency
         )
         self.search_engine = search_engine
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor: Optional[Executor] = None
+        self.executor_version = None
+        self.related_tables_limit = related_tables_limit
+        self.related_min_shared_tags = related_min_shared_tags
+    
+
+    def get_executor(self) -> Executor:
+        if self.executor_kind == "thread":
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="BQSearch")
+            return self.executor
+
+        # process workers score against a pickled copy of the index, so the
+        # pool is replaced once the index has been mutated
+        if self.executor is None or self.executor_version != self.search_engine.index_version:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=init_search_worker,
+                initargs=(self.search_engine,)
+            )
+            self.executor_version = self.search_engine.index_version
+
+        return self.executor
+    
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+    
+
+    async def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        if self.executor_kind == "process":
+            return await loop.run_in_executor(self.get_executor(), search_worker, query, limit, filters)
+        
+        return await loop.run_in_executor(self.get_executor(), self.search_engine.search, query, limit, filters)
+    
+
+    async def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        # completions and the dataset list take the index lock, which a long
+        # ingest may hold, so they are dispatched like searches
+        loop = asyncio.get_running_loop()
+        if self.executor_kind == "process":
+            return await loop.run_in_executor(self.get_executor(), suggest_worker, prefix, limit)
+
+        return await loop.run_in_executor(self.get_executor(), self.search_engine.suggest, prefix, limit)
+    
+
+    async def get_datasets(self) -> List[str]:
+        loop = asyncio.get_running_loop()
+        if self.executor_kind == "process":
+            return await loop.run_in_executor(self.get_executor(), datasets_worker)
+
+        return await loop.run_in_executor(self.get_executor(), self.search_engine.get_datasets)
+    
+
+    def _search_and_enhance(self, query: str, limit: int, filters: Dict) -> List[Dict]:
+        return self._enhance_results(self.search_engine.search(query, limit, filters))
     
 
     async def process_task(self, task: AgentTask) -> AgentTask:
@@ -33,11 +157,19 @@ class BQDataSearchAgent(BaseAgent):
             limit = search_params.get("limit", 10)
             filters = search_params.get("filters", {})
             
-            results = self.search_engine.search(query, limit)
-            if filters:
-                results = self._apply_filters(results, filters)
-            
-            enhanced_results = self._enhance_results(results)
+            # scoring and the rendered enrichment are CPU bound; keep them off
+            # the event loop so other workflows keep making progress. Process
+            # workers only search: the agent is not shipped to them, so the
+            # rendered fields (derived from each result, no engine lock) are
+            # computed here on the loop
+            loop = asyncio.get_running_loop()
+            if self.executor_kind == "process":
+                results = await self.search(query, limit, filters)
+                enhanced_results = self._enhance_results(results)
+            else:
+                enhanced_results = await loop.run_in_executor(
+                    self.get_executor(), self._search_and_enhance, query, limit, filters
+                )
             
             task.output_data = {
                 "query": query,
@@ -62,99 +194,38 @@ class BQDataSearchAgent(BaseAgent):
         return task
 
     
-    def _apply_filters(self, results: List[Dict], filters: Dict) -> List[Dict]:
-        filtered_results = results.copy()
-        
-        if "dataset" in filters:
-            target_datasets = filters["dataset"]
-            if isinstance(target_datasets, str):
-                target_datasets = [target_datasets]
-            filtered_results = [r for r in filtered_results 
-                             if any(ds in r["table_name"] for ds in target_datasets)]
-        
-        if "min_score" in filters:
-            min_score = filters["min_score"]
-            filtered_results = [r for r in filtered_results 
-                             if r["relevance_score"] >= min_score]
-        
-        if "tags" in filters:
-            required_tags = filters["tags"]
-            if isinstance(required_tags, str):
-                required_tags = [required_tags]
-            filtered_results = [r for r in filtered_results 
-                             if any(tag in r["tags"] for tag in required_tags)]
-        
-        return filtered_results
-
-    
     def _enhance_results(self, results: List[Dict]) -> List[Dict]:
-        enhanced = []
-        
-        for result in results:
-            enhanced_result = result.copy()
-            enhanced_result["usage_recommendation"] = self._get_usage_recommendation(result)
-            enhanced_result["data_freshness"] = self._calculate_data_freshness(result)
-            enhanced_result["related_tables"] = self._find_related_tables(result)
-            
-            enhanced.append(enhanced_result)
-        
-        return enhanced
+        # only the rendered fields of the results the response renders are
+        # computed here, by the caller (the search worker on the thread
+        # path); the other results and fields are computed on access
+        with stage_metrics.span("search_agent.enhance"):
+            enhanced_results = [EnrichedSearchResult(result, self) for result in results]
+            for result in enhanced_results[:RENDERED_RESULT_COUNT]:
+                result.materialize(*EnrichedSearchResult.RENDERED_FIELDS)
+
+            return enhanced_results
     
     def _get_usage_recommendation(self, result: Dict) -> str:
-        tags = result.get("tags", [])
-        row_count = result.get("row_count", 0)
-        
-        if "daily" in tags and row_count > 10000:
-            return "High-volume daily data - suitable for trend analysis"
-        elif "campaign" in tags:
-            return "Marketing campaign data - good for performance analysis"
-        elif row_count < 1000:
-            return "Small reference table - suitable for lookup operations"
-        else:
-            return "General purpose table - verify data recency before use"
+        # engine results carry the code derived at ingest; plain dicts (from
+        # process workers or shards) are classified here
+        usage_code = getattr(result, "usage_code", None)
+        if usage_code is None:
+            usage_code = classify_usage(result.get("tags", []), result.get("row_count", 0))
+
+        return USAGE_RECOMMENDATION_MESSAGES[UsageRecommendation(usage_code)]
 
     
     def _calculate_data_freshness(self, result: Dict) -> str:
-        last_modified = result.get("last_modified", "")
-        
-        if not last_modified:
-            return "Unknown"
-        
-        try:
-            from datetime import datetime, timedelta
-            
-            mod_date = datetime.strptime(last_modified, "%Y-%m-%d")
-            days_old = (datetime.now() - mod_date).days
-            
-            if days_old <= 1:
-                return "Very Fresh (< 1 day)"
-            elif days_old <= 7:
-                return "Fresh (< 1 week)"
-            elif days_old <= 30:
-                return "Recent (< 1 month)"
-            else:
-                return f"Older ({days_old} days)"
-                
-        except:
-            return "Unknown"
+        modified_day = getattr(result, "modified_day", None)
+        if modified_day is None:
+            modified_day = to_epoch_day(result.get("last_modified", ""))
+
+        return describe_freshness(modified_day, today_epoch_day())
 
     
     def _find_related_tables(self, result: Dict) -> List[str]:
-        current_tags = set(result.get("tags", []))
-        current_dataset = result.get("dataset", "")
-        
-        related = []
-        for table in self.search_engine.tables:
-            if table.get_full_name() == result["table_name"]:
-                continue
-                
-            table_tags = set(table.tags)
-            common_tags = current_tags.intersection(table_tags)
-            
-            if len(common_tags) >= 2 or table.dataset == current_dataset:
-                related.append(table.get_full_name())
-                
-            if len(related) >= 3: 
-                break
-        
-        return related
\ No newline at end of file
+        return self.search_engine.get_related_tables(
+            result["table_name"],
+            limit=self.related_tables_limit,
+            min_shared_tags=self.related_min_shared_tags
+        )
\ No newline at end of file
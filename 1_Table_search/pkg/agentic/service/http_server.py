@@ -0,0 +1,278 @@
+
+import json
+import signal
+import asyncio
+import logging
+from http import HTTPStatus
+from collections.abc import Mapping
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit, parse_qs
+
+from domains.utils.stage_metrics import stage_metrics
+from pkg.agentic.service.agent_interface import BQAgenticDataCatalogueInterface
+
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def encode_json_value(value):
+    # search results are lazy mappings rather than dicts
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: HTTPStatus, message: str = ""):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class BQCatalogueHTTPServer:
+    """Minimal asyncio HTTP/1.1 JSON front-end for the catalogue interface.
+
+    Routes:
+        POST /chat         {"query": ..., "user_id": ...} -> {"response": ...}
+        GET  /search?q=... or POST /search {"query": ..., "limit": ..., "dataset": ...,
+                                            "tags": [...], "min_score": ...}
+        GET  /suggest?q=... completions of the last word, for search-as-you-type
+        GET  /diagnostics
+        GET  /metrics      Prometheus text format
+        GET  /health
+    """
+
+    def __init__(self, interface: BQAgenticDataCatalogueInterface, host: str = "127.0.0.1",
+        port: int = 8080, request_timeout: float = 30.0, keep_alive_timeout: float = 15.0,
+        shutdown_timeout: float = 30.0):
+        self.interface = interface
+        self.host = host
+        self.port = port
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections: Dict[asyncio.Task, bool] = {}
+        self.shutting_down = False
+        self.logger = logging.getLogger("BQHTTPServer")
+
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.logger.info(f"Serving BigQuery catalogue on http://{self.host}:{self.port}")
+
+
+    async def serve_forever(self):
+        await self.start()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        await stop.wait()
+        await self.shutdown()
+
+
+    async def shutdown(self):
+        self.logger.info("Shutting down HTTP server")
+        self.shutting_down = True
+        if self.server is not None:
+            self.server.close()
+
+        # idle keep-alive connections are dropped right away, in-flight
+        # requests get shutdown_timeout to finish and are then cancelled
+        for connection, busy in list(self.connections.items()):
+            if not busy:
+                connection.cancel()
+        if self.connections:
+            _, pending = await asyncio.wait(list(self.connections), timeout=self.shutdown_timeout)
+            for connection in pending:
+                connection.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+        await self.interface.orchestrator.shutdown()
+
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = asyncio.current_task()
+        self.connections[connection] = False
+        try:
+            while not self.shutting_down:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keep_alive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.write_response(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                              {"error": "Request headers too large"}, False)
+                    break
+
+                self.connections[connection] = True
+                keep_alive = await self.handle_request(head, reader, writer)
+                self.connections[connection] = False
+                if not keep_alive:
+                    break
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.connections.pop(connection, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+
+    async def handle_request(self, head: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        keep_alive = False
+        body = None
+        try:
+            method, target, version, headers = self.parse_head(head)
+            connection_header = headers.get("connection", "").lower()
+            keep_alive = connection_header == "keep-alive" if version == "HTTP/1.0" else connection_header != "close"
+
+            body = await asyncio.wait_for(self.read_body(reader, headers), self.request_timeout)
+            with stage_metrics.span("http.request"):
+                status, payload = await asyncio.wait_for(self.dispatch(method, target, body), self.request_timeout)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+            # an unread body would be parsed as the next request
+            if body is None:
+                keep_alive = False
+        except asyncio.TimeoutError:
+            status, payload = HTTPStatus.GATEWAY_TIMEOUT, {"error": "Request timed out"}
+            keep_alive = False
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return False
+        except Exception as e:
+            self.logger.error(f"Request failed: {e}")
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+        keep_alive = keep_alive and not self.shutting_down
+        try:
+            await self.write_response(writer, status, payload, keep_alive)
+        except ConnectionError:
+            return False
+
+        return keep_alive
+
+
+    def parse_head(self, head: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+        try:
+            request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        if version not in ("HTTP/1.0", "HTTP/1.1"):
+            raise HTTPError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+
+        headers = {}
+        for line in header_lines:
+            name, separator, value = line.partition(":")
+            if not separator:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+        return method.upper(), target, version, headers
+
+
+    async def read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+        if "transfer-encoding" in headers:
+            raise HTTPError(HTTPStatus.NOT_IMPLEMENTED, "Chunked request bodies are not supported")
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+        return await reader.readexactly(length) if length else b""
+
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[HTTPStatus, Union[Dict, str]]:
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+            params.update(data)
+
+        if url.path == "/health" and method == "GET":
+            return HTTPStatus.OK, {"status": "ok"}
+
+        if url.path == "/diagnostics" and method == "GET":
+            return HTTPStatus.OK, self.interface.get_agent_diagnostics()
+
+        if url.path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, self.interface.get_metrics_text()
+
+        if url.path == "/chat" and method == "POST":
+            query = self.get_query(params)
+            response = await self.interface.chat(query, str(params.get("user_id", "default")))
+            return HTTPStatus.OK, {"query": query, "response": response}
+
+        if url.path == "/search" and method in ("GET", "POST"):
+            query = self.get_query(params)
+            try:
+                limit = int(params.get("limit", 10))
+                filters = {name: params[name] for name in ("dataset", "tags") if params.get(name)}
+                if "min_score" in params:
+                    filters["min_score"] = float(params["min_score"])
+                if "modified_within_days" in params:
+                    filters["modified_within_days"] = int(params["modified_within_days"])
+            except (TypeError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST,
+                                "limit and modified_within_days must be integers and min_score a number")
+            results = await self.interface.search(query, limit, filters)
+            return HTTPStatus.OK, {"query": query, "results": results, "total_found": len(results)}
+
+        if url.path == "/suggest" and method == "GET":
+            query = self.get_query(params)
+            try:
+                limit = int(params.get("limit", 10))
+            except (TypeError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+            return HTTPStatus.OK, {"query": query, "suggestions": await self.interface.suggest(query, limit)}
+
+        if url.path in ("/health", "/diagnostics", "/metrics", "/chat", "/search", "/suggest"):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+
+    def get_query(self, params: Dict) -> str:
+        query = params.get("query", params.get("q"))
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "A non-empty 'query' is required")
+
+        return query
+
+
+    async def write_response(self, writer: asyncio.StreamWriter, status: HTTPStatus,
+        payload: Union[Dict, str], keep_alive: bool):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload, default=encode_json_value).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if keep_alive:
+            head += f"Keep-Alive: timeout={int(self.keep_alive_timeout)}\r\n"
+
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
@@ -1,13 +1,17 @@
 
+import os
+import time
 import uuid
 import asyncio
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from domains.values.agent_status import AgentStatus
 from domains.models.agent_task import AgentTask
 from domains.models.agent_message import AgentMessage
 from domains.services.base_agent import BaseAgent
+from domains.utils.lru_ttl_cache import LRUTTLCache
+from domains.utils.stage_metrics import stage_metrics
 from pkg.agentic.service.query_analysis_agent import QueryAnalysisAgent
 from pkg.agentic.service.data_search_agent import BQDataSearchAgent
 from pkg.agentic.service.response_agent import ResponseGenerationAgent
@@ -16,57 +20,155 @@ from pkg.big_query.services.table_search import BQSearchTable
 
 class BQAgentOrchestrator:
     
-    def __init__(self, search_engine: BQSearchTable):
+    def __init__(self, search_engine: BQSearchTable, cache_size: int = 256, cache_ttl: float = 300.0,
+        max_workers: Optional[int] = None, executor_kind: str = "thread", queue_size: int = 100):
         self.agents: Dict[str, BaseAgent] = {}
-        self.task_queue = asyncio.Queue()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor_kind = executor_kind
+        self.queue_size = queue_size
+        self.task_queue = asyncio.Queue(maxsize=queue_size)
+        self.workers: List[asyncio.Task] = []
         self.active_workflows: Dict[str, Dict] = {}
         self.logger = logging.getLogger("BQOrchestrator")
+        self.search_engine = search_engine
+        self.result_cache = LRUTTLCache(max_size=cache_size, ttl_seconds=cache_ttl)
+        self.cached_index_version = search_engine.index_version
         
         self._initialize_agents(search_engine)
 
     
     def _initialize_agents(self, search_engine: BQSearchTable):
-        self.agents["QueryAnalyzer"] = QueryAnalysisAgent()
-        self.agents["BQDataSearcher"] = BQDataSearchAgent(search_engine)
+        search_agent = BQDataSearchAgent(
+            search_engine,
+            executor_kind=self.executor_kind,
+            max_workers=self.max_workers,
+            max_concurrency=self.max_workers
+        )
+        self.agents["QueryAnalyzer"] = QueryAnalysisAgent(search_engine, load_datasets=search_agent.get_datasets)
+        self.agents["BQDataSearcher"] = search_agent
         self.agents["ResponseGenerator"] = ResponseGenerationAgent()
         
         self.logger.info("All BigQuery agents initialized")
 
     
+    def start(self):
+        # queues and worker tasks belong to the running event loop, so they
+        # are (re)created on first use from each loop
+        self.task_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.workers = [
+            asyncio.create_task(self._workflow_worker(), name=f"BQWorkflowWorker-{i}")
+            for i in range(self.max_workers)
+        ]
+        self.workers.extend(
+            asyncio.create_task(agent.consume_messages(), name=f"{name}-messages")
+            for name, agent in self.agents.items()
+        )
+        self.logger.info(f"Started {self.max_workers} BigQuery workflow workers")
+
+    
+    def is_running(self) -> bool:
+        return bool(self.workers) and not self.workers[0].done() \
+            and self.workers[0].get_loop() is asyncio.get_running_loop()
+
+    
     async def process_query(self, user_query: str, user_id: str = "default") -> str:
+        if not self.is_running():
+            self.start()
+        
+        # put() waits while task_queue is full, which pushes back on callers
+        # instead of letting pending workflows pile up without bound
+        response = asyncio.get_running_loop().create_future()
+        await self.task_queue.put((user_query, user_id, response, time.perf_counter()))
+        return await response
+
+    
+    async def _workflow_worker(self):
+        while True:
+            user_query, user_id, response, enqueued_at = await self.task_queue.get()
+            stage_metrics.observe("workflow.queue_wait", time.perf_counter() - enqueued_at)
+            try:
+                with stage_metrics.span("workflow.total"):
+                    result = await self._run_workflow(user_query, user_id)
+                if not response.done():
+                    response.set_result(result)
+            except asyncio.CancelledError:
+                response.cancel()
+                raise
+            finally:
+                self.task_queue.task_done()
+
+    
+    async def _analyze_query(self, user_query: str) -> Optional[Dict]:
+        analysis_task = AgentTask(
+            task_type="query_understanding",
+            input_data={"query": user_query}
+        )
+        
+        analyzed_task = await self.agents["QueryAnalyzer"].run_task(analysis_task)
+        
+        if analyzed_task.status == AgentStatus.FAILED:
+            return None
+        
+        return analyzed_task.output_data
+    
+    
+    async def _search_tables(self, user_query: str, query_analysis: Dict, workflow_id: str) -> Optional[Dict]:
+        search_input = {
+            "query": user_query,
+            "limit": 10,
+            "filters": self._generate_filters(query_analysis)
+        }
+        
+        cache_key = self._get_cache_key(query_analysis["keywords"], search_input)
+        search_data = self.result_cache.get(cache_key)
+        
+        if search_data is None:
+            search_task = AgentTask(
+                task_type="table_search",
+                input_data=search_input
+            )
+            
+            search_result = await self.agents["BQDataSearcher"].run_task(search_task)
+            
+            if search_result.status == AgentStatus.FAILED:
+                return None
+            
+            search_data = search_result.output_data
+            self.result_cache.put(cache_key, search_data)
+        else:
+            self.logger.info(f"BigQuery workflow {workflow_id} served search results from cache")
+        
+        return search_data
+    
+    
+    async def find_tables(self, user_query: str) -> List[Dict]:
+        """Ranked tables the chat workflow answers user_query with."""
+        query_analysis = await self._analyze_query(user_query)
+        if query_analysis is None:
+            return []
+        
+        search_data = await self._search_tables(user_query, query_analysis, str(uuid.uuid4()))
+        return search_data["results"] if search_data is not None else []
+    
+    
+    async def _run_workflow(self, user_query: str, user_id: str) -> str:
         workflow_id = str(uuid.uuid4())
         
         try:
             self.logger.info(f"Processing BigQuery query: '{user_query}' (Workflow: {workflow_id})")
             
-            analysis_task = AgentTask(
-                task_type="query_understanding",
-                input_data={"query": user_query}
-            )
-            
-            analyzed_task = await self.agents["QueryAnalyzer"].process_task(analysis_task)
+            query_analysis = await self._analyze_query(user_query)
             
-            if analyzed_task.status == AgentStatus.FAILED:
+            if query_analysis is None:
                 return "I'm sorry, I couldn't understand your BigQuery query. Could you please rephrase it?"
             
-            query_analysis = analyzed_task.output_data
             intent = query_analysis["intent"]
             
-            search_task = AgentTask(
-                task_type="table_search",
-                input_data={
-                    "query": user_query,
-                    "limit": 10,
-                    "filters": self._generate_filters(query_analysis)
-                }
-            )
-            
-            search_result = await self.agents["BQDataSearcher"].process_task(search_task)
+            search_data = await self._search_tables(user_query, query_analysis, workflow_id)
             
-            if search_result.status == AgentStatus.FAILED:
+            if search_data is None:
                 return "I encountered an error while searching BigQuery data. Please try again."
             
-            search_data = search_result.output_data
             response_task = AgentTask(
                 task_type="natural_language_generation",
                 input_data={
@@ -77,7 +179,7 @@ class BQAgentOrchestrator:
                 }
             )
             
-            response_result = await self.agents["ResponseGenerator"].process_task(response_task)
+            response_result = await self.agents["ResponseGenerator"].run_task(response_task)
             
             if response_result.status == AgentStatus.FAILED:
                 return "I found some BigQuery results but had trouble formatting the response. Here's what I found: " + str(search_data["results"][:2])
@@ -90,6 +192,39 @@ class BQAgentOrchestrator:
             return "I'm experiencing technical difficulties with BigQuery search. Please try again later."
     
     
+    async def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        search_agent = self.agents["BQDataSearcher"]
+        async with search_agent.concurrency:
+            return await search_agent.search(query, limit, filters)
+    
+    
+    async def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        search_agent = self.agents["BQDataSearcher"]
+        async with search_agent.concurrency:
+            return await search_agent.suggest(prefix, limit)
+    
+    
+    def _get_cache_key(self, keywords: List[str], search_input: Dict) -> Tuple:
+        # any index mutation bumps index_version; entries built against an
+        # older index can never match again, so they are dropped eagerly
+        index_version = self.search_engine.index_version
+        if index_version != self.cached_index_version:
+            self.result_cache.clear()
+            self.cached_index_version = index_version
+        
+        # keywords keep their order and repeats: both affect scores and the
+        # matched_keywords of the results
+        filters = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in search_input["filters"].items()
+        ))
+        return (tuple(keywords), filters, search_input["limit"], index_version)
+
+    
+    def get_cache_stats(self) -> Dict:
+        return self.result_cache.stats()
+
+    
     def _generate_filters(self, query_analysis: Dict) -> Dict:
         filters = {}
         
@@ -118,4 +253,13 @@ class BQAgentOrchestrator:
 
     
     async def shutdown(self):
-        self.logger.info("Shutting down BigQuery orchestrator and all agents")
\ No newline at end of file
+        self.logger.info("Shutting down BigQuery orchestrator and all agents")
+        
+        if self.is_running():
+            await self.task_queue.join()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        
+        await asyncio.to_thread(self.agents["BQDataSearcher"].shutdown)
\ No newline at end of file
@@ -1,30 +1,44 @@
 
-import re
-from typing import List, Dict
+from collections import defaultdict
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 
 from domains.values.agent_status import AgentStatus
 from domains.models.agent_task import AgentTask
 from domains.services.base_agent import BaseAgent
+from domains.utils.aho_corasick import AhoCorasick
+from domains.utils.tokenizer import Tokenizer
 
 from domains.values.constant.agent_query_analysis_name import AGENT_QUERY_ANALYSIS_NAME
 from domains.values.constant.agent_query_analysis_capability import AGENT_QUERY_ANALYSIS_CAPABILITY
 from domains.values.constant.agent_intent_pattern import AGENT_INTENT_PATTERN
+from domains.values.constant.agent_entity_pattern import (
+    AGENT_DEFAULT_DATASETS, AGENT_DOMAIN_TERMS, AGENT_METRIC_TERMS, AGENT_TIME_REFERENCES
+)
 
 from pkg.big_query.services.table_search import BQSearchTable
 
 
-class QueryAnalysisAgent(BaseAgent, BQSearchTable):
+class QueryAnalysisAgent(BaseAgent):
     
-    def __init__(self):
+    def __init__(self, search_engine: Optional[BQSearchTable] = None,
+        load_datasets: Optional[Callable[[], Awaitable[List[str]]]] = None):
         BaseAgent.__init__(
             self,
             name=AGENT_QUERY_ANALYSIS_NAME,
             capabilities=AGENT_QUERY_ANALYSIS_CAPABILITY
         )
 
-        BQSearchTable.__init__(self)
-
+        # datasets are recognized from the loaded catalogue, and queries are
+        # tokenized the way the catalogue was indexed
+        self.search_engine = search_engine
+        # the dataset list takes the index lock; when given, load_datasets
+        # reads it off the event loop after the index changes
+        self.load_datasets = load_datasets
+        self.tokenizer = search_engine.tokenizer if search_engine is not None else Tokenizer()
         self.intent_patterns = AGENT_INTENT_PATTERN
+        self.matcher: Optional[AhoCorasick] = None
+        self.matcher_version = None
+        self.matcher_datasets: Tuple[str, ...] = ()
 
     
     async def process_task(self, task: AgentTask) -> AgentTask:
@@ -32,9 +46,13 @@ class QueryAnalysisAgent(BaseAgent, BQSearchTable):
         
         try:
             query = task.input_data.get("query", "")
-            intent = self._classify_intent(query)
-            keywords = self.extract_keywords(query)
-            entities = self._extract_entities(query)
+            if self.load_datasets is not None and self._is_matcher_stale():
+                index_version = self.search_engine.index_version
+                self._build_matcher(tuple(await self.load_datasets()), index_version)
+            matches = self._match_patterns(query)
+            intent = self._classify_intent(matches)
+            keywords = self.tokenizer.tokenize_query(query)
+            entities = self._extract_entities(matches)
             
             sub_queries = self._decompose_query(query, intent)
             
@@ -44,7 +62,7 @@ class QueryAnalysisAgent(BaseAgent, BQSearchTable):
                 "keywords": keywords,
                 "entities": entities,
                 "sub_queries": sub_queries,
-                "confidence": self._calculate_confidence(query, intent)
+                "confidence": self._calculate_confidence(matches)
             }
             
             task.status = AgentStatus.COMPLETED
@@ -59,14 +77,76 @@ class QueryAnalysisAgent(BaseAgent, BQSearchTable):
         return task
 
     
-    def _classify_intent(self, query: str) -> str:
+    def _is_matcher_stale(self) -> bool:
+        return self.search_engine is not None and (
+            self.matcher is None or self.matcher_version != self.search_engine.index_version
+        )
+
+    
+    def _get_matcher(self) -> AhoCorasick:
+        if self.search_engine is None:
+            return self._build_matcher(tuple(AGENT_DEFAULT_DATASETS), None)
+        if not self._is_matcher_stale():
+            return self.matcher
+        
+        index_version = self.search_engine.index_version
+        return self._build_matcher(tuple(self.search_engine.get_datasets()), index_version)
+
+    
+    def _build_matcher(self, datasets: Tuple[str, ...], index_version: Optional[int]) -> AhoCorasick:
+        if self.matcher is None or datasets != self.matcher_datasets:
+            matcher = AhoCorasick()
+            for intent, patterns in self.intent_patterns.items():
+                for pattern in patterns:
+                    matcher.add(pattern, ("intent", intent))
+            for word in AGENT_TIME_REFERENCES:
+                matcher.add(word, ("time", word))
+            for word in AGENT_METRIC_TERMS:
+                matcher.add(word, ("metric", word))
+            for term in AGENT_DOMAIN_TERMS:
+                matcher.add(term, ("domain", term))
+            for dataset in datasets:
+                if dataset:
+                    matcher.add(dataset.lower(), ("dataset", dataset))
+                    matcher.add(dataset.lower().replace("_", " "), ("dataset", dataset))
+            self.matcher = matcher.build()
+            self.matcher_datasets = datasets
+        
+        self.matcher_version = index_version
+        return self.matcher
+
+    
+    def _match_patterns(self, query: str) -> Dict[str, Dict]:
         query_lower = query.lower()
+        matches = {
+            "intent": defaultdict(set),
+            "dataset": {},
+            "time": set(),
+            "metric": set(),
+            "domain": set()
+        }
+        
+        # one pass over the query for every pattern kind; dataset names must
+        # stand alone so short names do not fire inside other words
+        for start, pattern, (kind, label) in self._get_matcher().iter_matches(query_lower):
+            if kind == "intent":
+                matches["intent"][label].add(pattern)
+            elif kind == "dataset":
+                end = start + len(pattern)
+                if (start == 0 or not query_lower[start - 1].isalnum()) and \
+                    (end == len(query_lower) or not query_lower[end].isalnum()):
+                    matches["dataset"].setdefault(label, start)
+            else:
+                matches[kind].add(label)
         
-        intent_scores = {}
-        for intent, patterns in self.intent_patterns.items():
-            score = sum(1 for pattern in patterns if pattern in query_lower)
-            if score > 0:
-                intent_scores[intent] = score
+        return matches
+
+    
+    def _classify_intent(self, matches: Dict[str, Dict]) -> str:
+        intent_scores = {
+            intent: len(matches["intent"][intent])
+            for intent in self.intent_patterns if matches["intent"].get(intent)
+        }
         
         if intent_scores:
             return max(intent_scores, key=lambda x: intent_scores[x])
@@ -74,29 +154,13 @@ class QueryAnalysisAgent(BaseAgent, BQSearchTable):
         return "general_search"
 
     
-    def _extract_entities(self, query: str) -> Dict[str, List[str]]:
-        entities = {
-            "datasets": [],
+    def _extract_entities(self, matches: Dict[str, Dict]) -> Dict[str, List[str]]:
+        return {
+            "datasets": sorted(matches["dataset"], key=matches["dataset"].get),
             "table_names": [],
-            "time_references": [],
-            "metrics": []
+            "time_references": [word for word in AGENT_TIME_REFERENCES if word in matches["time"]],
+            "metrics": [word for word in AGENT_METRIC_TERMS if word in matches["metric"]]
         }
-        
-        query_lower = query.lower()
-        if "marketing" in query_lower:
-            entities["datasets"].append("marketing")
-        if "sales" in query_lower:
-            entities["datasets"].append("sales")
-        if "analytics" in query_lower:
-            entities["datasets"].append("analytics")
-        
-        time_words = ["daily", "weekly", "monthly", "yearly", "today", "yesterday"]
-        entities["time_references"] = [word for word in time_words if word in query_lower]
-        
-        metric_words = ["revenue", "performance", "clicks", "impressions", "conversions"]
-        entities["metrics"] = [word for word in metric_words if word in query_lower]
-        
-        return entities
 
     
     def _decompose_query(self, query: str, intent: str) -> List[str]:
@@ -107,11 +171,10 @@ class QueryAnalysisAgent(BaseAgent, BQSearchTable):
         return [query]
 
     
-    def _calculate_confidence(self, query: str, intent: str) -> float:
+    def _calculate_confidence(self, matches: Dict[str, Dict]) -> float:
         base_confidence = 0.7
         
-        domain_terms = ["table", "dataset", "column", "data", "bigquery"]
-        domain_matches = sum(1 for term in domain_terms if term in query.lower())
+        domain_matches = len(matches["domain"])
         
         confidence = min(base_confidence + (domain_matches * 0.1), 1.0)
-        return round(confidence, 2)
\ No newline at end of file
+        return round(confidence, 2)
@@ -6,6 +6,7 @@ from datetime import datetime
 from domains.values.agent_status import AgentStatus
 from domains.models.agent_task import AgentTask
 from domains.services.base_agent import BaseAgent
+from domains.values.constant.response_parameter import RENDERED_RESULT_COUNT
 
 
 
@@ -62,7 +63,7 @@ class ResponseGenerationAgent(BaseAgent):
         
         response = f"I found {len(results)} BigQuery table(s) related to '{query}':\n\n"
         
-        for i, result in enumerate(results[:5], 1):  # Show top 5
+        for i, result in enumerate(results[:RENDERED_RESULT_COUNT], 1):
             response += f"{i}. **{result['table_name']}**\n"
             response += f"   - {result['description']}\n"
             response += f"   - Relevance: {result['relevance_score']}\n"
@@ -73,8 +74,8 @@ class ResponseGenerationAgent(BaseAgent):
             
             response += "\n"
         
-        if len(results) > 5:
-            response += f"... and {len(results) - 5} more results.\n"
+        if len(results) > RENDERED_RESULT_COUNT:
+            response += f"... and {len(results) - RENDERED_RESULT_COUNT} more results.\n"
         
         return response
 
@@ -0,0 +1,95 @@
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List, Tuple
+
+from pkg.big_query.benchmark.orchestrator_load_benchmark import generate_queries
+
+
+async def send_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+    host: str, path: str, payload: Dict) -> Tuple[int, bytes]:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST {path} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: keep-alive\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    status = int(head.split(" ", 2)[1])
+    length = 0
+    for line in head.split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+
+    return status, await reader.readexactly(length)
+
+
+async def run_connection(host: str, port: int, path: str, queries: List[str], limit: int,
+    latencies: List[float], errors: List[int]):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for query in queries:
+            start = time.perf_counter()
+            status, _ = await send_request(reader, writer, host, path, {"query": query, "limit": limit})
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_load(host: str, port: int, endpoint: str, queries: List[str], connections: int, limit: int) -> Dict:
+    path = f"/{endpoint}"
+    latencies, errors = [], []
+    # every connection is kept alive and replays its share of the queries
+    shares = [queries[i::connections] for i in range(connections)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_connection(host, port, path, share, limit, latencies, errors)
+        for share in shares if share
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "endpoint": path,
+        "connections": connections,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "throughput_qps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load generator for agent.py serve mode')
+    parser.add_argument('--host', default='127.0.0.1', help='Server address')
+    parser.add_argument('--port', type=int, default=8080, help='Server port')
+    parser.add_argument('--endpoint', default='search', choices=['search', 'chat'], help='Endpoint to load')
+    parser.add_argument('--requests', type=int, default=1000, help='Total requests')
+    parser.add_argument('--connections', type=int, default=16, help='Concurrent keep-alive connections')
+    parser.add_argument('--limit', type=int, default=10, help='Result limit per search')
+    parser.add_argument('--seed', type=int, default=42, help='Query seed')
+    args = parser.parse_args()
+
+    queries = generate_queries(args.requests, args.seed)
+    result = asyncio.run(run_load(args.host, args.port, args.endpoint, queries, args.connections, args.limit))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import sys
+import time
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+
+from pkg.big_query.services.table_search import BQSearchTable
+from pkg.big_query.benchmark.synthetic_catalogue import SyntheticCatalogue
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+
+    return size
+
+
+def build_legacy_keyword_index(search_engine: BQSearchTable) -> Dict[str, List[int]]:
+    # replays the previous process_table_keywords: one entry per keyword
+    # occurrence, and an empty text source re-appends the previous keywords
+    keyword_index = defaultdict(list)
+    previous_keywords = []
+    for table_index, table_info in enumerate(search_engine.tables):
+        for text in search_engine.get_text_sources(table_info):
+            if text:
+                previous_keywords = search_engine.extract_keywords(text)
+            for keyword in previous_keywords:
+                keyword_index[keyword].append(table_index)
+
+    return keyword_index
+
+
+def index_sizeof(search_engine: BQSearchTable) -> int:
+    seen = set()
+    return (
+        deep_sizeof(search_engine.keyword_index, seen) +
+        deep_sizeof(search_engine.term_frequencies, seen) +
+        deep_sizeof(search_engine.document_frequency, seen)
+    )
+
+
+def run(table_count: int, seed: int, compact_storage: bool = False) -> Dict:
+    search_engine = BQSearchTable(compact_storage=compact_storage)
+
+    start = time.perf_counter()
+    for table in SyntheticCatalogue(seed=seed).iter_tables(table_count):
+        search_engine.add_table(table)
+    build_seconds = time.perf_counter() - start
+
+    legacy_index = build_legacy_keyword_index(search_engine)
+    legacy_bytes = deep_sizeof(legacy_index)
+    current_bytes = index_sizeof(search_engine)
+
+    return {
+        "tables": table_count,
+        "vocabulary": len(search_engine.keyword_index),
+        "build_seconds": round(build_seconds, 2),
+        "legacy_postings": sum(len(tables) for tables in legacy_index.values()),
+        "postings": sum(len(tables) for tables in search_engine.keyword_index.values()),
+        "legacy_index_mb": round(legacy_bytes / 2 ** 20, 2),
+        "index_mb": round(current_bytes / 2 ** 20, 2),
+        "reduction": round(1 - current_bytes / legacy_bytes, 4) if legacy_bytes else 0.0,
+        "compact_storage": compact_storage,
+        "tables_mb": round(deep_sizeof(search_engine.tables) / 2 ** 20, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keyword index memory benchmark')
+    parser.add_argument('--tables', type=int, default=100000, help='Synthetic catalogue size')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic catalogue seed')
+    parser.add_argument('--compact-storage', action='store_true', help='Store table metadata in a CompactTableStore')
+    args = parser.parse_args()
+
+    result = run(args.tables, args.seed, args.compact_storage)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
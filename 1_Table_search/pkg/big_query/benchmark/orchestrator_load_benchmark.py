@@ -0,0 +1,94 @@
+import time
+import random
+import asyncio
+import logging
+import argparse
+from typing import Dict, List
+
+from pkg.big_query.services.table_search import BQSearchTable
+from pkg.agentic.service.orchestrator_agent import BQAgentOrchestrator
+from pkg.big_query.benchmark.synthetic_catalogue import SyntheticCatalogue, SUBJECTS, MEASURES, GRAINS
+
+
+QUERY_TEMPLATES = [
+    "Where can I find {grain} {subject} {measure} data?",
+    "Show me tables with {subject} {measure}",
+    "Which tables contain {grain} {subject} information?",
+    "Find {subject} tables related to {measure}"
+]
+
+
+def generate_queries(query_count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        rng.choice(QUERY_TEMPLATES).format(
+            grain=rng.choice(GRAINS),
+            subject=rng.choice(SUBJECTS),
+            measure=rng.choice(MEASURES)
+        )
+        for _ in range(query_count)
+    ]
+
+
+async def run_load(search_engine: BQSearchTable, queries: List[str], workers: int,
+    executor_kind: str, concurrency: int) -> Dict:
+    # the result cache is disabled so every request pays for a full search
+    orchestrator = BQAgentOrchestrator(
+        search_engine,
+        cache_size=0,
+        max_workers=workers,
+        executor_kind=executor_kind
+    )
+    clients = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def client(query: str):
+        async with clients:
+            start = time.perf_counter()
+            await orchestrator.process_query(query)
+            latencies.append(time.perf_counter() - start)
+
+    # warm up the executor outside of the measurement
+    await orchestrator.process_query(queries[0])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(query) for query in queries))
+    elapsed = time.perf_counter() - start
+    await orchestrator.shutdown()
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "executor": executor_kind,
+        "requests": len(queries),
+        "seconds": round(elapsed, 3),
+        "throughput_qps": round(len(queries) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent orchestrator load test')
+    parser.add_argument('--tables', type=int, default=20000, help='Synthetic catalogue size')
+    parser.add_argument('--queries', type=int, default=500, help='Requests per run')
+    parser.add_argument('--concurrency', type=int, default=64, help='Simultaneous clients')
+    parser.add_argument('--workers', default='1,2,4', help='Comma separated worker counts to compare')
+    parser.add_argument('--executor', default='thread', choices=['thread', 'process'],
+                        help='Executor used by the search agent')
+    parser.add_argument('--seed', type=int, default=42, help='Catalogue and query seed')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    search_engine = BQSearchTable()
+    search_engine.add_tables(SyntheticCatalogue(seed=args.seed).iter_tables(args.tables))
+    queries = generate_queries(args.queries, args.seed)
+
+    for workers in (int(count) for count in args.workers.split(',')):
+        result = asyncio.run(run_load(search_engine, queries, workers, args.executor, args.concurrency))
+        print(", ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
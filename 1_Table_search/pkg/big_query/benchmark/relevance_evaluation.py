@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from domains.models.bigquery_table_info import BQTableInfo
+from domains.utils.ranking_metrics import ndcg_at_k, recall_at_k, reciprocal_rank
+from pkg.agentic.service.orchestrator_agent import BQAgentOrchestrator
+from pkg.big_query.services.table_search_test import load_sample_data
+from pkg.big_query.benchmark.synthetic_catalogue import SyntheticCatalogue
+from pkg.big_query.benchmark.search_benchmark_suite import ENGINES, get_commit, summarize_latencies
+
+
+SAMPLE_JUDGMENTS = os.path.join(os.path.dirname(__file__), "fixtures", "sample_golden_queries.jsonl")
+
+QUALITY_METRICS = ["ndcg", "mrr", "recall"]
+
+
+def load_judgments(path: str) -> List[Dict]:
+    """One JSON object per line: {"query": ..., "relevant": {table: grade}
+    or [tables], "filters": {...}}. Tables are dataset.table names and a
+    list grades every table 1."""
+    judgments = []
+    with open(path) as judgments_file:
+        for line in judgments_file:
+            if not line.strip():
+                continue
+
+            judgment = json.loads(line)
+            relevant = judgment["relevant"]
+            if isinstance(relevant, list):
+                relevant = {name: 1 for name in relevant}
+            judgments.append({"query": judgment["query"], "relevant": relevant, "filters": judgment.get("filters")})
+
+    return judgments
+
+
+def generate_synthetic_judgments(tables: List[BQTableInfo], query_count: int, seed: int) -> List[Dict]:
+    """Queries naming the grain, subject and measure of a synthetic table:
+    tables sharing all three are graded 2, other grains of the same
+    subject and measure 1."""
+    by_topic = defaultdict(list)
+    for table in tables:
+        # table names are grain_subject_measure_number
+        by_topic[table.table_name.rsplit('_', 1)[0]].append(table.get_full_name())
+
+    by_subject = defaultdict(list)
+    for topic in by_topic:
+        _, subject_measure = topic.split('_', 1)
+        by_subject[subject_measure].append(topic)
+
+    rng = random.Random(seed)
+    topics = sorted(by_topic)
+    judgments = []
+    for topic in rng.sample(topics, min(query_count, len(topics))):
+        subject_measure = topic.split('_', 1)[1]
+        relevant = {
+            name: 1
+            for other_topic in by_subject[subject_measure] if other_topic != topic
+            for name in by_topic[other_topic]
+        }
+        relevant.update((name, 2) for name in by_topic[topic])
+        judgments.append({"query": topic.replace('_', ' '), "relevant": relevant, "filters": None})
+
+    return judgments
+
+
+def score_ranking(ranked: List[str], relevant: Dict[str, float], k: int) -> Dict:
+    positive = [name for name, grade in relevant.items() if grade > 0]
+    return {
+        "ndcg": round(ndcg_at_k(ranked, relevant, k), 4),
+        "mrr": round(reciprocal_rank(ranked[:k], positive), 4),
+        "recall": round(recall_at_k(ranked, positive, k), 4)
+    }
+
+
+def evaluate(search: Callable[[Dict], List[Dict]], judgments: List[Dict], k: int) -> Dict:
+    search(judgments[0])
+    queries = []
+    latencies = []
+    for judgment in judgments:
+        start = time.perf_counter()
+        results = search(judgment)
+        latencies.append(time.perf_counter() - start)
+
+        ranked = [result["table_name"] for result in results]
+        queries.append({
+            "query": judgment["query"],
+            **score_ranking(ranked, judgment["relevant"], k),
+            "ranked": ranked[:k]
+        })
+
+    return {
+        **{metric: round(sum(query[metric] for query in queries) / len(queries), 4) for metric in QUALITY_METRICS},
+        "latency": summarize_latencies(latencies),
+        "queries": queries
+    }
+
+
+def run(engine: str, target: str, ranking: str, tables: List[BQTableInfo], judgments: List[Dict], k: int) -> Dict:
+    search_engine = ENGINES[engine](ranking)
+    try:
+        search_engine.add_tables(tables)
+        if target == "engine":
+            result = evaluate(lambda judgment: search_engine.search(judgment["query"], k, judgment["filters"]),
+                              judgments, k)
+        else:
+            # the orchestrator adds its own filters from the query analysis;
+            # the result cache is disabled so every query is searched
+            orchestrator = BQAgentOrchestrator(search_engine, cache_size=0)
+            loop = asyncio.new_event_loop()
+            try:
+                result = evaluate(lambda judgment: loop.run_until_complete(orchestrator.find_tables(judgment["query"])),
+                                  judgments, k)
+            finally:
+                loop.run_until_complete(orchestrator.shutdown())
+                loop.close()
+    finally:
+        if hasattr(search_engine, "close"):
+            search_engine.close()
+
+    return {"engine": engine, "target": target, "ranking": ranking, "k": k, **result}
+
+
+def compare(report: Dict, baseline: Dict, quality_tolerance: float, latency_tolerance: float) -> List[str]:
+    """Quality drops above quality_tolerance (absolute) and p50 latency
+    growth above latency_tolerance (a fraction of the baseline) for runs
+    present in both reports."""
+    baseline_runs = {(run["engine"], run["target"], run["ranking"], run["k"]): run for run in baseline["runs"]}
+    regressions = []
+    for result in report["runs"]:
+        previous = baseline_runs.get((result["engine"], result["target"], result["ranking"], result["k"]))
+        if previous is None:
+            continue
+
+        changes = [(metric, previous[metric], result[metric], previous[metric] - result[metric] > quality_tolerance)
+                   for metric in QUALITY_METRICS]
+        before, after = previous["latency"]["p50_ms"], result["latency"]["p50_ms"]
+        changes.append(("latency.p50_ms", before, after, bool(before) and (after - before) / before > latency_tolerance))
+
+        for metric, before, after, regressed in changes:
+            line = f"{result['engine']} {result['target']} {metric}: {before} -> {after}"
+            print(line + ("  REGRESSION" if regressed else ""))
+            if regressed:
+                regressions.append(line)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline relevance evaluation against labelled queries')
+    parser.add_argument('--judgments', default=None,
+                        help='JSONL judgments file (default: the golden queries of the sample catalogue)')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Evaluate on a synthetic catalogue of this size with generated judgments instead')
+    parser.add_argument('--queries', type=int, default=200, help='Generated judgments with --synthetic')
+    parser.add_argument('--target', default='engine', choices=['engine', 'orchestrator'],
+                        help='Search the engine directly or through the agent workflow')
+    parser.add_argument('--engines', default='keyword', help=f'Comma separated engines among {", ".join(ENGINES)}')
+    parser.add_argument('--ranking', default='tf_idf', choices=['tf_idf', 'bm25', 'bm25f'], help='Relevance ranking')
+    parser.add_argument('--k', type=int, default=5, help='Rank cut-off of the metrics (the orchestrator returns 10)')
+    parser.add_argument('--seed', type=int, default=42, help='Catalogue and judgment seed')
+    parser.add_argument('--verbose', action='store_true', help='Print the metrics of every query')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    parser.add_argument('--baseline', default=None, help='JSON report of an earlier commit to compare with')
+    parser.add_argument('--quality-tolerance', type=float, default=0.01,
+                        help='Absolute drop of a mean metric reported as a regression')
+    parser.add_argument('--latency-tolerance', type=float, default=0.2,
+                        help='Relative p50 slowdown over the baseline reported as a regression')
+    args = parser.parse_args()
+
+    unknown_engines = set(args.engines.split(',')) - set(ENGINES)
+    if unknown_engines:
+        parser.error(f"Unknown engines {sorted(unknown_engines)}")
+    if args.synthetic and args.judgments:
+        parser.error("--synthetic generates its own judgments")
+
+    # agent logs would interleave with the report
+    logging.disable(logging.INFO)
+    if args.synthetic:
+        tables = SyntheticCatalogue(seed=args.seed).generate(args.synthetic)
+        judgments = generate_synthetic_judgments(tables, args.queries, args.seed)
+    else:
+        tables = load_sample_data()
+        judgments = load_judgments(args.judgments or SAMPLE_JUDGMENTS)
+
+    runs = []
+    for engine in args.engines.split(','):
+        result = run(engine, args.target, args.ranking, tables, judgments, args.k)
+        runs.append(result)
+        if args.verbose:
+            for query in result["queries"]:
+                print(f"  {query['query']}: ndcg {query['ndcg']}, mrr {query['mrr']}, recall {query['recall']}")
+        print(f"{engine} {args.target}: ndcg@{args.k} {result['ndcg']}, mrr {result['mrr']}, "
+              f"recall@{args.k} {result['recall']}, p50 {result['latency']['p50_ms']} ms, "
+              f"p99 {result['latency']['p99_ms']} ms")
+
+    report = {
+        "metadata": {
+            "commit": get_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "tables": len(tables),
+            "judgments": len(judgments),
+            "config": vars(args)
+        },
+        "runs": runs
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.quality_tolerance, args.latency_tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.baseline}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import platform
+import argparse
+import resource
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from domains.values.retrieval_mode import RetrievalMode
+from pkg.big_query.services.table_search import BQSearchTable
+from pkg.big_query.services.sparse_table_search import SparseBQSearchTable
+from pkg.big_query.services.hybrid_table_search import HybridBQSearchTable
+from pkg.big_query.services.sharded_table_search import ShardedBQSearchTable
+from pkg.big_query.benchmark.synthetic_catalogue import SyntheticCatalogue
+from pkg.big_query.benchmark.orchestrator_load_benchmark import generate_queries
+
+
+ENGINES: Dict[str, Callable[[str], object]] = {
+    "keyword": lambda ranking: BQSearchTable(ranking=ranking),
+    "sparse": lambda ranking: SparseBQSearchTable(ranking=ranking),
+    "hybrid": lambda ranking: HybridBQSearchTable(ranking=ranking, retrieval=RetrievalMode.HYBRID),
+    "dense": lambda ranking: HybridBQSearchTable(ranking=ranking, retrieval=RetrievalMode.DENSE),
+    "sharded": lambda ranking: ShardedBQSearchTable(ranking=ranking)
+}
+
+# compared against a baseline: higher is worse for all but throughput
+COMPARED_METRICS = [
+    ("build_seconds", False),
+    ("index_rss_mb", False),
+    ("latency.query.p50_ms", False),
+    ("latency.query.p99_ms", False),
+    ("latency.typo_query.p50_ms", False),
+    ("latency.suggest.p50_ms", False),
+    ("batch.throughput_qps", True)
+]
+
+
+def get_rss_bytes(pid: str = "self") -> int:
+    # resident set size of a live process; Linux only, 0 elsewhere
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def get_engine_rss_bytes(search_engine) -> int:
+    # shard processes hold the index of a sharded engine
+    processes = getattr(search_engine, "processes", [])
+    return get_rss_bytes() + sum(get_rss_bytes(str(process.pid)) for process in processes)
+
+
+def add_typo(query: str, rng: random.Random) -> str:
+    # one adjacent transposition in the longest word, as users mistype
+    words = query.split()
+    position = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[position]
+    if len(word) >= 5:
+        i = rng.randint(1, len(word) - 3)
+        words[position] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+    return ' '.join(words)
+
+
+def summarize_latencies(latencies: List[float]) -> Dict:
+    latencies = sorted(latencies)
+    def percentile(fraction: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 3)
+
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99)
+    }
+
+
+def measure_latencies(call: Callable[[str], object], inputs: List[str]) -> Dict:
+    call(inputs[0])
+    latencies = []
+    for value in inputs:
+        start = time.perf_counter()
+        call(value)
+        latencies.append(time.perf_counter() - start)
+
+    return summarize_latencies(latencies)
+
+
+def run(engine: str, table_count: int, query_count: int, batch_size: int, ranking: str,
+    seed: int, long_tail_words: int) -> Dict:
+    catalogue = SyntheticCatalogue(seed=seed, max_columns=300, long_tail_words=long_tail_words, skewed_columns=True)
+    tables = catalogue.generate(table_count)
+    rng = random.Random(seed)
+    queries = generate_queries(query_count, seed)
+    typo_queries = [add_typo(query, rng) for query in generate_queries(query_count, seed + 1)]
+    prefixes = [word[:rng.randint(2, 4)] for word in (query.split()[-2] for query in queries)]
+
+    search_engine = ENGINES[engine](ranking)
+    rss_before = get_engine_rss_bytes(search_engine)
+    try:
+        start = time.perf_counter()
+        search_engine.add_tables(tables)
+        build_seconds = time.perf_counter() - start
+        index_rss = get_engine_rss_bytes(search_engine) - rss_before
+
+        latency = {
+            "query": measure_latencies(search_engine.search, queries),
+            "typo_query": measure_latencies(search_engine.search, typo_queries),
+            "suggest": measure_latencies(search_engine.suggest, prefixes)
+        }
+
+        batch = generate_queries(batch_size, seed + 2)
+        start = time.perf_counter()
+        search_engine.search_many(batch)
+        batch_seconds = time.perf_counter() - start
+    finally:
+        if hasattr(search_engine, "close"):
+            search_engine.close()
+
+    return {
+        "engine": engine,
+        "ranking": ranking,
+        "tables": table_count,
+        "columns": sum(len(table.columns) for table in tables),
+        "build_seconds": round(build_seconds, 3),
+        "build_tables_per_second": round(table_count / build_seconds),
+        "index_rss_mb": round(index_rss / 2 ** 20, 1),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10, 1),
+        "latency": latency,
+        "batch": {
+            "queries": batch_size,
+            "seconds": round(batch_seconds, 3),
+            "throughput_qps": round(batch_size / batch_seconds, 1)
+        }
+    }
+
+
+def run_isolated(connection, *args):
+    try:
+        connection.send((True, run(*args)))
+    except Exception as error:
+        connection.send((False, error))
+    connection.close()
+
+
+def run_in_process(*args) -> Dict:
+    # a fresh process per run, so memory figures and caches do not carry
+    # over from the previous catalogue size
+    connection, child_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=run_isolated, args=(child_connection, *args))
+    process.start()
+    # closed here so recv() raises EOFError if the child dies without replying
+    child_connection.close()
+    try:
+        reply = connection.recv()
+    except EOFError:
+        reply = None
+    finally:
+        connection.close()
+    process.join()
+
+    if reply is None or process.exitcode:
+        raise RuntimeError(f"{args[0]} benchmark run over {args[1]} tables exited with code {process.exitcode}")
+    succeeded, result = reply
+    if not succeeded:
+        raise result
+    return result
+
+
+def get_metric(result: Dict, metric: str):
+    for key in metric.split('.'):
+        result = result.get(key) if isinstance(result, dict) else None
+
+    return result
+
+
+def get_scaling(runs: List[Dict]) -> List[Dict]:
+    """Growth exponents between consecutive sizes of one engine: about 0
+    for constant cost, 1 for cost linear in the table count."""
+    scaling = []
+    for previous, current in zip(runs, runs[1:]):
+        if previous["engine"] != current["engine"] or previous["ranking"] != current["ranking"]:
+            continue
+
+        size_ratio = math.log(current["tables"] / previous["tables"])
+        def exponent(metric: str) -> Optional[float]:
+            before, after = get_metric(previous, metric), get_metric(current, metric)
+            return round(math.log(after / before) / size_ratio, 2) if before and after else None
+
+        scaling.append({
+            "engine": current["engine"],
+            "ranking": current["ranking"],
+            "from_tables": previous["tables"],
+            "to_tables": current["tables"],
+            "build_seconds": exponent("build_seconds"),
+            "query_p50_ms": exponent("latency.query.p50_ms"),
+            "query_p99_ms": exponent("latency.query.p99_ms"),
+            "typo_query_p50_ms": exponent("latency.typo_query.p50_ms")
+        })
+
+    return scaling
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Metrics of runs present in both reports that got worse by more than
+    tolerance (a fraction of the baseline)."""
+    baseline_runs = {(run["engine"], run["ranking"], run["tables"]): run for run in baseline["runs"]}
+    regressions = []
+    for result in report["runs"]:
+        previous = baseline_runs.get((result["engine"], result["ranking"], result["tables"]))
+        if previous is None:
+            continue
+
+        for metric, higher_is_better in COMPARED_METRICS:
+            before, after = get_metric(previous, metric), get_metric(result, metric)
+            if not before or after is None:
+                continue
+
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            line = f"{result['engine']} {result['tables']} {metric}: {before} -> {after} ({change:+.1%})"
+            print(line + ("  REGRESSION" if worse > tolerance else ""))
+            if worse > tolerance:
+                regressions.append(line)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search engine benchmark suite over synthetic catalogues')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma separated catalogue sizes (1000000 needs several GB of memory)')
+    parser.add_argument('--engines', default='keyword', help=f'Comma separated engines among {", ".join(ENGINES)}')
+    parser.add_argument('--ranking', default='tf_idf', choices=['tf_idf', 'bm25', 'bm25f'], help='Relevance ranking')
+    parser.add_argument('--queries', type=int, default=200, help='Queries timed one by one per run')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Queries in the search_many throughput run')
+    parser.add_argument('--long-tail-words', type=int, default=200000,
+                        help='Generated long tail vocabulary, so the vocabulary grows with the catalogue')
+    parser.add_argument('--seed', type=int, default=42, help='Catalogue and query seed')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    parser.add_argument('--baseline', default=None, help='JSON report of an earlier commit to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative slowdown over the baseline reported as a regression')
+    parser.add_argument('--in-process', action='store_true', help='Run every size in this process')
+    args = parser.parse_args()
+
+    unknown_engines = set(args.engines.split(',')) - set(ENGINES)
+    if unknown_engines:
+        parser.error(f"Unknown engines {sorted(unknown_engines)}")
+
+    runs = []
+    for engine in args.engines.split(','):
+        for table_count in (int(size) for size in args.sizes.split(',')):
+            run_args = (engine, table_count, args.queries, args.batch_size, args.ranking, args.seed, args.long_tail_words)
+            result = run(*run_args) if args.in_process else run_in_process(*run_args)
+            runs.append(result)
+            print(f"{engine} {table_count}: build {result['build_seconds']}s, index {result['index_rss_mb']} MB, "
+                  f"query p50 {result['latency']['query']['p50_ms']} ms, p99 {result['latency']['query']['p99_ms']} ms, "
+                  f"typo p50 {result['latency']['typo_query']['p50_ms']} ms, "
+                  f"suggest p50 {result['latency']['suggest']['p50_ms']} ms, batch {result['batch']['throughput_qps']} q/s")
+
+    report = {
+        "metadata": {
+            "commit": get_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": vars(args)
+        },
+        "runs": runs,
+        "scaling": get_scaling(runs)
+    }
+    for scaling in report["scaling"]:
+        print(", ".join(f"{key}: {value}" for key, value in scaling.items()))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.baseline}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
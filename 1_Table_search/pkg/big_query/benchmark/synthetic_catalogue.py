@@ -0,0 +1,142 @@
+import random
+from typing import Iterator, List
+
+from domains.models.bigquery_table_info import BQTableInfo
+
+
+DATASETS = [
+    "marketing", "sales", "analytics", "finance", "product", "customer",
+    "operations", "inventory", "logistics", "support", "hr", "billing"
+]
+
+SUBJECTS = [
+    "campaign", "customer", "user", "order", "product", "revenue", "budget",
+    "session", "invoice", "payment", "shipment", "inventory", "ticket",
+    "employee", "subscription", "channel", "region", "store", "supplier",
+    "device", "event", "page", "feature", "account", "lead", "opportunity"
+]
+
+MEASURES = [
+    "impressions", "clicks", "conversions", "spend", "revenue", "units",
+    "sessions", "duration", "views", "amount", "balance", "count", "rate",
+    "score", "latency", "errors", "returns", "discount", "margin", "cost"
+]
+
+GRAINS = ["daily", "weekly", "monthly", "hourly", "yearly", "snapshot", "summary", "history"]
+
+QUALIFIERS = [
+    "active", "total", "unique", "average", "planned", "actual", "target",
+    "gross", "net", "new", "churned", "paid", "organic", "regional"
+]
+
+SYLLABLES = [
+    "ba", "co", "da", "fe", "gi", "ka", "lo", "mi", "na", "po", "ra", "se",
+    "ti", "vo", "xu", "zen", "tor", "lan", "mar", "quo", "ser", "vel", "dro", "nix"
+]
+
+FILLER = [
+    "metrics", "data", "report", "tracking", "details", "information",
+    "statistics", "performance", "allocation", "analysis", "overview"
+]
+
+
+class SyntheticCatalogue:
+    """Deterministic generator of BigQuery-like table metadata.
+
+    Words are drawn with a Zipf-like skew so a few subjects and measures
+    dominate the vocabulary, as they do in real warehouses.
+
+    By default the vocabulary is fixed and column counts are uniform.
+    long_tail_words adds that many generated domain words (product codes,
+    system and team names), drawn with the same skew, so the vocabulary
+    keeps growing with the catalogue. skewed_columns draws column counts
+    from a log-normal, giving many narrow tables and a few very wide ones.
+    """
+
+    def __init__(self, seed: int = 42, min_columns: int = 3, max_columns: int = 40,
+        long_tail_words: int = 0, skewed_columns: bool = False):
+        self.seed = seed
+        self.min_columns = min_columns
+        self.max_columns = max_columns
+        self.skewed_columns = skewed_columns
+        self.long_tail = self._long_tail_vocabulary(long_tail_words)
+
+    def _long_tail_vocabulary(self, word_count: int) -> List[str]:
+        rng = random.Random(f"long-tail-{self.seed}")
+        words = {}
+        while len(words) < word_count:
+            word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            words[word] = None
+
+        return list(words)
+
+    def _pick_long_tail(self, rng: random.Random) -> str:
+        # log-uniform rank (Zipf with exponent about 1): new words keep
+        # appearing as the catalogue grows
+        return self.long_tail[int(len(self.long_tail) ** rng.random()) - 1]
+
+    def _pick(self, rng: random.Random, words: List[str]) -> str:
+        position = int(rng.paretovariate(1.2)) - 1
+        return words[position % len(words)]
+
+    def _column(self, rng: random.Random) -> dict:
+        subject = self._pick(rng, SUBJECTS)
+        measure = self._pick(rng, MEASURES)
+
+        shape = rng.random()
+        if shape < 0.3:
+            name = f"{subject}_id"
+            description = f"{subject.capitalize()} identifier"
+        elif shape < 0.8:
+            qualifier = self._pick(rng, QUALIFIERS)
+            name = f"{qualifier}_{measure}"
+            description = f"{qualifier.capitalize()} {measure} for the {subject}"
+        else:
+            name = measure
+            description = f"Number of {measure}"
+
+        if self.long_tail and rng.random() < 0.25:
+            word = self._pick_long_tail(rng)
+            name = f"{word}_{name}"
+            description = f"{description} from {word}"
+
+        return {"name": name, "description": description}
+
+    def _column_count(self, rng: random.Random) -> int:
+        if self.skewed_columns:
+            return max(self.min_columns, min(int(rng.lognormvariate(2.3, 0.8)), self.max_columns))
+
+        return rng.randint(self.min_columns, self.max_columns)
+
+    def generate_table(self, rng: random.Random, table_number: int) -> BQTableInfo:
+        dataset = self._pick(rng, DATASETS)
+        subject = self._pick(rng, SUBJECTS)
+        grain = self._pick(rng, GRAINS)
+        measure = self._pick(rng, MEASURES)
+
+        columns = [self._column(rng) for _ in range(self._column_count(rng))]
+        tags = list(dict.fromkeys([dataset, subject, grain] + [self._pick(rng, FILLER) for _ in range(rng.randint(0, 3))]))
+        description = (
+            f"{grain.capitalize()} {subject} {self._pick(rng, FILLER)} including "
+            f"{measure}, {self._pick(rng, MEASURES)} and {self._pick(rng, QUALIFIERS)} {self._pick(rng, MEASURES)}"
+        )
+        if self.long_tail:
+            description = f"{description} for {self._pick_long_tail(rng)}"
+
+        return BQTableInfo(
+            dataset=dataset,
+            table_name=f"{grain}_{subject}_{measure}_{table_number}",
+            description=description,
+            columns=columns,
+            tags=tags,
+            last_modified=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            row_count=int(rng.lognormvariate(9, 2.5))
+        )
+
+    def iter_tables(self, table_count: int) -> Iterator[BQTableInfo]:
+        rng = random.Random(self.seed)
+        for table_number in range(table_count):
+            yield self.generate_table(rng, table_number)
+
+    def generate(self, table_count: int) -> List[BQTableInfo]:
+        return list(self.iter_tables(table_count))
@@ -0,0 +1,75 @@
+import re
+import time
+import argparse
+from typing import Callable, Dict, List
+
+from domains.utils.tokenizer import Tokenizer
+from domains.values.constant.common_stop_words import STOP_WORDS
+from pkg.big_query.services.table_search import BQSearchTable
+from pkg.big_query.benchmark.synthetic_catalogue import SyntheticCatalogue
+from pkg.big_query.benchmark.orchestrator_load_benchmark import generate_queries
+
+
+def legacy_extract_keywords(text: str) -> List[str]:
+    # the previous BaseBQSearchTable.extract_keywords, minus its shared state
+    if not text:
+        return []
+
+    words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
+    return [word for word in words if word not in STOP_WORDS and len(word) > 2]
+
+
+def measure(tokenize: Callable[[str], List[str]], texts: List[str], rounds: int) -> Dict:
+    tokens = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            tokens += len(tokenize(text))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_second": round(tokens / elapsed),
+        "texts_per_second": round(len(texts) * rounds / elapsed)
+    }
+
+
+def run(table_count: int, query_count: int, distinct_queries: int, rounds: int, seed: int) -> Dict[str, Dict]:
+    search_engine = BQSearchTable()
+    documents = [
+        text
+        for table in SyntheticCatalogue(seed=seed).iter_tables(table_count)
+        for text in search_engine.get_text_sources(table)
+    ]
+    # a query stream where distinct_queries strings repeat, as in chat traffic
+    distinct = generate_queries(distinct_queries, seed)
+    queries = [distinct[i % len(distinct)] for i in range(query_count)]
+
+    tokenizer = Tokenizer()
+    return {
+        "documents_legacy": measure(legacy_extract_keywords, documents, rounds),
+        "documents_tokenizer": measure(tokenizer.tokenize, documents, rounds),
+        "documents_split_identifiers": measure(Tokenizer(split_identifiers=True).tokenize, documents, rounds),
+        "queries_legacy": measure(legacy_extract_keywords, queries, rounds),
+        "queries_tokenizer": measure(tokenizer.tokenize, queries, rounds),
+        "queries_memoized": measure(tokenizer.tokenize_query, queries, rounds)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keyword tokenizer micro-benchmark')
+    parser.add_argument('--tables', type=int, default=20000, help='Synthetic tables used as documents')
+    parser.add_argument('--queries', type=int, default=100000, help='Queries in the query stream')
+    parser.add_argument('--distinct-queries', type=int, default=500, help='Distinct strings in the query stream')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over each corpus')
+    parser.add_argument('--seed', type=int, default=42, help='Catalogue and query seed')
+    args = parser.parse_args()
+
+    results = run(args.tables, args.queries, args.distinct_queries, args.rounds, args.seed)
+    for name, result in results.items():
+        print(f"{name}: " + ", ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+
+import re
+import csv
+import gzip
+import json
+from datetime import datetime, timezone
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from domains.models.bigquery_table_info import BQTableInfo
+
+
+TableKey = Tuple[str, str]
+
+
+def open_export(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_export_rows(path: str) -> Iterator[Dict]:
+    """Yield rows of a JSONL or CSV export (optionally gzipped) one at a time."""
+    file_name = path[:-len('.gz')] if path.endswith('.gz') else path
+    is_csv = file_name.endswith('.csv')
+
+    with open_export(path) as export_file:
+        if is_csv:
+            yield from csv.DictReader(export_file)
+        else:
+            for line in export_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def get_table_key(row: Dict) -> TableKey:
+    return row.get('table_schema', ''), row.get('table_name', '')
+
+
+def iter_ordered_groups(rows: Iterable[Dict]) -> Iterator[Tuple[TableKey, List[Dict]]]:
+    # the merge join below needs both exports ordered by table_schema,
+    # table_name (ORDER BY in the export query); out of order keys fail fast
+    previous_key = None
+    for key, group in groupby(rows, key=get_table_key):
+        if previous_key is not None and key <= previous_key:
+            raise ValueError(f"Export is not ordered by table_schema, table_name at {key[0]}.{key[1]}")
+        previous_key = key
+        yield key, list(group)
+
+
+def merge_table_rows(rows: List[Dict]) -> Dict:
+    # TABLE_OPTIONS style exports carry one option_name/option_value row per
+    # option; they are folded into a single row next to any TABLES columns
+    table_row = {}
+    for row in rows:
+        if 'option_name' in row:
+            value = row.get('option_value')
+            if isinstance(value, str) and value.startswith('"'):
+                value = json.loads(value)
+            table_row[row['option_name']] = value
+            table_row.update({key: value for key, value in row.items() if key not in ('option_name', 'option_value', 'option_type')})
+        else:
+            table_row.update(row)
+
+    return table_row
+
+
+def parse_last_modified(row: Dict) -> str:
+    value = row.get('last_modified_time') or row.get('last_modified') or row.get('creation_time')
+    if value in (None, ''):
+        return ""
+
+    # __TABLES__ exports epoch milliseconds, INFORMATION_SCHEMA timestamps
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+    return str(value)[:10]
+
+
+def parse_tags(row: Dict) -> List[str]:
+    labels = row.get('tags', row.get('labels'))
+    if not labels:
+        return []
+    if isinstance(labels, str):
+        label_structs = re.findall(r'STRUCT\("([^"]*)",\s*"([^"]*)"\)', labels)
+        if label_structs:
+            return [value for _, value in label_structs]
+        try:
+            labels = json.loads(labels)
+        except ValueError:
+            return [label.strip() for label in labels.split(',') if label.strip()]
+    if isinstance(labels, dict):
+        return [str(value) for value in labels.values()]
+
+    return [str(label) for label in labels]
+
+
+def build_table_info(key: TableKey, table_row: Optional[Dict], column_rows: List[Dict]) -> BQTableInfo:
+    table_row = table_row or {}
+    columns = [
+        {
+            "name": column.get('field_path') or column.get('column_name', ''),
+            "description": column.get('description') or ''
+        }
+        for column in column_rows
+    ]
+
+    return BQTableInfo(
+        dataset=key[0],
+        table_name=key[1],
+        description=table_row.get('description') or '',
+        columns=columns,
+        tags=parse_tags(table_row),
+        last_modified=parse_last_modified(table_row),
+        row_count=int(table_row.get('row_count') or 0)
+    )
+
+
+def iter_catalogue_tables(tables_path: Optional[str] = None,
+    columns_path: Optional[str] = None) -> Iterator[BQTableInfo]:
+    """Stream BQTableInfo from INFORMATION_SCHEMA.TABLES / COLUMN_FIELD_PATHS exports.
+
+    Both exports are read lazily and merge-joined on (table_schema,
+    table_name), so only one table's rows are held in memory at a time.
+    Either export may be omitted.
+    """
+    if tables_path is None and columns_path is None:
+        raise ValueError("At least one of tables_path or columns_path is required")
+
+    tables = iter_ordered_groups(iter_export_rows(tables_path)) if tables_path else iter(())
+    columns = iter_ordered_groups(iter_export_rows(columns_path)) if columns_path else iter(())
+
+    table_group = next(tables, None)
+    column_group = next(columns, None)
+    while table_group is not None or column_group is not None:
+        if column_group is None or (table_group is not None and table_group[0] < column_group[0]):
+            key, table_rows = table_group
+            yield build_table_info(key, merge_table_rows(table_rows), [])
+            table_group = next(tables, None)
+        elif table_group is None or column_group[0] < table_group[0]:
+            key, column_rows = column_group
+            yield build_table_info(key, None, column_rows)
+            column_group = next(columns, None)
+        else:
+            key, table_rows = table_group
+            yield build_table_info(key, merge_table_rows(table_rows), column_group[1])
+            table_group = next(tables, None)
+            column_group = next(columns, None)
+
+
+def iter_batches(tables: Iterable[BQTableInfo], batch_size: int) -> Iterator[List[BQTableInfo]]:
+    tables = iter(tables)
+    while True:
+        batch = list(islice(tables, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def ingest_catalogue(search_engine, tables_path: Optional[str] = None,
+    columns_path: Optional[str] = None, batch_size: int = 1000) -> int:
+
+    ingested = 0
+    for batch in iter_batches(iter_catalogue_tables(tables_path, columns_path), batch_size):
+        search_engine.add_tables(batch)
+        ingested += len(batch)
+
+    return ingested
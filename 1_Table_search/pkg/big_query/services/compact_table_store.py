@@ -0,0 +1,149 @@
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Iterator, List
+
+from domains.models.bigquery_table_info import BQTableInfo
+
+
+class StringTable:
+    """Interns repeated strings (datasets, tags, column names, dates) as ids."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: str) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.ids[value] = value_id
+            self.values.append(value)
+
+        return value_id
+
+
+class BQTableView:
+    """Read-only BQTableInfo look-alike backed by a CompactTableStore row."""
+
+    __slots__ = ('store', 'table_index')
+
+    def __init__(self, store: "CompactTableStore", table_index: int):
+        self.store = store
+        self.table_index = table_index
+
+    @property
+    def dataset(self) -> str:
+        return self.store.strings.values[self.store.dataset_ids[self.table_index]]
+
+    @property
+    def table_name(self) -> str:
+        return self.store.table_names[self.table_index]
+
+    @property
+    def description(self) -> str:
+        return self.store.descriptions[self.table_index]
+
+    @property
+    def columns(self) -> List[Dict[str, str]]:
+        store, values = self.store, self.store.strings.values
+        start, end = store.column_offsets[self.table_index], store.column_offsets[self.table_index + 1]
+        return [
+            {"name": values[name_id], "description": values[description_id]}
+            for name_id, description_id in zip(store.column_name_ids[start:end], store.column_description_ids[start:end])
+        ]
+
+    @property
+    def tags(self) -> List[str]:
+        store, values = self.store, self.store.strings.values
+        start, end = store.tag_offsets[self.table_index], store.tag_offsets[self.table_index + 1]
+        return [values[tag_id] for tag_id in store.tag_ids[start:end]]
+
+    @property
+    def last_modified(self) -> str:
+        return self.store.strings.values[self.store.last_modified_ids[self.table_index]]
+
+    @property
+    def row_count(self) -> int:
+        return self.store.row_counts[self.table_index]
+
+    def get_full_name(self) -> str:
+        return f"{self.dataset}.{self.table_name}"
+
+    def to_table_info(self) -> BQTableInfo:
+        return BQTableInfo(
+            dataset=self.dataset,
+            table_name=self.table_name,
+            description=self.description,
+            columns=self.columns,
+            tags=self.tags,
+            last_modified=self.last_modified,
+            row_count=self.row_count
+        )
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BQTableView):
+            other = other.to_table_info()
+        return self.to_table_info() == other
+
+    def __repr__(self) -> str:
+        return f"BQTableView({self.get_full_name()!r})"
+
+
+class CompactTableStore(Sequence):
+    """Columnar table catalogue: one row of packed arrays per table.
+
+    Column names/descriptions and tags are stored as ids into a shared
+    StringTable, so a catalogue with 100k+ tables holds each distinct string
+    once instead of one dict per column. Only the "name" and "description"
+    keys of a column are kept.
+    """
+
+    def __init__(self):
+        self.strings = StringTable()
+        self.dataset_ids = array('I')
+        self.table_names: List[str] = []
+        self.descriptions: List[str] = []
+        self.last_modified_ids = array('I')
+        self.row_counts = array('q')
+        self.column_offsets = array('Q', [0])
+        self.column_name_ids = array('I')
+        self.column_description_ids = array('I')
+        self.tag_offsets = array('Q', [0])
+        self.tag_ids = array('I')
+
+    def append(self, table_info: BQTableInfo):
+        strings = self.strings
+        self.dataset_ids.append(strings.add(table_info.dataset))
+        self.table_names.append(table_info.table_name)
+        self.descriptions.append(table_info.description)
+        self.last_modified_ids.append(strings.add(table_info.last_modified))
+        self.row_counts.append(table_info.row_count)
+
+        for column in table_info.columns:
+            self.column_name_ids.append(strings.add(column.get('name', '')))
+            self.column_description_ids.append(strings.add(column.get('description', '')))
+        self.column_offsets.append(len(self.column_name_ids))
+
+        self.tag_ids.extend(strings.add(tag) for tag in table_info.tags)
+        self.tag_offsets.append(len(self.tag_ids))
+
+    def extend(self, tables):
+        for table_info in tables:
+            self.append(table_info)
+
+    def __getitem__(self, table_index):
+        if isinstance(table_index, slice):
+            return [self[i] for i in range(*table_index.indices(len(self)))]
+        if table_index < 0:
+            table_index += len(self)
+        if not 0 <= table_index < len(self):
+            raise IndexError("table index out of range")
+
+        return BQTableView(self, table_index)
+
+    def __iter__(self) -> Iterator[BQTableView]:
+        for table_index in range(len(self)):
+            yield BQTableView(self, table_index)
+
+    def __len__(self) -> int:
+        return len(self.table_names)
@@ -0,0 +1,196 @@
+
+import copy
+import heapq
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from domains.models.bigquery_table_info import BQTableInfo
+from domains.utils.stage_metrics import stage_metrics
+from domains.utils.tokenizer import Tokenizer
+from domains.utils.hashing_text_encoder import HashingTextEncoder, create_text_encoder
+from domains.services.base_text_encoder import BaseTextEncoder
+from domains.values.ranking_mode import RankingMode
+from domains.values.retrieval_mode import RetrievalMode
+from domains.values.constant.ranking_parameter import BM25_B, BM25_K1, RECENCY_HALF_LIFE_DAYS
+from domains.values.constant.vector_search_parameter import DENSE_MIN_SIMILARITY, FUSION_DEPTH, RRF_K
+from pkg.big_query.services.vector_index import IVFVectorIndex
+from pkg.big_query.services.table_search import BQSearchTable, init_search_worker, search_worker
+
+
+class HybridBQSearchTable(BQSearchTable):
+    """BQSearchTable with dense retrieval next to the keyword index.
+
+    Every table's text is embedded by a local encoder into an
+    IVFVectorIndex row (row i is table index i). Dense retrieval ranks
+    tables by cosine similarity to the query embedding, hybrid retrieval
+    fuses the keyword and dense rankings with reciprocal rank fusion, and
+    keyword retrieval is plain BQSearchTable. Snapshots write the vectors
+    to <path>.vectors, memory-mapped on load like the keyword index.
+    """
+
+    def __init__(self, compact_storage: bool = False, tokenizer: Optional[Tokenizer] = None,
+        ranking: RankingMode = RankingMode.TF_IDF, field_weights: Optional[Dict[str, float]] = None,
+        k1: float = BM25_K1, b: float = BM25_B, fuzzy: bool = True, recency_weight: float = 0.0,
+        recency_half_life: float = RECENCY_HALF_LIFE_DAYS, retrieval: RetrievalMode = RetrievalMode.HYBRID,
+        encoder: Optional[BaseTextEncoder] = None, rrf_k: int = RRF_K, fusion_depth: int = FUSION_DEPTH,
+        min_similarity: float = DENSE_MIN_SIMILARITY):
+        super().__init__(compact_storage=compact_storage, tokenizer=tokenizer, ranking=ranking,
+                         field_weights=field_weights, k1=k1, b=b, fuzzy=fuzzy, recency_weight=recency_weight,
+                         recency_half_life=recency_half_life)
+        self.retrieval = RetrievalMode(retrieval)
+        self.encoder = encoder or HashingTextEncoder()
+        self.vector_index = IVFVectorIndex(self.encoder.dimension)
+        self.rrf_k = rrf_k
+        self.fusion_depth = fusion_depth
+        self.min_similarity = min_similarity
+
+    def __getstate__(self) -> Dict:
+        state = super().__getstate__()
+        if self.snapshot is not None:
+            state.update(retrieval=self.retrieval, encoder=self.encoder, rrf_k=self.rrf_k,
+                         fusion_depth=self.fusion_depth, min_similarity=self.min_similarity)
+        return state
+
+    def __setstate__(self, state: Dict):
+        if 'keyword_index' not in state:
+            self.__init__(compact_storage=state['compact_storage'], fuzzy=state['fuzzy'],
+                          retrieval=state['retrieval'], encoder=state['encoder'],
+                          rrf_k=state['rrf_k'], fusion_depth=state['fusion_depth'],
+                          min_similarity=state['min_similarity'])
+            self.open_snapshot(state['snapshot_path'])
+            self.configure_ranking(**state['ranking'])
+        else:
+            super().__setstate__(state)
+
+    def __copy__(self):
+        source = super().__copy__()
+        source.vector_index = copy.copy(self.vector_index)
+        return source
+
+
+    def save_snapshot(self, path: str):
+        with self.mutation_lock:
+            super().save_snapshot(path)
+            self.vector_index.save(f"{path}.vectors", {"encoder": self.encoder.get_config()})
+
+        return self
+
+
+    def open_snapshot(self, path: str):
+        with self.mutation_lock, self.index_lock:
+            super().open_snapshot(path)
+            self.vector_index = IVFVectorIndex.load(f"{path}.vectors")
+            # queries must be encoded the way the snapshot was indexed
+            encoder_config = self.vector_index.metadata["encoder"]
+            if encoder_config != self.encoder.get_config():
+                self.encoder = create_text_encoder(encoder_config)
+
+        return self
+
+
+    def compact_table_metadata(self, live_tables: List[int], new_positions: List[int],
+        removed_tables: Set[int]) -> Dict:
+        return {
+            **super().compact_table_metadata(live_tables, new_positions, removed_tables),
+            'vector_index': self.vector_index.take(live_tables)
+        }
+
+
+    def replay_table_metadata(self, compacted: Dict, added_tables: range, offset: int):
+        super().replay_table_metadata(compacted, added_tables, offset)
+        if added_tables:
+            compacted['vector_index'].add(self.vector_index.vectors[added_tables.start:])
+
+
+    def get_vector_text(self, table_info: BQTableInfo) -> str:
+        return ' '.join(self.get_text_sources(table_info))
+
+
+    def process_table_metadata(self, table_info: BQTableInfo, table_index: int):
+        super().process_table_metadata(table_info, table_index)
+        self.vector_index.add(self.encoder.encode([self.get_vector_text(table_info)]))
+
+
+    def search_vectors(self, query: str, limit: int, filter_tables: Optional[Set[int]] = None,
+        min_similarity: float = 0.0) -> List[Tuple[int, float]]:
+        query_vector = self.encoder.encode([query])[0]
+        if not np.any(query_vector):
+            return []
+
+        return self.vector_index.search(query_vector, limit, filter_tables, self.removed_tables,
+                                        max(min_similarity, self.min_similarity))
+
+
+    def fuse_rankings(self, rankings: List[List[Tuple[int, float]]], limit: int) -> List[Tuple[int, float]]:
+        # reciprocal rank fusion, ties by table index like keyword search
+        fused_scores = defaultdict(float)
+        for ranking in rankings:
+            for rank, (table_index, _) in enumerate(ranking, 1):
+                fused_scores[table_index] += 1.0 / (self.rrf_k + rank)
+
+        top_tables = heapq.nsmallest(limit, (
+            (-round(score, 6), table_index) for table_index, score in fused_scores.items()
+        ))
+        return [(table_index, -negative_score) for negative_score, table_index in top_tables]
+
+
+    def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        """Top tables for query. filters hold dataset and tags for every
+        retrieval mode; min_score bounds the keyword score in hybrid mode
+        and the cosine similarity in dense mode (never below min_similarity)."""
+        if self.retrieval is RetrievalMode.KEYWORD:
+            return super().search(query, limit, filters)
+
+        if not query.strip():
+            return []
+
+        with stage_metrics.span("search.tokenize"):
+            query_keywords = self.extract_query_keywords(query)
+
+        min_score = (filters or {}).get("min_score", 0.0)
+        depth = max(limit, self.fusion_depth)
+        with self.index_lock:
+            with stage_metrics.span("search.filter"):
+                filter_tables = self.get_filter_tables(filters)
+            if filter_tables is not None and not filter_tables:
+                return []
+
+            if self.retrieval is RetrievalMode.DENSE:
+                with stage_metrics.span("search.dense"):
+                    top_tables = [
+                        (table_index, round(similarity, 4))
+                        for table_index, similarity in self.search_vectors(query, limit, filter_tables, min_score)
+                    ]
+            else:
+                keyword_tables = []
+                if query_keywords:
+                    with stage_metrics.span("search.expand"):
+                        query_keywords = self.expand_query_keywords(query_keywords)
+                    keyword_tables = self.select_top_tables(query_keywords, depth, filter_tables=filter_tables,
+                                                            min_score=min_score)
+                with stage_metrics.span("search.dense"):
+                    dense_tables = self.search_vectors(query, depth, filter_tables)
+                with stage_metrics.span("search.fuse"):
+                    top_tables = self.fuse_rankings([keyword_tables, dense_tables], limit)
+
+            with stage_metrics.span("search.format"):
+                return [
+                    self.format_result(table_index, score, query_keywords)
+                    for table_index, score in top_tables
+                ]
+
+
+    def search_many(self, queries: List[str], limit: int = 10,
+        processes: Optional[int] = None, chunk_size: int = 64) -> List[List[Dict]]:
+        if self.retrieval is RetrievalMode.KEYWORD:
+            return super().search_many(queries, limit, processes, chunk_size)
+
+        if processes and processes > 1 and len(queries) > chunk_size:
+            with ProcessPoolExecutor(max_workers=processes, initializer=init_search_worker,
+                initargs=(self,)) as executor:
+                return list(executor.map(search_worker, queries, [limit] * len(queries), chunksize=chunk_size))
+
+        return [self.search(query, limit) for query in queries]
@@ -0,0 +1,305 @@
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from dataclasses import fields
+from functools import lru_cache, partial
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, List, Tuple
+
+from domains.models.bigquery_table_info import BQTableInfo
+from domains.utils.tokenizer import Tokenizer
+from pkg.big_query.services.tag_cooccurrence_index import TagCooccurrenceIndex
+from domains.values.constant.index_snapshot_format import INDEX_SNAPSHOT_MAGIC, INDEX_SNAPSHOT_VERSION
+
+
+# magic, format version, header length
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+TABLE_FIELDS = [field.name for field in fields(BQTableInfo)]
+
+
+class SnapshotKeys(Sequence):
+    """Sorted UTF-8 keys concatenated in a memory-mapped section; a key's
+    position is found by binary search, so opening decodes nothing."""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+        # the keys of a query are looked up by several maps in a row
+        self.find = lru_cache(maxsize=65536)(self.search)
+
+    def __getitem__(self, position: int) -> str:
+        return str(self.data[self.offsets[position]:self.offsets[position + 1]], 'utf-8')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+    def search(self, key: str) -> int:
+        """Position of key, -1 when absent."""
+        target = key.encode('utf-8')
+        offsets, data = self.offsets, self.data
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if data[offsets[middle]:offsets[middle + 1]].tobytes() < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(offsets) - 1 and data[offsets[low]:offsets[low + 1]].tobytes() == target:
+            return low
+        return -1
+
+
+class SnapshotArrayMap(Mapping):
+    """Read-only key -> uint32 array view over a memory-mapped section."""
+
+    def __init__(self, keys: SnapshotKeys, offsets: memoryview, values: memoryview):
+        self.keys_section = keys
+        self.offsets = offsets
+        self.values = values
+
+    def __getitem__(self, key: str) -> memoryview:
+        position = self.keys_section.find(key)
+        if position < 0:
+            raise KeyError(key)
+
+        return self.values[self.offsets[position]:self.offsets[position + 1]]
+
+    def __iter__(self):
+        return iter(self.keys_section)
+
+    def __len__(self) -> int:
+        return len(self.keys_section)
+
+
+class SnapshotValueMap(Mapping):
+    """Read-only key -> uint32 value over a memory-mapped section."""
+
+    def __init__(self, keys: SnapshotKeys, values: memoryview):
+        self.keys_section = keys
+        self.values = values
+
+    def __getitem__(self, key: str) -> int:
+        position = self.keys_section.find(key)
+        if position < 0:
+            raise KeyError(key)
+
+        return self.values[position]
+
+    def __iter__(self):
+        return iter(self.keys_section)
+
+    def __len__(self) -> int:
+        return len(self.keys_section)
+
+
+class SnapshotTables(Sequence):
+    """Table metadata decoded from its JSON record on access."""
+
+    def __init__(self, offsets: memoryview, records: memoryview):
+        self.offsets = offsets
+        self.records = records
+
+    def __getitem__(self, table_index):
+        if isinstance(table_index, slice):
+            return [self[i] for i in range(*table_index.indices(len(self)))]
+        if table_index < 0:
+            table_index += len(self)
+        if not 0 <= table_index < len(self):
+            raise IndexError("table index out of range")
+
+        record = self.records[self.offsets[table_index]:self.offsets[table_index + 1]]
+        return BQTableInfo(**json.loads(bytes(record)))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+def concat_keys(keys: List[str]) -> Tuple[array, bytearray]:
+    data = bytearray()
+    offsets = array('Q', [0])
+    for key in keys:
+        data += key.encode('utf-8')
+        offsets.append(len(data))
+
+    return offsets, data
+
+
+def concat_arrays(arrays, typecode: str) -> Tuple[array, array]:
+    values = array(typecode)
+    offsets = array('Q', [0])
+    for item in arrays:
+        values.extend(item)
+        offsets.append(len(values))
+
+    return offsets, values
+
+
+def write_sections(path: str, magic: bytes, version: int, header: Dict, sections: List[Tuple[str, object]]):
+    """Writes magic, version and a JSON header followed by 8-byte aligned
+    binary sections, whose layout is added to the header."""
+    layout = {}
+    position = 0
+    for name, data in sections:
+        position += -position % ALIGNMENT
+        size = len(data) * getattr(data, 'itemsize', 1)
+        layout[name] = [position, size, getattr(data, 'typecode', 'B')]
+        position += size
+
+    header = json.dumps({**header, "byteorder": sys.byteorder, "sections": layout}, separators=(',', ':')).encode('utf-8')
+
+    body_start = PREAMBLE.size + len(header)
+    body_start += -body_start % ALIGNMENT
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(PREAMBLE.pack(magic, version, len(header)))
+        snapshot_file.write(header)
+        for name, data in sections:
+            snapshot_file.seek(body_start + layout[name][0])
+            snapshot_file.write(data)
+        snapshot_file.truncate(body_start + position)
+    os.replace(temporary_path, path)
+
+
+def map_sections(path: str, magic: bytes, version: int, kind: str) -> Tuple[mmap.mmap, Dict, Callable[[str], memoryview]]:
+    """Maps a file written by write_sections; returns the mapping, its
+    header and a function giving zero-copy views of its sections."""
+    with open(path, 'rb') as snapshot_file:
+        mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    found_magic, found_version, header_length = PREAMBLE.unpack_from(mapped, 0)
+    if found_magic != magic:
+        raise ValueError(f"{path} is not a {kind}")
+    if found_version != version:
+        raise ValueError(f"Unsupported {kind} version {found_version}, expected {version}")
+
+    header = json.loads(mapped[PREAMBLE.size:PREAMBLE.size + header_length])
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+
+    body_start = PREAMBLE.size + header_length
+    body_start += -body_start % ALIGNMENT
+    buffer = memoryview(mapped)
+
+    def section(name: str) -> memoryview:
+        offset, size, typecode = header["sections"][name]
+        view = buffer[body_start + offset:body_start + offset + size]
+        return view if typecode == 'B' else view.cast(typecode)
+
+    return mapped, header, section
+
+
+def write_snapshot(search_engine, path: str):
+    # code point order is UTF-8 byte order, which SnapshotKeys searches in
+    terms = sorted(search_engine.keyword_index)
+    fragments = sorted(search_engine.fragment_index)
+    term_key_offsets, term_keys = concat_keys(terms)
+    fragment_key_offsets, fragment_keys = concat_keys(fragments)
+
+    term_offsets, term_tables = concat_arrays((search_engine.keyword_index[term] for term in terms), 'I')
+    _, term_frequencies = concat_arrays((search_engine.term_frequencies[term] for term in terms), 'I')
+    document_frequency = array('I', (search_engine.document_frequency[term] for term in terms))
+    fragment_offsets, fragment_tables = concat_arrays((search_engine.fragment_index[fragment] for fragment in fragments), 'I')
+    group_offsets, group_tables = concat_arrays(search_engine.tag_cooccurrence.group_tables, 'I')
+    # only BM25F engines keep per field term frequencies
+    field_frequency_offsets, field_frequencies = concat_arrays(
+        (search_engine.field_frequencies[term] for term in terms), 'I'
+    ) if search_engine.field_frequencies else (array('Q', [0]), array('I'))
+
+    table_records = bytearray()
+    table_offsets = array('Q', [0])
+    for table in search_engine.tables:
+        record = {name: getattr(table, name) for name in TABLE_FIELDS}
+        table_records += json.dumps(record, separators=(',', ':')).encode('utf-8')
+        table_offsets.append(len(table_records))
+
+    sections = [
+        ("term_key_offsets", term_key_offsets),
+        ("term_keys", term_keys),
+        ("fragment_key_offsets", fragment_key_offsets),
+        ("fragment_keys", fragment_keys),
+        ("term_offsets", term_offsets),
+        ("term_tables", term_tables),
+        ("term_frequencies", term_frequencies),
+        ("document_frequency", document_frequency),
+        ("fragment_offsets", fragment_offsets),
+        ("fragment_tables", fragment_tables),
+        ("group_offsets", group_offsets),
+        ("group_tables", group_tables),
+        ("field_frequency_offsets", field_frequency_offsets),
+        ("field_frequencies", field_frequencies),
+        ("doc_lengths", array('I', search_engine.doc_lengths)),
+        ("field_lengths", array('I', search_engine.field_lengths)),
+        ("modified_days", array('i', search_engine.modified_days)),
+        ("usage_codes", array('B', search_engine.usage_codes)),
+        ("table_offsets", table_offsets),
+        ("table_records", table_records)
+    ]
+
+    write_sections(path, INDEX_SNAPSHOT_MAGIC, INDEX_SNAPSHOT_VERSION, {
+        "table_count": len(search_engine.tables),
+        "tag_groups": search_engine.tag_cooccurrence.group_keys,
+        "tokenizer": search_engine.tokenizer.get_config(),
+        "ranking": search_engine.get_ranking_config(),
+        "doc_length_total": search_engine.doc_length_total,
+        "field_length_totals": search_engine.field_length_totals
+    }, sections)
+
+
+def read_snapshot(search_engine, path: str):
+    mapped, header, section = map_sections(path, INDEX_SNAPSHOT_MAGIC, INDEX_SNAPSHOT_VERSION, "table index snapshot")
+
+    # queries must be tokenized the way the snapshot was indexed
+    search_engine.tokenizer = Tokenizer(**header["tokenizer"])
+    terms = SnapshotKeys(section("term_key_offsets"), section("term_keys"))
+    fragments = SnapshotKeys(section("fragment_key_offsets"), section("fragment_keys"))
+    term_offsets = section("term_offsets")
+    search_engine.keyword_index = SnapshotArrayMap(terms, term_offsets, section("term_tables"))
+    search_engine.term_frequencies = SnapshotArrayMap(terms, term_offsets, section("term_frequencies"))
+    search_engine.document_frequency = SnapshotValueMap(terms, section("document_frequency"))
+    search_engine.fragment_index = SnapshotArrayMap(fragments, section("fragment_offsets"), section("fragment_tables"))
+    search_engine.fragment_lookup = {}
+    group_offsets, group_tables = section("group_offsets"), section("group_tables")
+    search_engine.tag_cooccurrence = TagCooccurrenceIndex.from_groups(
+        ((dataset, tuple(tags)) for dataset, tags in header["tag_groups"]),
+        [group_tables[group_offsets[i]:group_offsets[i + 1]] for i in range(len(group_offsets) - 1)]
+    )
+    search_engine.doc_lengths = section("doc_lengths")
+    field_frequency_offsets = section("field_frequency_offsets")
+    if len(field_frequency_offsets) > 1:
+        search_engine.field_frequencies = SnapshotArrayMap(terms, field_frequency_offsets, section("field_frequencies"))
+    else:
+        search_engine.field_frequencies = defaultdict(partial(array, 'I'))
+    search_engine.field_lengths = section("field_lengths")
+    search_engine.modified_days = section("modified_days")
+    search_engine.usage_codes = section("usage_codes")
+    search_engine.doc_length_total = header["doc_length_total"]
+    search_engine.field_length_totals = header["field_length_totals"]
+    search_engine.tables = SnapshotTables(section("table_offsets"), section("table_records"))
+
+    # nothing of an index the engine held before is kept: tombstones, the
+    # name map (rebuilt on first use) and every derived structure or cache
+    search_engine.table_positions = {}
+    search_engine.removed_tables = set()
+    search_engine.vocabulary_trigrams = None
+    search_engine.fragment_trigrams = None
+    search_engine.fuzzy_cache = {}
+    search_engine.related_cache = {}
+    search_engine.recency_order = None
+    search_engine.index_version += 1
+    # configured once the snapshot's tables are in, so BM25F over a snapshot
+    # without field frequencies rebuilds them from those tables
+    search_engine.configure_ranking(**header["ranking"])
+
+    search_engine.snapshot = mapped
+    search_engine.snapshot_path = path
+
+    return search_engine
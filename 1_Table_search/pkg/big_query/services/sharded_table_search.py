@@ -0,0 +1,409 @@
+
+import zlib
+import heapq
+import threading
+import multiprocessing
+from operator import itemgetter
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from domains.models.bigquery_table_info import BQTableInfo
+from domains.utils.stage_metrics import stage_metrics
+from domains.utils.tokenizer import Tokenizer
+from domains.values.ranking_mode import RankingMode
+from domains.values.shard_partition import ShardPartition
+from domains.values.constant.ranking_parameter import BM25_B, BM25_K1, RECENCY_HALF_LIFE_DAYS, TABLE_TEXT_FIELDS
+from pkg.big_query.services.table_search import BQSearchTable
+
+
+# table count, doc length total, field length totals and the document
+# frequencies of the query keywords, summed over every shard
+CollectionStatistics = Tuple[int, int, List[int], Dict[str, int]]
+
+
+class ShardBQSearchTable(BQSearchTable):
+    """One partition of a ShardedBQSearchTable.
+
+    Scores are computed with the statistics of the whole collection sent
+    along with each search, so a table scores exactly as it would in a
+    single BQSearchTable holding every shard.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.collection_statistics: Optional[CollectionStatistics] = None
+
+
+    def get_document_frequency(self, keyword: str) -> int:
+        if self.collection_statistics is None:
+            return super().get_document_frequency(keyword)
+
+        return self.collection_statistics[3].get(keyword, 0)
+
+
+    def get_collection_statistics(self) -> Tuple[int, int, List[int]]:
+        if self.collection_statistics is None:
+            return super().get_collection_statistics()
+
+        return self.collection_statistics[:3]
+
+
+    def index_tables(self, tables: List[BQTableInfo]):
+        self.add_tables(tables)
+
+
+    def upsert_tables(self, tables: List[BQTableInfo]):
+        for table_info in tables:
+            self.upsert_table(table_info)
+
+
+    def get_shard_statistics(self) -> Tuple[int, int, List[int], Dict[str, int], List[str]]:
+        with self.index_lock:
+            return (*super().get_collection_statistics(), dict(self.document_frequency), list(self.fragment_index))
+
+
+    def search_shard(self, batch_keywords: List[Tuple[str, ...]], limit: int, filters: Optional[Dict],
+        collection_statistics: CollectionStatistics) -> List[List[Dict]]:
+        with self.index_lock:
+            self.collection_statistics = collection_statistics
+            try:
+                filter_tables = self.get_filter_tables(filters)
+                if filter_tables is not None and not filter_tables:
+                    return [[] for _ in batch_keywords]
+
+                keyword_cache = {}
+                min_score = (filters or {}).get("min_score", 0.0)
+                return [
+                    self.rank_keywords(list(query_keywords), limit, keyword_cache, filter_tables, min_score)
+                    for query_keywords in batch_keywords
+                ]
+            finally:
+                self.collection_statistics = None
+
+
+    def get_table_tags(self, full_name: str) -> Optional[Tuple[str, List[str]]]:
+        with self.index_lock:
+            table_index = self.get_table_position(full_name)
+            if table_index is None:
+                return None
+
+            table_info = self.tables[table_index]
+            return table_info.dataset, list(table_info.tags)
+
+
+    def get_related_candidates(self, dataset: str, tags: List[str], limit: int,
+        min_shared_tags: int) -> List[Tuple[str, int, bool]]:
+        # (full name, shared tag count, same dataset) in this shard's ranking
+        with self.index_lock:
+            tag_set = set(tags)
+            candidates = []
+            for table_index in self.tag_cooccurrence.get_related(dataset, tags, limit, min_shared_tags,
+                                                                 self.removed_tables):
+                table_info = self.tables[table_index]
+                candidates.append((table_info.get_full_name(), len(tag_set & set(table_info.tags)),
+                                   table_info.dataset == dataset))
+
+            return candidates
+
+
+def run_shard(connection, engine_options: Dict):
+    # serves (method, args) requests until None is received
+    search_engine = ShardBQSearchTable(**engine_options)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        method, args = request
+        try:
+            connection.send((True, getattr(search_engine, method)(*args)))
+        except Exception as error:
+            connection.send((False, error))
+
+    connection.close()
+
+
+class ShardedBQSearchTable:
+    """Tables partitioned over shard processes, searched by scatter-gather.
+
+    Each shard process holds a ShardBQSearchTable over the tables hashed
+    to it, by full name or by dataset. Queries are tokenized and fuzzy
+    expanded here against the vocabulary of every shard, then scattered
+    with the collection wide table count, length totals and document
+    frequencies, so per shard scores equal single engine scores. The per
+    shard top results are merged by score, ties going to the table added
+    first, which is the single engine ordering.
+
+    Requests share one connection per shard and are serialized; the
+    shards of one request run in parallel.
+    """
+
+    def __init__(self, shards: int = 4, partition: ShardPartition = ShardPartition.TABLE_NAME,
+        tokenizer: Optional[Tokenizer] = None, ranking: RankingMode = RankingMode.TF_IDF,
+        field_weights: Optional[Dict[str, float]] = None, k1: float = BM25_K1, b: float = BM25_B,
+        fuzzy: bool = True, compact_storage: bool = False, recency_weight: float = 0.0,
+        recency_half_life: float = RECENCY_HALF_LIFE_DAYS):
+        if shards < 1:
+            raise ValueError(f"At least one shard is needed, got {shards}")
+
+        self.partition = ShardPartition(partition)
+        self.tokenizer = tokenizer or Tokenizer()
+        self.fuzzy = fuzzy
+        engine_options = {
+            "compact_storage": compact_storage, "tokenizer": self.tokenizer, "ranking": ranking,
+            "field_weights": field_weights, "k1": k1, "b": b, "fuzzy": False,
+            "recency_weight": recency_weight, "recency_half_life": recency_half_life
+        }
+
+        context = multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        for shard in range(shards):
+            connection, shard_connection = context.Pipe()
+            process = context.Process(target=run_shard, args=(shard_connection, engine_options),
+                                      name=f"BQSearchShard-{shard}", daemon=True)
+            process.start()
+            shard_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        # full table name -> (shard, insertion sequence); the sequence breaks
+        # score ties across shards
+        self.table_locations: Dict[str, Tuple[int, int]] = {}
+        self.table_sequence = 0
+        self.index_version = 0
+        # collection statistics and a vocabulary only engine for query
+        # expansion and completions, rebuilt after the index changes
+        self.statistics: Optional[Tuple[int, int, List[int], Dict[str, int]]] = None
+        self.vocabulary: Optional[BQSearchTable] = None
+        self.statistics_version = None
+        self.statistics_lock = threading.Lock()
+        self.request_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        with self.request_lock:
+            for connection, process in zip(self.connections, self.processes):
+                if process.is_alive():
+                    connection.send(None)
+                    process.join()
+                connection.close()
+            self.connections = []
+            self.processes = []
+
+
+    def call_shards(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, Any]:
+        """Sends shard -> (method, args) requests, then gathers the replies."""
+        with self.request_lock:
+            for shard, request in requests.items():
+                self.connections[shard].send(request)
+
+            replies = {shard: self.connections[shard].recv() for shard in requests}
+
+        for succeeded, reply in replies.values():
+            if not succeeded:
+                raise reply
+
+        return {shard: reply for shard, (_, reply) in replies.items()}
+
+
+    def broadcast(self, method: str, *args) -> List[Any]:
+        replies = self.call_shards({shard: (method, args) for shard in range(len(self.connections))})
+        return [replies[shard] for shard in range(len(self.connections))]
+
+
+    def get_shard(self, table_info: BQTableInfo) -> int:
+        key = table_info.dataset if self.partition is ShardPartition.DATASET else table_info.get_full_name()
+        return zlib.crc32(key.encode('utf-8')) % len(self.connections)
+
+
+    def dispatch_tables(self, method: str, tables: Iterable[BQTableInfo]):
+        shard_tables = defaultdict(list)
+        for table_info in tables:
+            shard = self.get_shard(table_info)
+            shard_tables[shard].append(table_info)
+            self.table_locations[table_info.get_full_name()] = (shard, self.table_sequence)
+            self.table_sequence += 1
+
+        if shard_tables:
+            self.call_shards({shard: (method, (shard_batch,)) for shard, shard_batch in shard_tables.items()})
+            self.index_version += 1
+
+
+    def add_table(self, table_info: BQTableInfo):
+        return self.add_tables([table_info])
+
+
+    def add_tables(self, tables: Iterable[BQTableInfo], batch_size: int = 1024):
+        batch = []
+        for table_info in tables:
+            batch.append(table_info)
+            if len(batch) >= batch_size:
+                self.dispatch_tables("index_tables", batch)
+                batch = []
+        self.dispatch_tables("index_tables", batch)
+
+        return self
+
+
+    def upsert_table(self, table_info: BQTableInfo):
+        self.dispatch_tables("upsert_tables", [table_info])
+        return self
+
+
+    def remove_table(self, full_name: str) -> bool:
+        location = self.table_locations.pop(full_name, None)
+        if location is None:
+            return False
+
+        removed = self.call_shards({location[0]: ("remove_table", (full_name,))})[location[0]]
+        self.index_version += 1
+        return removed
+
+
+    def get_table_count(self) -> int:
+        return sum(self.broadcast("get_table_count"))
+
+
+    def get_datasets(self) -> List[str]:
+        return list(dict.fromkeys(dataset for datasets in self.broadcast("get_datasets") for dataset in datasets))
+
+
+    def get_vocabulary(self) -> BQSearchTable:
+        with self.statistics_lock:
+            if self.statistics_version != self.index_version:
+                self.update_statistics()
+
+            return self.vocabulary
+
+
+    def update_statistics(self):
+        # a change made during the broadcast leaves the statistics stale
+        index_version = self.index_version
+        shard_statistics = self.broadcast("get_shard_statistics")
+        document_frequency = defaultdict(int)
+        fragments = set()
+        for _, _, _, shard_frequency, shard_fragments in shard_statistics:
+            for keyword, frequency in shard_frequency.items():
+                document_frequency[keyword] += frequency
+            fragments.update(shard_fragments)
+
+        self.statistics = (
+            sum(statistics[0] for statistics in shard_statistics),
+            sum(statistics[1] for statistics in shard_statistics),
+            [sum(statistics[2][field] for statistics in shard_statistics) for field in range(len(TABLE_TEXT_FIELDS))],
+            dict(document_frequency)
+        )
+        # expand_query_keywords and suggest only read the vocabulary,
+        # fragments and document frequencies
+        vocabulary = BQSearchTable(tokenizer=self.tokenizer, fuzzy=self.fuzzy)
+        vocabulary.keyword_index = dict.fromkeys(document_frequency, ())
+        vocabulary.fragment_index = dict.fromkeys(fragments, ())
+        vocabulary.document_frequency = self.statistics[3]
+        self.vocabulary = vocabulary
+        self.statistics_version = index_version
+
+
+    def get_query_statistics(self, batch_keywords: Iterable[Tuple[str, ...]]) -> CollectionStatistics:
+        table_count, doc_length_total, field_length_totals, document_frequency = self.statistics
+        return table_count, doc_length_total, field_length_totals, {
+            keyword: document_frequency[keyword]
+            for query_keywords in batch_keywords for keyword in query_keywords
+            if keyword in document_frequency
+        }
+
+
+    def gather_results(self, batch_keywords: List[Tuple[str, ...]], limit: int,
+        filters: Optional[Dict] = None) -> List[List[Dict]]:
+        statistics = self.get_query_statistics(batch_keywords)
+        with stage_metrics.span("search.scatter"):
+            shard_results = self.broadcast("search_shard", batch_keywords, limit, filters, statistics)
+
+        def rank_results(position: int):
+            for results in shard_results:
+                for result in results[position]:
+                    # tables removed while the shards searched are left out
+                    location = self.table_locations.get(result['table_name'])
+                    if location is not None:
+                        yield (-result['relevance_score'], location[1]), result
+
+        with stage_metrics.span("search.merge"):
+            return [
+                [result for _, result in heapq.nsmallest(limit, rank_results(position), key=itemgetter(0))]
+                for position in range(len(batch_keywords))
+            ]
+
+
+    def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        """Top tables for query; filters may hold dataset, tags and min_score."""
+        if not query.strip():
+            return []
+
+        with stage_metrics.span("search.tokenize"):
+            query_keywords = self.tokenizer.tokenize_query(query)
+
+        if not query_keywords:
+            return []
+
+        with stage_metrics.span("search.expand"):
+            query_keywords = self.get_vocabulary().expand_query_keywords(query_keywords)
+
+        return self.gather_results([tuple(query_keywords)], limit, filters)[0]
+
+
+    def search_many(self, queries: List[str], limit: int = 10, **_) -> List[List[Dict]]:
+        # one scatter for the whole batch; queries normalizing to the same
+        # keywords are scored once, as in BQSearchTable.search_many
+        vocabulary = self.get_vocabulary()
+        batch_keywords = [
+            tuple(vocabulary.expand_query_keywords(self.tokenizer.tokenize_query(query))) if query.strip() else ()
+            for query in queries
+        ]
+        unique_keywords = list(dict.fromkeys(query_keywords for query_keywords in batch_keywords if query_keywords))
+        results_by_keywords = dict(zip(unique_keywords, self.gather_results(unique_keywords, limit)))
+
+        returned = set()
+        results = []
+        for query_keywords in batch_keywords:
+            query_results = results_by_keywords.get(query_keywords, [])
+            if query_keywords in returned:
+                query_results = [dict(result) for result in query_results]
+            returned.add(query_keywords)
+            results.append(query_results)
+
+        return results
+
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        return self.get_vocabulary().suggest(prefix, limit)
+
+
+    def get_related_tables(self, full_name: str, limit: int = 3, min_shared_tags: int = 2) -> List[str]:
+        """BQSearchTable.get_related_tables over every shard."""
+        location = self.table_locations.get(full_name)
+        if location is None or limit <= 0:
+            return []
+
+        table_tags = self.call_shards({location[0]: ("get_table_tags", (full_name,))})[location[0]]
+        if table_tags is None:
+            return []
+
+        # ranked by shared tag count (same dataset tables below
+        # min_shared_tags last), then same dataset first, then table order
+        dataset, tags = table_tags
+        candidates = []
+        for shard_candidates in self.broadcast("get_related_candidates", dataset, tags, limit + 1, min_shared_tags):
+            for name, shared_tags, same_dataset in shard_candidates:
+                # tables removed while the shards were asked are left out
+                location = self.table_locations.get(name)
+                if name != full_name and location is not None:
+                    rank = (shared_tags < min_shared_tags, -shared_tags, not same_dataset, location[1])
+                    candidates.append((rank, name))
+
+        return [name for _, name in heapq.nsmallest(limit, candidates, key=itemgetter(0))]
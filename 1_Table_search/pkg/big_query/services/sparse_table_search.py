@@ -0,0 +1,249 @@
+
+from typing import List, Dict, Optional, Set, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from domains.utils.stage_metrics import stage_metrics
+from domains.utils.tokenizer import Tokenizer
+from domains.values.ranking_mode import RankingMode
+from domains.utils.table_attributes import today_epoch_day
+from domains.values.constant.ranking_parameter import BM25_B, BM25_K1, RECENCY_HALF_LIFE_DAYS, TABLE_TEXT_FIELDS
+from domains.values.constant.table_freshness_parameter import UNKNOWN_MODIFIED_DAY
+from pkg.big_query.services.table_search import BQSearchTable
+
+
+class SparseBQSearchTable(BQSearchTable):
+    """BQSearchTable scored with sparse matrix products.
+
+    The keyword index is compiled into a CSR term x table matrix holding
+    the per posting relevance weight ((tf / doc_length) * idf, or the BM25 /
+    BM25F weight), so the TF-IDF part of calculate_combined_score
+    for a batch of queries (see search_many) is one sparse product. The
+    substring keyword-match part is a second product against per-keyword
+    table indicator rows.
+    """
+
+    def __init__(self, compact_storage: bool = False, tokenizer: Optional[Tokenizer] = None,
+        ranking: RankingMode = RankingMode.TF_IDF, field_weights: Optional[Dict[str, float]] = None,
+        k1: float = BM25_K1, b: float = BM25_B, fuzzy: bool = True, recency_weight: float = 0.0,
+        recency_half_life: float = RECENCY_HALF_LIFE_DAYS):
+        super().__init__(compact_storage=compact_storage, tokenizer=tokenizer, ranking=ranking,
+                         field_weights=field_weights, k1=k1, b=b, fuzzy=fuzzy, recency_weight=recency_weight,
+                         recency_half_life=recency_half_life)
+        self.term_ids: Dict[str, int] = {}
+        self.term_matrix = None
+        self.compiled_version = None
+        self.keyword_match_rows: Dict[str, np.ndarray] = {}
+
+
+    def compile(self):
+        terms = list(self.keyword_index)
+        total_tables = len(self.tables)
+        self.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        self.keyword_match_rows = {}
+        self.compiled_version = self.index_version
+
+        if not terms:
+            self.term_matrix = csr_matrix((0, total_tables), dtype=np.float64)
+            return self
+
+        postings_lengths = np.array([len(self.keyword_index[term]) for term in terms], dtype=np.int64)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(postings_lengths, out=indptr[1:])
+
+        indices = np.concatenate([np.frombuffer(self.keyword_index[term], dtype=np.uintc) for term in terms])
+        tfs = np.concatenate([np.frombuffer(self.term_frequencies[term], dtype=np.uintc) for term in terms])
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uintc)
+        document_frequency = np.array([self.document_frequency.get(term, 0) for term in terms], dtype=np.float64)
+
+        if self.ranking is RankingMode.TF_IDF:
+            with np.errstate(divide='ignore'):
+                idf = np.log(self.get_table_count() / document_frequency)
+            data = (tfs / doc_lengths[indices]) * np.repeat(idf, postings_lengths)
+        else:
+            data = self.get_bm25_data(terms, postings_lengths, indices, tfs, document_frequency)
+        if self.removed_tables:
+            data[np.isin(indices, self.get_removed_array())] = 0.0
+
+        self.term_matrix = csr_matrix((data, indices.astype(np.int64), indptr), shape=(len(terms), total_tables))
+        return self
+
+
+    def get_bm25_data(self, terms: List[str], postings_lengths: np.ndarray, indices: np.ndarray,
+        tfs: np.ndarray, document_frequency: np.ndarray) -> np.ndarray:
+        # vectorized BQSearchTable.get_bm25_weights, same operation order
+        k1, b = self.bm25_k1, self.bm25_b
+        table_count = self.get_table_count()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            idf = np.repeat(np.log(1 + (table_count - document_frequency + 0.5) / (document_frequency + 0.5)),
+                            postings_lengths)
+
+        if self.ranking is RankingMode.BM25:
+            average_length = self.doc_length_total / table_count or 1.0
+            base, slope = k1 * (1 - b), k1 * b / average_length
+            doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uintc)
+            return idf * (tfs * (k1 + 1)) / (tfs + base + slope * doc_lengths[indices])
+
+        field_count = len(TABLE_TEXT_FIELDS)
+        field_frequencies = np.concatenate([
+            np.frombuffer(self.field_frequencies[term], dtype=np.uintc) for term in terms
+        ]).reshape(-1, field_count)
+        field_lengths = np.frombuffer(self.field_lengths, dtype=np.uintc).reshape(-1, field_count)[indices]
+        base = 1 - b
+        pseudo_tfs = np.zeros(len(indices), dtype=np.float64)
+        for field, total in enumerate(self.field_length_totals):
+            slope = b / (total / table_count) if total else 0.0
+            tf = field_frequencies[:, field]
+            pseudo_tfs += np.divide(self.field_weights[field] * tf, base + slope * field_lengths[:, field],
+                                    out=np.zeros(len(indices), dtype=np.float64), where=tf > 0)
+
+        return idf * (pseudo_tfs * (k1 + 1)) / (pseudo_tfs + k1)
+
+
+    def get_removed_array(self) -> np.ndarray:
+        return np.fromiter(self.removed_tables, dtype=np.uintc, count=len(self.removed_tables))
+
+
+    def get_keyword_match_row(self, keyword: str) -> np.ndarray:
+        row = self.keyword_match_rows.get(keyword)
+        if row is None:
+            fragment_tables = [
+                np.frombuffer(self.fragment_index[fragment], dtype=np.uintc)
+                for fragment in self.get_matching_fragments(keyword)
+            ]
+            row = np.unique(np.concatenate(fragment_tables)) if fragment_tables else np.empty(0, dtype=np.uintc)
+            if self.removed_tables:
+                row = np.setdiff1d(row, self.get_removed_array(), assume_unique=True)
+            self.keyword_match_rows[keyword] = row
+
+        return row
+
+
+    def score_batch(self, batch_keywords: List[Tuple[str, ...]]) -> csr_matrix:
+        # any add/remove/compaction bumps index_version, and IDF depends on
+        # the live table count, so the matrix is rebuilt lazily after one
+        if self.term_matrix is None or self.compiled_version != self.index_version:
+            self.compile()
+
+        total_tables = len(self.tables)
+        keywords = list(dict.fromkeys(keyword for query_keywords in batch_keywords for keyword in query_keywords))
+        keyword_ids = {keyword: keyword_id for keyword_id, keyword in enumerate(keywords)}
+
+        term_rows, term_cols, term_weights = [], [], []
+        match_rows, match_cols, match_weights = [], [], []
+        for row, query_keywords in enumerate(batch_keywords):
+            for keyword in query_keywords:
+                term_id = self.term_ids.get(keyword)
+                if term_id is not None:
+                    term_rows.append(row)
+                    term_cols.append(term_id)
+                    term_weights.append(0.6)
+                match_rows.append(row)
+                match_cols.append(keyword_ids[keyword])
+                match_weights.append(0.4 / len(query_keywords))
+
+        # duplicate (row, col) entries are summed, so repeated query keywords
+        # weigh in as often as they appear, as in calculate_combined_score
+        query_terms = csr_matrix(
+            (term_weights, (term_rows, term_cols)),
+            shape=(len(batch_keywords), self.term_matrix.shape[0])
+        )
+        query_matches = csr_matrix(
+            (match_weights, (match_rows, match_cols)),
+            shape=(len(batch_keywords), len(keywords))
+        )
+
+        match_indices = [self.get_keyword_match_row(keyword) for keyword in keywords]
+        match_indptr = np.zeros(len(keywords) + 1, dtype=np.int64)
+        np.cumsum([len(indices) for indices in match_indices], out=match_indptr[1:])
+        keyword_tables = csr_matrix(
+            (
+                np.ones(match_indptr[-1], dtype=np.float64),
+                np.concatenate(match_indices).astype(np.int64) if match_indices else np.empty(0, dtype=np.int64),
+                match_indptr
+            ),
+            shape=(len(keywords), total_tables)
+        )
+
+        return (query_terms @ self.term_matrix + query_matches @ keyword_tables).tocsr()
+
+
+    def get_recency_boosts(self, table_indexes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        # the vectorized apply_recency_boost
+        modified_days = np.frombuffer(self.modified_days, dtype=np.intc)[table_indexes].astype(np.int64)
+        boosts = self.recency_weight * 0.5 ** (np.maximum(today_epoch_day() - modified_days, 0) / self.recency_half_life)
+        return np.where((scores > 0) & (modified_days != UNKNOWN_MODIFIED_DAY), boosts, 0.0)
+
+
+    def select_top(self, table_indexes: np.ndarray, scores: np.ndarray, limit: int,
+        filter_tables: Optional[np.ndarray] = None, min_score: float = 0.0) -> List[tuple]:
+        keep = scores > 0
+        if filter_tables is not None:
+            keep &= np.isin(table_indexes, filter_tables)
+        table_indexes, scores = table_indexes[keep], scores[keep]
+        if limit <= 0 or not len(scores):
+            return []
+
+        rounded = np.round(scores, 4)
+        if min_score > 0:
+            keep = rounded >= min_score
+            table_indexes, scores, rounded = table_indexes[keep], scores[keep], rounded[keep]
+        if len(rounded) > limit:
+            kth_score = np.partition(rounded, len(rounded) - limit)[len(rounded) - limit]
+            keep = rounded >= kth_score
+            table_indexes, scores, rounded = table_indexes[keep], scores[keep], rounded[keep]
+
+        order = np.lexsort((table_indexes, -rounded))[:limit]
+        return [(int(table_indexes[i]), float(scores[i])) for i in order]
+
+
+    def search_keywords(self, batch_keywords: List[Tuple[str, ...]], limit: int = 10,
+        filter_tables: Optional[Set[int]] = None, min_score: float = 0.0) -> List[List[Dict]]:
+        if not batch_keywords:
+            return []
+
+        if filter_tables is not None:
+            filter_tables = np.fromiter(filter_tables, dtype=np.int64, count=len(filter_tables))
+
+        with self.index_lock:
+            with stage_metrics.span("search.scoring"):
+                scored = self.score_batch(batch_keywords)
+
+            results = []
+            for row, query_keywords in enumerate(batch_keywords):
+                start, end = scored.indptr[row], scored.indptr[row + 1]
+                table_indexes, scores = scored.indices[start:end], scored.data[start:end]
+                if self.recency_weight:
+                    scores = scores + self.get_recency_boosts(table_indexes, scores)
+                with stage_metrics.span("search.sort"):
+                    top_tables = self.select_top(table_indexes, scores, limit, filter_tables, min_score)
+                with stage_metrics.span("search.format"):
+                    results.append([
+                        self.format_result(table_index, round(score, 4), query_keywords)
+                        for table_index, score in top_tables
+                    ])
+
+        return results
+
+
+    def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        if not query.strip():
+            return []
+
+        with stage_metrics.span("search.tokenize"):
+            query_keywords = self.extract_query_keywords(query)
+
+        if not query_keywords:
+            return []
+
+        with self.index_lock:
+            with stage_metrics.span("search.expand"):
+                query_keywords = self.expand_query_keywords(query_keywords)
+            with stage_metrics.span("search.filter"):
+                filter_tables = self.get_filter_tables(filters)
+            if filter_tables is not None and not filter_tables:
+                return []
+
+            return self.search_keywords([query_keywords], limit, filter_tables,
+                                        (filters or {}).get("min_score", 0.0))[0]
@@ -1,130 +1,1079 @@
 
 import re
+import copy
 import math
-from typing import List, Dict
+import heapq
+import threading
+from array import array
+from functools import partial
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import List, Dict, Iterable, Optional, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
 
 from domains.models.bigquery_table_info import BQTableInfo
+from domains.models.table_search_result import TableSearchResult
+from domains.utils.stage_metrics import stage_metrics
+from domains.utils.tokenizer import Tokenizer
+from domains.utils.trigram_index import TrigramIndex
+from domains.utils.table_attributes import classify_usage, to_epoch_day, today_epoch_day
 from domains.services.base_bq_table_search import BaseBQSearchTable
+from domains.values.ranking_mode import RankingMode
+from domains.values.constant.ranking_parameter import (
+    BM25_B, BM25_K1, BM25F_FIELD_WEIGHTS, RECENCY_HALF_LIFE_DAYS, TABLE_TEXT_FIELDS
+)
+from domains.values.constant.table_freshness_parameter import UNKNOWN_MODIFIED_DAY
+from domains.values.constant.fuzzy_match_parameter import FUZZY_ONE_EDIT_MIN_LENGTH, FUZZY_TWO_EDITS_MIN_LENGTH
+from pkg.big_query.services.index_snapshot import write_snapshot, read_snapshot
+from pkg.big_query.services.compact_table_store import CompactTableStore
+from pkg.big_query.services.tag_cooccurrence_index import TagCooccurrenceIndex
 
 
-class BQSearchTable(BaseBQSearchTable): 
-    def __init__(self): 
-        super().__init__()
+class BQSearchTable(BaseBQSearchTable):
+    def __init__(self, compact_storage: bool = False, tokenizer: Optional[Tokenizer] = None,
+        ranking: RankingMode = RankingMode.TF_IDF, field_weights: Optional[Dict[str, float]] = None,
+        k1: float = BM25_K1, b: float = BM25_B, fuzzy: bool = True, recency_weight: float = 0.0,
+        recency_half_life: float = RECENCY_HALF_LIFE_DAYS):
+        super().__init__(tokenizer)
+        # token counts per text field of each table (len(TABLE_TEXT_FIELDS)
+        # per table) and running length totals, so average lengths are O(1);
+        # per field term frequencies are postings sized and only kept for BM25F
+        self.field_lengths = array('I')
+        self.doc_length_total = 0
+        self.field_length_totals = [0] * len(TABLE_TEXT_FIELDS)
+        self.field_frequencies: Dict[str, array] = defaultdict(partial(array, 'I'))
+        # compact_storage keeps table metadata in a columnar store and exposes
+        # lightweight views through self.tables
+        self.compact_storage = compact_storage
+        self.tables = self.new_table_storage()
+        # maximal [a-z] runs of the lowercased table text -> table indexes,
+        # used to answer the substring based keyword match score
+        self.fragment_index: Dict[str, array] = defaultdict(partial(array, 'I'))
+        self.fragment_lookup: Dict[str, List[str]] = {}
+        # character trigrams over the keyword vocabulary (typo expansion and
+        # completions) and over the fragments (substring keyword match);
+        # built on first use, then kept current as new keys are indexed
+        self.vocabulary_trigrams: Optional[TrigramIndex] = None
+        self.fragment_trigrams: Optional[TrigramIndex] = None
+        # query keywords found nowhere in the catalogue are replaced by their
+        # closest vocabulary term, cached until the index changes
+        self.fuzzy = fuzzy
+        self.fuzzy_cache: Dict[Tuple[str, int], List[str]] = {}
+        self.fuzzy_cache_version = None
+        # tables grouped by dataset and tag set, to find related tables
+        # without walking the catalogue
+        self.tag_cooccurrence = TagCooccurrenceIndex()
+        self.related_cache: Dict[Tuple, List[int]] = {}
+        self.related_cache_version = None
+        # days since the epoch of last_modified and UsageRecommendation code
+        # of each table, derived once at ingest; table indexes sorted by
+        # modified day answer recency filters, rebuilt after index changes
+        self.modified_days = array('i')
+        self.usage_codes = array('B')
+        self.recency_order: Optional[Tuple[array, array]] = None
+        self.recency_order_version = None
+        # set while the index is served read-only from a memory-mapped snapshot
+        self.snapshot = None
+        self.snapshot_path: Optional[str] = None
+        # full table name -> table index, and removed table indexes whose
+        # postings are skipped until the next compaction drops them
+        self.table_positions: Dict[str, int] = {}
+        self.removed_tables: Set[int] = set()
+        self.index_version = 0
+        self.compaction_ratio = 0.25
+        self.background_compaction = True
+        self.compaction_thread: Optional[threading.Thread] = None
+        # mutations and the start and swap of a compaction are serialized by
+        # mutation_lock; index_lock guards reads against in-place updates and
+        # the compaction swap
+        self.mutation_lock = threading.RLock()
+        self.index_lock = threading.RLock()
+        self.configure_ranking(ranking, field_weights, k1, b, recency_weight, recency_half_life)
+
+    def __getstate__(self) -> Dict:
+        # snapshot backed engines are re-opened from the same file, so worker
+        # processes share the mapped pages instead of receiving a pickled copy
+        if self.snapshot is not None:
+            return {'snapshot_path': self.snapshot_path, 'compact_storage': self.compact_storage, 'fuzzy': self.fuzzy,
+                    'ranking': self.get_ranking_config()}
+
+        state = self.__dict__.copy()
+        for name in ('mutation_lock', 'index_lock', 'compaction_thread'):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state: Dict):
+        if 'keyword_index' not in state:
+            self.__init__(compact_storage=state['compact_storage'], fuzzy=state['fuzzy'])
+            self.open_snapshot(state['snapshot_path'])
+            self.configure_ranking(**state['ranking'])
+        else:
+            self.__dict__.update(state)
+            self.compaction_thread = None
+            self.mutation_lock = threading.RLock()
+            self.index_lock = threading.RLock()
+
+    def __copy__(self):
+        # shares every index structure; compaction builds from one while the
+        # live engine keeps indexing
+        source = object.__new__(type(self))
+        source.__dict__.update(self.__dict__)
+        return source
+
+
+    def configure_ranking(self, ranking: RankingMode = RankingMode.TF_IDF,
+        field_weights: Optional[Dict[str, float]] = None, k1: float = BM25_K1, b: float = BM25_B,
+        recency_weight: float = 0.0, recency_half_life: float = RECENCY_HALF_LIFE_DAYS):
+        """Relevance part of the score: TF-IDF, BM25 over the whole table text,
+        or BM25F with per field weights (see TABLE_TEXT_FIELDS). A positive
+        recency_weight adds recency_weight * 0.5 ** (age / recency_half_life)
+        to the score of every matching table with a known last_modified."""
+        if recency_half_life <= 0:
+            raise ValueError(f"recency_half_life must be positive, got {recency_half_life}")
+        unknown_fields = set(field_weights or {}) - set(TABLE_TEXT_FIELDS)
+        if unknown_fields:
+            raise ValueError(f"Unknown text fields {sorted(unknown_fields)}, expected {TABLE_TEXT_FIELDS}")
+
+        field_weights = {**BM25F_FIELD_WEIGHTS, **(field_weights or {})}
+        with self.mutation_lock, self.index_lock:
+            self.ranking = RankingMode(ranking)
+            self.field_weights = [field_weights[field] for field in TABLE_TEXT_FIELDS]
+            self.bm25_k1 = k1
+            self.bm25_b = b
+            self.recency_weight = recency_weight
+            self.recency_half_life = recency_half_life
+            if self.tables:
+                # an index filled under another ranking has no per field
+                # term frequencies yet; scores and results change either way
+                if self.ranking is RankingMode.BM25F and not self.field_frequencies:
+                    self.rebuild_field_frequencies()
+                self.index_version += 1
+
+
+    def rebuild_field_frequencies(self):
+        # postings list tables in ascending index order, so appending the
+        # counts table by table lines them up with keyword_index
+        field_frequencies = defaultdict(partial(array, 'I'))
+        for table_info in self.tables:
+            field_counts = [Counter(self.extract_keywords(text)) for text in self.get_text_sources(table_info)]
+            for keyword in set().union(*field_counts):
+                field_frequencies[keyword].extend(counts[keyword] for counts in field_counts)
+
+        self.field_frequencies = field_frequencies
+
+
+    def get_ranking_config(self) -> Dict:
+        return {
+            "ranking": self.ranking.value,
+            "field_weights": dict(zip(TABLE_TEXT_FIELDS, self.field_weights)),
+            "k1": self.bm25_k1,
+            "b": self.bm25_b,
+            "recency_weight": self.recency_weight,
+            "recency_half_life": self.recency_half_life
+        }
+
+
+    def save_snapshot(self, path: str):
+        with self.mutation_lock:
+            if self.removed_tables:
+                self.compact()
+            write_snapshot(self, path)
+
+        return self
+
+
+    @classmethod
+    def load_snapshot(cls, path: str, compact_storage: bool = False):
+        return cls(compact_storage=compact_storage).open_snapshot(path)
+
+
+    def open_snapshot(self, path: str):
+        """Serves the snapshot at path read-only, replacing everything the
+        engine held."""
+        with self.mutation_lock, self.index_lock:
+            return read_snapshot(self, path)
+
+
+    def new_table_storage(self):
+        return CompactTableStore() if self.compact_storage else []
+
+
+    def detach_snapshot(self):
+        def copy_postings(postings) -> Dict[str, array]:
+            return defaultdict(partial(array, 'I'), {key: array('I', values) for key, values in postings.items()})
+
+        self.keyword_index = copy_postings(self.keyword_index)
+        self.term_frequencies = copy_postings(self.term_frequencies)
+        self.fragment_index = copy_postings(self.fragment_index)
+        self.field_frequencies = copy_postings(self.field_frequencies)
+        self.tag_cooccurrence = self.tag_cooccurrence.copy()
+        self.document_frequency = defaultdict(int, self.document_frequency.items())
+        self.doc_lengths = array('I', self.doc_lengths)
+        self.field_lengths = array('I', self.field_lengths)
+        self.modified_days = array('i', self.modified_days)
+        self.usage_codes = array('B', self.usage_codes)
+        tables = self.new_table_storage()
+        tables.extend(self.tables)
+        self.tables = tables
+        self.table_positions = {table.get_full_name(): table_index for table_index, table in enumerate(self.tables)}
+        self.snapshot = None
+        self.snapshot_path = None
+
+        return self
+
 
     def add_table(self, table_info: BQTableInfo):
-        table_index = len(self.tables)
-        self.tables.append(table_info)
-        self.process_table_keywords(table_info, table_index)
+        with self.mutation_lock, self.index_lock:
+            if self.snapshot is not None:
+                self.detach_snapshot()
+
+            table_index = len(self.tables)
+            self.tables.append(table_info)
+            self.table_positions[table_info.get_full_name()] = table_index
+            self.process_table_keywords(table_info, table_index)
+            self.process_table_metadata(table_info, table_index)
+            self.index_version += 1
 
         return self
-    
 
-    def process_table_keywords(self, table_info: BQTableInfo, table_index: int):
-        text_sources = [
+
+    def add_tables(self, tables: Iterable[BQTableInfo]):
+        # index_lock is taken per table by add_table, so searches interleave
+        # with a long ingest and see each table either whole or not at all
+        with self.mutation_lock:
+            for table_info in tables:
+                self.add_table(table_info)
+
+        return self
+
+
+    def remove_table(self, full_name: str) -> bool:
+        with self.mutation_lock, self.index_lock:
+            if self.snapshot is not None:
+                self.detach_snapshot()
+
+            table_index = self.table_positions.pop(full_name, None)
+            if table_index is None:
+                return False
+
+            for keyword in set(self.get_table_keywords(self.tables[table_index])):
+                self.document_frequency[keyword] -= 1
+                if not self.document_frequency[keyword]:
+                    del self.document_frequency[keyword]
+            field_count = len(TABLE_TEXT_FIELDS)
+            self.doc_length_total -= self.doc_lengths[table_index]
+            for field in range(field_count):
+                self.field_length_totals[field] -= self.field_lengths[table_index * field_count + field]
+            self.removed_tables.add(table_index)
+            self.index_version += 1
+
+        self.schedule_compaction()
+        return True
+
+
+    def upsert_table(self, table_info: BQTableInfo):
+        with self.mutation_lock, self.index_lock:
+            self.remove_table(table_info.get_full_name())
+            return self.add_table(table_info)
+
+
+    def iter_tables(self):
+        for table_index, table in enumerate(self.tables):
+            if table_index not in self.removed_tables:
+                yield table
+
+
+    def get_table_count(self) -> int:
+        return len(self.tables) - len(self.removed_tables)
+
+
+    def schedule_compaction(self):
+        if len(self.removed_tables) <= self.compaction_ratio * len(self.tables):
+            return
+
+        if not self.background_compaction:
+            self.compact()
+        elif self.compaction_thread is None or not self.compaction_thread.is_alive():
+            self.compaction_thread = threading.Thread(target=self.compact, name="BQIndexCompaction", daemon=True)
+            self.compaction_thread.start()
+
+
+    def compact(self):
+        # the compacted index is built outside mutation_lock, so writers only
+        # wait for the swap; a build overtaken by another compaction or a
+        # snapshot load is dropped and started again
+        while not self.build_compaction():
+            pass
+
+        return self
+
+
+    def build_compaction(self) -> bool:
+        with self.mutation_lock:
+            if not self.removed_tables:
+                return True
+
+            # postings, lengths and tables only grow by appends, so the first
+            # table_count tables read the same through the shallow copy while
+            # writers keep going; key lists are taken here as dicts gain keys
+            source = copy.copy(self)
+            table_count = len(self.tables)
+            removed_tables = set(self.removed_tables)
+            keywords, fragments = list(self.keyword_index), list(self.fragment_index)
+            field_keywords = list(self.field_frequencies)
+
+        live_tables = [i for i in range(table_count) if i not in removed_tables]
+        new_positions = [-1] * table_count
+        for new_index, table_index in enumerate(live_tables):
+            new_positions[table_index] = new_index
+
+        def compact_postings(postings, keys, frequencies=None):
+            compacted_postings = defaultdict(partial(array, 'I'))
+            compacted_frequencies = defaultdict(partial(array, 'I'))
+            for key in keys:
+                key_tables = postings[key]
+                key_frequencies = frequencies[key] if frequencies is not None else key_tables
+                for table_index, frequency in zip(key_tables, key_frequencies):
+                    if table_index >= table_count:
+                        break
+                    if table_index not in removed_tables:
+                        compacted_postings[key].append(new_positions[table_index])
+                        compacted_frequencies[key].append(frequency)
+
+            return compacted_postings, compacted_frequencies
+
+        keyword_index, term_frequencies = compact_postings(source.keyword_index, keywords, source.term_frequencies)
+        fragment_index, _ = compact_postings(source.fragment_index, fragments)
+
+        # field frequencies hold field_count values per keyword posting
+        field_count = len(TABLE_TEXT_FIELDS)
+        field_frequencies = defaultdict(partial(array, 'I'))
+        for key in field_keywords:
+            key_frequencies = source.field_frequencies[key]
+            for position, table_index in enumerate(source.keyword_index[key]):
+                if table_index >= table_count:
+                    break
+                if table_index not in removed_tables:
+                    field_frequencies[key].extend(key_frequencies[position * field_count:(position + 1) * field_count])
+
+        tables = self.new_table_storage()
+        tables.extend(source.tables[i] for i in live_tables)
+
+        compacted = {
+            'keyword_index': keyword_index,
+            'term_frequencies': term_frequencies,
+            'fragment_index': fragment_index,
+            'fragment_lookup': {},
+            'vocabulary_trigrams': None,
+            'fragment_trigrams': None,
+            **source.compact_table_metadata(live_tables, new_positions, removed_tables),
+            'tables': tables,
+            'field_frequencies': field_frequencies,
+            'doc_lengths': array('I', (source.doc_lengths[i] for i in live_tables)),
+            'field_lengths': array('I', (
+                source.field_lengths[i * field_count + field] for i in live_tables for field in range(field_count)
+            )),
+            'table_positions': {table.get_full_name(): new_index for new_index, table in enumerate(tables)}
+        }
+
+        with self.mutation_lock, self.index_lock:
+            if self.keyword_index is not source.keyword_index:
+                return False
+
+            self.replay_compaction(compacted, table_count, removed_tables, new_positions)
+            rebuild_field_frequencies = self.field_frequencies is not source.field_frequencies
+            self.__dict__.update(compacted)
+            if rebuild_field_frequencies:
+                # BM25F started collecting them during the build
+                self.rebuild_field_frequencies()
+
+        return True
+
+
+    def replay_compaction(self, compacted: Dict, table_count: int, removed_tables: Set[int],
+        new_positions: List[int]):
+        # tables added since the build started are appended after the live
+        # ones; tables removed meanwhile stay as removed entries until the
+        # next compaction
+        offset = len(compacted['tables']) - table_count
+        added_tables = range(table_count, len(self.tables))
+
+        def get_position(table_index: int) -> int:
+            return new_positions[table_index] if table_index < table_count else table_index + offset
+
+        keywords, fragments = set(), set()
+        for table_index in added_tables:
+            table_info = self.tables[table_index]
+            keywords.update(self.get_table_keywords(table_info))
+            fragments.update(self.get_table_fragments(table_info))
+
+        field_count = len(TABLE_TEXT_FIELDS)
+        for keyword in keywords:
+            key_tables = self.keyword_index[keyword]
+            start = bisect_left(key_tables, table_count)
+            compacted['keyword_index'][keyword].extend(table_index + offset for table_index in key_tables[start:])
+            compacted['term_frequencies'][keyword].extend(self.term_frequencies[keyword][start:])
+            key_frequencies = self.field_frequencies.get(keyword)
+            if key_frequencies is not None:
+                compacted['field_frequencies'][keyword].extend(key_frequencies[start * field_count:])
+        for fragment in fragments:
+            key_tables = self.fragment_index[fragment]
+            start = bisect_left(key_tables, table_count)
+            compacted['fragment_index'][fragment].extend(table_index + offset for table_index in key_tables[start:])
+
+        compacted['tables'].extend(self.tables[table_index] for table_index in added_tables)
+        compacted['doc_lengths'].extend(self.doc_lengths[table_count:])
+        compacted['field_lengths'].extend(self.field_lengths[table_count * field_count:])
+        self.replay_table_metadata(compacted, added_tables, offset)
+
+        changed_tables = self.removed_tables - removed_tables
+        table_positions = compacted['table_positions']
+        for table_index in changed_tables.union(added_tables):
+            full_name = self.tables[table_index].get_full_name()
+            live_index = self.table_positions.get(full_name)
+            if live_index is None:
+                table_positions.pop(full_name, None)
+            else:
+                table_positions[full_name] = get_position(live_index)
+
+        compacted['removed_tables'] = {get_position(table_index) for table_index in changed_tables}
+        compacted['index_version'] = self.index_version + 1
+
+
+    def compact_table_metadata(self, live_tables: List[int], new_positions: List[int],
+        removed_tables: Set[int]) -> Dict:
+        # per table structures kept beside the keyword index, renumbered for
+        # the compaction swap; built outside mutation_lock, so only the
+        # entries of live_tables are read
+        tag_cooccurrence = TagCooccurrenceIndex()
+        for new_index, table_index in enumerate(live_tables):
+            table_info = self.tables[table_index]
+            tag_cooccurrence.add(new_index, table_info.dataset, table_info.tags)
+
+        return {
+            'tag_cooccurrence': tag_cooccurrence,
+            'modified_days': array('i', (self.modified_days[i] for i in live_tables)),
+            'usage_codes': array('B', (self.usage_codes[i] for i in live_tables))
+        }
+
+
+    def replay_table_metadata(self, compacted: Dict, added_tables: range, offset: int):
+        for table_index in added_tables:
+            table_info = self.tables[table_index]
+            compacted['tag_cooccurrence'].add(table_index + offset, table_info.dataset, table_info.tags)
+        compacted['modified_days'].extend(self.modified_days[added_tables.start:])
+        compacted['usage_codes'].extend(self.usage_codes[added_tables.start:])
+
+
+    def get_text_sources(self, table_info: BQTableInfo) -> List[str]:
+        return [
             table_info.table_name,
             table_info.description,
             ' '.join([col.get('name', '') for col in table_info.columns]),
             ' '.join([col.get('description', '') for col in table_info.columns]),
             ' '.join(table_info.tags)
         ]
-        
-        for text in text_sources:
-            self.extract_keywords(text)
-            for keyword in self.tables_keywords:
-                self.keyword_index[keyword].append(table_index)
 
-    
+
+    def get_table_keywords(self, table_info: BQTableInfo) -> List[str]:
+        table_keywords = []
+        for text in self.get_text_sources(table_info):
+            table_keywords.extend(self.extract_keywords(text))
+
+        return table_keywords
+
+
+    def get_table_fragments(self, table_info: BQTableInfo) -> Set[str]:
+        return set(re.findall(r'[a-z]+', ' '.join(self.get_text_sources(table_info)).lower()))
+
+
+    def process_table_keywords(self, table_info: BQTableInfo, table_index: int):
+        field_keywords = [self.extract_keywords(text) for text in self.get_text_sources(table_info)]
+        table_keywords = [keyword for keywords in field_keywords for keyword in keywords]
+
+        # lengths go in first so readers never see a posting without them
+        self.doc_lengths.append(len(table_keywords))
+        self.field_lengths.extend(len(keywords) for keywords in field_keywords)
+        self.doc_length_total += len(table_keywords)
+        for field, keywords in enumerate(field_keywords):
+            self.field_length_totals[field] += len(keywords)
+
+        # once collected, per field frequencies are kept current under any ranking
+        field_counts = [Counter(keywords) for keywords in field_keywords] \
+            if self.ranking is RankingMode.BM25F or self.field_frequencies else None
+        for keyword, tf in Counter(table_keywords).items():
+            if self.vocabulary_trigrams is not None and keyword not in self.keyword_index:
+                self.vocabulary_trigrams.add(keyword)
+            self.keyword_index[keyword].append(table_index)
+            self.term_frequencies[keyword].append(tf)
+            if field_counts is not None:
+                self.field_frequencies[keyword].extend(counts[keyword] for counts in field_counts)
+            self.document_frequency[keyword] += 1
+
+        for fragment in self.get_table_fragments(table_info):
+            if fragment not in self.fragment_index:
+                self.fragment_lookup.clear()
+                if self.fragment_trigrams is not None:
+                    self.fragment_trigrams.add(fragment)
+            self.fragment_index[fragment].append(table_index)
+
+
+    def process_table_metadata(self, table_info: BQTableInfo, table_index: int):
+        self.tag_cooccurrence.add(table_index, table_info.dataset, table_info.tags)
+        self.modified_days.append(to_epoch_day(table_info.last_modified))
+        self.usage_codes.append(classify_usage(table_info.tags, table_info.row_count))
+
+
+    def get_table_position(self, full_name: str) -> Optional[int]:
+        # snapshots do not store the name -> index map, it is built on first use
+        if self.snapshot is not None and not self.table_positions:
+            self.table_positions = {table.get_full_name(): table_index for table_index, table in enumerate(self.tables)}
+
+        return self.table_positions.get(full_name)
+
+
+    def get_datasets(self) -> List[str]:
+        with self.index_lock:
+            return list(self.tag_cooccurrence.dataset_groups)
+
+
+    def get_related_tables(self, full_name: str, limit: int = 3, min_shared_tags: int = 2) -> List[str]:
+        """Tables sharing at least min_shared_tags tags or the dataset of full_name.
+
+        Ranked by shared tag count, then same dataset first, then table order.
+        """
+        with self.index_lock:
+            table_index = self.get_table_position(full_name)
+            if table_index is None or limit <= 0:
+                return []
+
+            # tables of one (dataset, tag set) group share their ranking, so
+            # it is cached per group until the index changes
+            if self.related_cache_version != self.index_version or len(self.related_cache) > 4096:
+                self.related_cache = {}
+                self.related_cache_version = self.index_version
+
+            table_info = self.tables[table_index]
+            cache_key = (table_info.dataset, frozenset(table_info.tags), limit, min_shared_tags)
+            related = self.related_cache.get(cache_key)
+            if related is None:
+                related = self.tag_cooccurrence.get_related(
+                    table_info.dataset, table_info.tags, limit + 1, min_shared_tags, self.removed_tables
+                )
+                self.related_cache[cache_key] = related
+
+            return [
+                self.tables[other_index].get_full_name()
+                for other_index in related if other_index != table_index
+            ][:limit]
+
+
+    def get_vocabulary_trigrams(self) -> TrigramIndex:
+        if self.vocabulary_trigrams is None:
+            self.vocabulary_trigrams = TrigramIndex.from_terms(self.keyword_index)
+
+        return self.vocabulary_trigrams
+
+
+    def get_fragment_trigrams(self) -> TrigramIndex:
+        if self.fragment_trigrams is None:
+            self.fragment_trigrams = TrigramIndex.from_terms(self.fragment_index)
+
+        return self.fragment_trigrams
+
+
+    def get_matching_fragments(self, keyword: str) -> List[str]:
+        fragments = self.fragment_lookup.get(keyword)
+        if fragments is None:
+            fragments = self.get_fragment_trigrams().get_containing(keyword)
+            self.fragment_lookup[keyword] = fragments
+
+        return fragments
+
+
+    def get_max_edits(self, keyword: str) -> int:
+        if len(keyword) >= FUZZY_TWO_EDITS_MIN_LENGTH:
+            return 2
+        if len(keyword) >= FUZZY_ONE_EDIT_MIN_LENGTH:
+            return 1
+
+        return 0
+
+
+    def get_fuzzy_matches(self, keyword: str, max_edits: Optional[int] = None) -> List[str]:
+        """Live vocabulary terms closest to keyword, at most max_edits edits away.
+
+        The most frequent come first; max_edits defaults to the keyword
+        length policy of get_max_edits.
+        """
+        max_edits = self.get_max_edits(keyword) if max_edits is None else max_edits
+        if self.fuzzy_cache_version != self.index_version or len(self.fuzzy_cache) > 4096:
+            self.fuzzy_cache = {}
+            self.fuzzy_cache_version = self.index_version
+
+        cache_key = (keyword, max_edits)
+        matches = self.fuzzy_cache.get(cache_key)
+        if matches is None:
+            # one edit is searched first: it is much cheaper and, when it
+            # finds anything, farther terms would not be returned anyway
+            matches = []
+            document_frequency = self.document_frequency
+            for distance in range(1, max_edits + 1):
+                matches = [
+                    term for _, term in sorted(
+                        (-document_frequency.get(term, 0), term)
+                        for _, term in self.get_vocabulary_trigrams().get_similar(keyword, distance)
+                        if document_frequency.get(term, 0) > 0
+                    )
+                ]
+                if matches:
+                    break
+            self.fuzzy_cache[cache_key] = matches
+
+        return matches
+
+
+    def expand_query_keywords(self, query_keywords: List[str]) -> List[str]:
+        # a keyword matching no term and no text fragment would only lower
+        # the score of every table, so it stands in for its closest term
+        if not self.fuzzy:
+            return query_keywords
+
+        expanded = []
+        for keyword in query_keywords:
+            if not self.document_frequency.get(keyword, 0) and not self.get_matching_fragments(keyword):
+                matches = self.get_fuzzy_matches(keyword)
+                if matches:
+                    keyword = matches[0]
+            expanded.append(keyword)
+
+        return expanded
+
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Completions of the last word of prefix, most frequent terms first."""
+        words = re.findall(r'[a-z]+', prefix.lower())
+        if not words or limit <= 0:
+            return []
+
+        with self.index_lock, stage_metrics.span("search.suggest"):
+            document_frequency = self.document_frequency
+            return [term for _, term in heapq.nsmallest(limit, (
+                (-document_frequency.get(term, 0), term)
+                for term in self.get_vocabulary_trigrams().get_prefixed(words[-1])
+                if document_frequency.get(term, 0) > 0
+            ))]
+
+
+    def get_tables_containing(self, keyword: str) -> Set[int]:
+        tables = set()
+        for fragment in self.get_matching_fragments(keyword):
+            tables.update(self.fragment_index[fragment])
+
+        return tables - self.removed_tables if self.removed_tables else tables
+
+
+    def get_posting_position(self, keyword: str, table_index: int) -> Optional[int]:
+        keyword_tables = self.keyword_index.get(keyword, ())
+        position = bisect_left(keyword_tables, table_index)
+        if position < len(keyword_tables) and keyword_tables[position] == table_index:
+            return position
+
+        return None
+
+
+    def get_term_frequency(self, keyword: str, table_index: int) -> int:
+        position = self.get_posting_position(keyword, table_index)
+        if position is not None:
+            return self.term_frequencies[keyword][position]
+
+        return 0
+
+
+    def get_document_frequency(self, keyword: str) -> int:
+        return self.document_frequency.get(keyword, 0)
+
+
+    def get_collection_statistics(self) -> Tuple[int, int, List[int]]:
+        """Live table count and text length totals that relevance scores
+        are normalized by."""
+        return self.get_table_count(), self.doc_length_total, self.field_length_totals
+
+
+    def get_idf(self, keyword: str) -> Optional[float]:
+        tables_with_term = self.get_document_frequency(keyword)
+        if tables_with_term > 0:
+            return math.log(self.get_collection_statistics()[0] / tables_with_term)
+
+        return None
+
+
     def calculate_tf_idf_score(self, query_keywords: List[str],
         table_index: int) -> float:
 
-        table = self.tables[table_index]
-        table_text = ' '.join([
-            table.table_name,
-            table.description,
-            ' '.join([col.get('name', '') for col in table.columns]),
-            ' '.join([col.get('description', '') for col in table.columns]),
-            ' '.join(table.tags)
-        ])
-        
-        table_keywords = self.extract_keywords(table_text)
-        
-        if not table_keywords:
+        doc_length = self.doc_lengths[table_index]
+        if not doc_length:
             return 0.0
-        
+
         score = 0.0
-        total_tables = len(self.tables)
-        
         for query_keyword in query_keywords:
-            tf = table_keywords.count(query_keyword) / len(table_keywords)
-            tables_with_term = len(self.keyword_index.get(query_keyword, []))
-            if tables_with_term > 0:
-                idf = math.log(total_tables / tables_with_term)
+            idf = self.get_idf(query_keyword)
+            if idf is not None:
+                tf = self.get_term_frequency(query_keyword, table_index) / doc_length
                 score += tf * idf
-        
+
         return score
 
-    
-    def calculate_keyword_match_score(self, query_keywords: List[str], 
+
+    def get_bm25_idf(self, keyword: str) -> Optional[float]:
+        tables_with_term = self.get_document_frequency(keyword)
+        if tables_with_term > 0:
+            # the +1 form never goes negative for terms in most tables
+            table_count = self.get_collection_statistics()[0]
+            return math.log(1 + (table_count - tables_with_term + 0.5) / (tables_with_term + 0.5))
+
+        return None
+
+
+    def get_bm25_weights(self, keyword: str, table_index: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(table_index, weight) of keyword for its live postings, or for table_index only.
+
+        Only running totals are needed for the average lengths, so the cost
+        is the postings walk itself.
+        """
+        idf = self.get_bm25_idf(keyword)
+        if idf is None:
+            return []
+
+        keyword_tables = self.keyword_index[keyword]
+        start, end = 0, len(keyword_tables)
+        if table_index is not None:
+            start = self.get_posting_position(keyword, table_index)
+            if start is None:
+                return []
+            end = start + 1
+        removed_tables = self.removed_tables
+
+        k1, b = self.bm25_k1, self.bm25_b
+        table_count, doc_length_total, field_length_totals = self.get_collection_statistics()
+        if self.ranking is RankingMode.BM25:
+            # k1 * (1 - b + b * doc_length / average_length) as base + slope * doc_length
+            average_length = doc_length_total / table_count or 1.0
+            base, slope = k1 * (1 - b), k1 * b / average_length
+            doc_lengths = self.doc_lengths
+            return [
+                (table_index, idf * (tf * (k1 + 1)) / (tf + base + slope * doc_lengths[table_index]))
+                for table_index, tf in zip(keyword_tables[start:end], self.term_frequencies[keyword][start:end])
+                if table_index not in removed_tables
+            ]
+
+        # BM25F: each field's frequency is length normalized against that
+        # field's average and weighted, then saturated once with k1
+        field_count = len(TABLE_TEXT_FIELDS)
+        field_weights, field_lengths = self.field_weights, self.field_lengths
+        field_frequencies = self.field_frequencies[keyword]
+        base = 1 - b
+        slopes = [b / (total / table_count) if total else 0.0 for total in field_length_totals]
+        weights = []
+        for table_index, offset in zip(keyword_tables[start:end], range(start * field_count, end * field_count, field_count)):
+            if table_index in removed_tables:
+                continue
+            pseudo_tf = 0.0
+            table_offset = table_index * field_count
+            for field in range(field_count):
+                tf = field_frequencies[offset + field]
+                if tf:
+                    pseudo_tf += field_weights[field] * tf / (base + slopes[field] * field_lengths[table_offset + field])
+            weights.append((table_index, idf * (pseudo_tf * (k1 + 1)) / (pseudo_tf + k1)))
+
+        return weights
+
+
+    def calculate_relevance_score(self, query_keywords: List[str],
         table_index: int) -> float:
-        
-        table = self.tables[table_index]
-        table_text = ' '.join([
-            table.table_name,
-            table.description,
-            ' '.join([col.get('name', '') for col in table.columns]),
-            ' '.join([col.get('description', '') for col in table.columns]),
-            ' '.join(table.tags)
-        ]).lower()
-        
+
+        if self.ranking is RankingMode.TF_IDF:
+            return self.calculate_tf_idf_score(query_keywords, table_index)
+
+        score = 0.0
+        for query_keyword in query_keywords:
+            for _, weight in self.get_bm25_weights(query_keyword, table_index):
+                score += weight
+
+        return score
+
+
+    def calculate_keyword_match_score(self, query_keywords: List[str],
+        table_index: int) -> float:
+
         matches = 0
         total_query_keywords = len(query_keywords)
-        
+
         for keyword in query_keywords:
-            if keyword in table_text:
-                matches += 1
-        
+            for fragment in self.get_matching_fragments(keyword):
+                fragment_tables = self.fragment_index[fragment]
+                position = bisect_left(fragment_tables, table_index)
+                if position < len(fragment_tables) and fragment_tables[position] == table_index:
+                    matches += 1
+                    break
+
         return matches / total_query_keywords if total_query_keywords > 0 else 0.0
 
-    
-    def calculate_combined_score(self, query_keywords: List[str], 
+
+    def calculate_combined_score(self, query_keywords: List[str],
         table_index: int) -> float:
 
-        tf_idf_score = self.calculate_tf_idf_score(query_keywords, table_index)
+        relevance_score = self.calculate_relevance_score(query_keywords, table_index)
         keyword_match_score = self.calculate_keyword_match_score(query_keywords, table_index)
 
-        return (tf_idf_score * 0.6) + (keyword_match_score * 0.4)
+        return (relevance_score * 0.6) + (keyword_match_score * 0.4)
+
+
+    def get_keyword_weights(self, keyword: str) -> List[Tuple[int, float]]:
+        if self.ranking is not RankingMode.TF_IDF:
+            return self.get_bm25_weights(keyword)
 
-    
-    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        idf = self.get_idf(keyword)
+        if idf is None:
+            return []
+
+        return [
+            (table_index, (tf / self.doc_lengths[table_index]) * idf)
+            for table_index, tf in zip(self.keyword_index[keyword], self.term_frequencies[keyword])
+            if table_index not in self.removed_tables
+        ]
+
+
+    def get_filter_tables(self, filters: Optional[Dict]) -> Optional[Set[int]]:
+        """Live tables passing the dataset/tags/modified_within_days filters,
+        None when unfiltered.
+
+        dataset matches exactly and tags match if the table has any of them;
+        both accept a single value or a list. modified_within_days keeps
+        tables modified at most that many days ago.
+        """
+        datasets = (filters or {}).get("dataset")
+        tags = (filters or {}).get("tags")
+        modified_within_days = (filters or {}).get("modified_within_days")
+        if not datasets and not tags and modified_within_days is None:
+            return None
+
+        tables = None
+        if datasets or tags:
+            # (dataset, tag set) groups either pass or fail a filter as a whole
+            index = self.tag_cooccurrence
+            group_ids = None
+            if datasets:
+                datasets = [datasets] if isinstance(datasets, str) else datasets
+                group_ids = {group_id for dataset in datasets for group_id in index.dataset_groups.get(dataset, ())}
+            if tags:
+                tags = [tags] if isinstance(tags, str) else tags
+                tag_group_ids = {group_id for tag in tags for group_id in index.tag_groups.get(tag, ())}
+                group_ids = tag_group_ids if group_ids is None else group_ids & tag_group_ids
+
+            tables = set()
+            for group_id in group_ids:
+                tables.update(index.group_tables[group_id])
+        if modified_within_days is not None:
+            recent_tables = self.get_recent_tables(modified_within_days)
+            tables = recent_tables if tables is None else tables & recent_tables
+
+        return tables - self.removed_tables if self.removed_tables else tables
+
+
+    def get_recent_tables(self, days: int) -> Set[int]:
+        # tables without a known last_modified sort first and never pass
+        if self.recency_order_version != self.index_version:
+            modified_days = self.modified_days
+            order = sorted(range(len(modified_days)), key=modified_days.__getitem__)
+            self.recency_order = (array('i', (modified_days[i] for i in order)), array('I', order))
+            self.recency_order_version = self.index_version
+
+        sorted_days, sorted_tables = self.recency_order
+        return set(sorted_tables[bisect_left(sorted_days, today_epoch_day() - days):])
+
+
+    def apply_recency_boost(self, scores: Dict[int, float]) -> Dict[int, float]:
+        if not self.recency_weight:
+            return scores
+
+        today = today_epoch_day()
+        modified_days = self.modified_days
+        for table_index, score in scores.items():
+            modified_day = modified_days[table_index]
+            if score > 0 and modified_day != UNKNOWN_MODIFIED_DAY:
+                scores[table_index] = score + self.recency_weight * 0.5 ** (
+                    max(today - modified_day, 0) / self.recency_half_life
+                )
+
+        return scores
+
+
+    def score_candidates(self, query_keywords: List[str],
+        keyword_cache: Optional[Dict] = None, filter_tables: Optional[Set[int]] = None) -> Dict[int, float]:
+
+        # a filter smaller than the query postings is cheaper to score table
+        # by table; calculate_combined_score gives the same sums
+        if filter_tables is not None and \
+            len(filter_tables) * len(query_keywords) < sum(len(self.keyword_index.get(kw, ())) for kw in query_keywords):
+            with stage_metrics.span("search.scoring"):
+                return self.apply_recency_boost({
+                    table_index: self.calculate_combined_score(query_keywords, table_index)
+                    for table_index in filter_tables
+                })
+
+        # walks only the postings of the query terms, accumulating in query
+        # keyword order so the sums match calculate_combined_score exactly
+        if keyword_cache is None:
+            keyword_cache = {}
+        with stage_metrics.span("search.candidates"):
+            for query_keyword in query_keywords:
+                if query_keyword not in keyword_cache:
+                    keyword_cache[query_keyword] = (
+                        self.get_keyword_weights(query_keyword),
+                        self.get_tables_containing(query_keyword)
+                    )
+
+        with stage_metrics.span("search.scoring"):
+            relevance_scores = defaultdict(float)
+            matches = defaultdict(int)
+            for query_keyword in query_keywords:
+                keyword_weights, keyword_tables = keyword_cache[query_keyword]
+                for table_index, weight in keyword_weights:
+                    relevance_scores[table_index] += weight
+                for table_index in keyword_tables:
+                    matches[table_index] += 1
+
+            candidates = relevance_scores.keys() | matches.keys()
+            if filter_tables is not None:
+                candidates &= filter_tables
+
+            total_query_keywords = len(query_keywords)
+            return self.apply_recency_boost({
+                table_index: (relevance_scores.get(table_index, 0.0) * 0.6) +
+                    ((matches.get(table_index, 0) / total_query_keywords) * 0.4)
+                for table_index in candidates
+            })
+
+
+    def format_result(self, table_index: int, score: float, query_keywords: List[str]) -> TableSearchResult:
+        return TableSearchResult(self.tables[table_index], score, query_keywords,
+                                 self.modified_days[table_index], self.usage_codes[table_index])
+
+
+    def select_top_tables(self, query_keywords: List[str], limit: int,
+        keyword_cache: Optional[Dict] = None, filter_tables: Optional[Set[int]] = None,
+        min_score: float = 0.0) -> List[Tuple[int, float]]:
+
+        # bounded selection on (rounded score desc, table index asc) keeps the
+        # ordering of a stable sort while only the winners get materialized
+        scores = self.score_candidates(query_keywords, keyword_cache, filter_tables)
+        with stage_metrics.span("search.sort"):
+            top_tables = heapq.nsmallest(limit, (
+                (-rounded_score, table_index)
+                for table_index, score in scores.items()
+                if score > 0 and (rounded_score := round(score, 4)) >= min_score
+            ))
+
+        return [(table_index, -negative_score) for negative_score, table_index in top_tables]
+
+
+    def rank_keywords(self, query_keywords: List[str], limit: int,
+        keyword_cache: Optional[Dict] = None, filter_tables: Optional[Set[int]] = None,
+        min_score: float = 0.0) -> List[Dict]:
+
+        top_tables = self.select_top_tables(query_keywords, limit, keyword_cache, filter_tables, min_score)
+        with stage_metrics.span("search.format"):
+            return [
+                self.format_result(table_index, score, query_keywords)
+                for table_index, score in top_tables
+            ]
+
+
+    def search(self, query: str, limit: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        """Top tables for query; filters may hold dataset, tags,
+        modified_within_days and min_score."""
         if not query.strip():
             return []
-        
-        query_keywords = self.extract_keywords(query)
-        
+
+        with stage_metrics.span("search.tokenize"):
+            query_keywords = self.extract_query_keywords(query)
+
         if not query_keywords:
             return []
-        
-        scored_tables = []
-        for i, table in enumerate(self.tables):
-            score = self.calculate_combined_score(query_keywords, i)
-            
-            if score > 0: 
-                scored_tables.append({
-                    'table_name': table.get_full_name(),
-                    'dataset': table.dataset,
-                    'description': table.description,
-                    'columns': len(table.columns),
-                    'tags': table.tags,
-                    'last_modified': table.last_modified,
-                    'row_count': table.row_count,
-                    'relevance_score': round(score, 4),
-                    'matched_keywords': [kw for kw in query_keywords if kw in table.description.lower() or kw in table.table_name.lower()]
-                })
-    
-        scored_tables.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        return scored_tables[:limit]
-    
 
-    
+        with self.index_lock:
+            with stage_metrics.span("search.expand"):
+                query_keywords = self.expand_query_keywords(query_keywords)
+            with stage_metrics.span("search.filter"):
+                filter_tables = self.get_filter_tables(filters)
+            if filter_tables is not None and not filter_tables:
+                return []
+
+            return self.rank_keywords(query_keywords, limit, filter_tables=filter_tables,
+                                      min_score=(filters or {}).get("min_score", 0.0))
+
+
+    def search_keywords(self, batch_keywords: List[Tuple[str, ...]], limit: int = 10) -> List[List[Dict]]:
+        keyword_cache = {}
+        with self.index_lock:
+            return [self.rank_keywords(query_keywords, limit, keyword_cache) for query_keywords in batch_keywords]
+
+
+    def search_many(self, queries: List[str], limit: int = 10,
+        processes: Optional[int] = None, chunk_size: int = 64) -> List[List[Dict]]:
+
+        # results only depend on the extracted keywords, so queries that
+        # normalize to the same keywords are scored once
+        batch_keywords = [tuple(self.extract_query_keywords(query)) if query.strip() else () for query in queries]
+        with self.index_lock:
+            batch_keywords = [tuple(self.expand_query_keywords(list(query_keywords))) for query_keywords in batch_keywords]
+        unique_keywords = list(dict.fromkeys(query_keywords for query_keywords in batch_keywords if query_keywords))
+
+        if processes and processes > 1 and len(unique_keywords) > chunk_size:
+            chunks = [unique_keywords[i:i + chunk_size] for i in range(0, len(unique_keywords), chunk_size)]
+            with ProcessPoolExecutor(max_workers=processes, initializer=init_search_worker,
+                initargs=(self,)) as executor:
+                unique_results = [
+                    results
+                    for chunk_results in executor.map(search_keywords_worker, chunks, [limit] * len(chunks))
+                    for results in chunk_results
+                ]
+        else:
+            unique_results = self.search_keywords(unique_keywords, limit)
+
+        results_by_keywords = dict(zip(unique_keywords, unique_results))
+        returned = set()
+        results = []
+        for query_keywords in batch_keywords:
+            query_results = results_by_keywords.get(query_keywords, [])
+            if query_keywords in returned:
+                query_results = [dict(result) for result in query_results]
+            returned.add(query_keywords)
+            results.append(query_results)
+
+        return results
+
+
+worker_search_engine: Optional[BQSearchTable] = None
+
+
+def init_search_worker(search_engine: BQSearchTable):
+    global worker_search_engine
+    worker_search_engine = search_engine
+
+
+def search_worker(query: str, limit: int, filters: Optional[Dict] = None) -> List[Dict]:
+    return worker_search_engine.search(query, limit, filters)
+
+
+def search_keywords_worker(batch_keywords: List[Tuple[str, ...]], limit: int) -> List[List[Dict]]:
+    return worker_search_engine.search_keywords(batch_keywords, limit)
+
+
+def suggest_worker(prefix: str, limit: int) -> List[str]:
+    return worker_search_engine.suggest(prefix, limit)
+
 
+def datasets_worker() -> List[str]:
+    return worker_search_engine.get_datasets()
@@ -6,6 +6,7 @@ current_directory = os.getcwd()
 print("Current Directory:", current_directory)
 
 from domains.models.bigquery_table_info import BQTableInfo
+from domains.values.ranking_mode import RankingMode
 from pkg.big_query.services.table_search import BQSearchTable
 
 
@@ -161,6 +162,49 @@ def load_sample_data() -> List[BQTableInfo]:
 
 
 
+def test_configure_ranking_after_ingest():
+    # switching an engine filled under TF-IDF to BM25F ranks like an engine
+    # built under BM25F, also for tables added after the switch
+    queries = ["sales revenue", "daily campaign performance", "user behavior sessions", "budget planning"]
+    sample_tables = load_sample_data()
+    bm25f_engine = BQSearchTable(ranking=RankingMode.BM25F).add_tables(sample_tables)
+
+    search_engine = BQSearchTable().add_tables(sample_tables[:6])
+    search_engine.configure_ranking(RankingMode.BM25)
+    search_engine.configure_ranking(RankingMode.BM25F)
+    search_engine.add_tables(sample_tables[6:])
+    for query in queries:
+        assert search_engine.search(query) == bm25f_engine.search(query)
+
+    search_engine.configure_ranking(RankingMode.TF_IDF)
+    assert search_engine.search("sales revenue") == BQSearchTable().add_tables(sample_tables).search("sales revenue")
+
+
+def test_open_snapshot_over_populated_engine(tmp_path):
+    # opening a snapshot replaces the tables, tombstones and caches an
+    # engine already held, ranking like a freshly loaded snapshot
+    queries = ["sales revenue", "daily campaign performance", "user behavior sessions", "budget planning"]
+    sample_tables = load_sample_data()
+    snapshot_path = str(tmp_path / "index.snapshot")
+    BQSearchTable(ranking=RankingMode.BM25F).add_tables(sample_tables[3:]).save_snapshot(snapshot_path)
+
+    search_engine = BQSearchTable(compact_storage=True).add_tables(sample_tables)
+    search_engine.background_compaction = False
+    for table in sample_tables[:2]:
+        search_engine.remove_table(table.get_full_name())
+    search_engine.search("daily campaign")
+    search_engine.get_related_tables(sample_tables[5].get_full_name())
+    search_engine.open_snapshot(snapshot_path)
+
+    loaded_engine = BQSearchTable.load_snapshot(snapshot_path)
+    assert search_engine.get_table_count() == len(sample_tables) - 3
+    for query in queries:
+        assert search_engine.search(query) == loaded_engine.search(query)
+    for table in sample_tables:
+        full_name = table.get_full_name()
+        assert search_engine.get_related_tables(full_name) == loaded_engine.get_related_tables(full_name)
+
+
 def main():
     search_engine = BQSearchTable()
     sample_tables = load_sample_data()
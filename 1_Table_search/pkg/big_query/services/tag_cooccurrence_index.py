@@ -0,0 +1,109 @@
+
+import heapq
+from array import array
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+
+GroupKey = Tuple[str, Tuple[str, ...]]
+
+
+class TagCooccurrenceIndex:
+    """Tables grouped by (dataset, tag set).
+
+    Every table of a group shares the same number of tags with any other
+    table, so related tables are ranked by counting shared tags per group
+    (through tag -> groups postings) instead of per table, and only the
+    table lists of the best groups are read.
+    """
+
+    def __init__(self):
+        self.group_ids: Dict[GroupKey, int] = {}
+        self.group_keys: List[GroupKey] = []
+        self.group_tables: List[Sequence[int]] = []
+        self.tag_groups: Dict[str, array] = defaultdict(partial(array, 'I'))
+        self.dataset_groups: Dict[str, array] = defaultdict(partial(array, 'I'))
+
+
+    @classmethod
+    def from_groups(cls, group_keys: Iterable[GroupKey], group_tables: List[Sequence[int]]):
+        index = cls()
+        for group_key in group_keys:
+            index.add_group(group_key)
+        index.group_tables = group_tables
+
+        return index
+
+
+    def add_group(self, group_key: GroupKey) -> int:
+        group_id = len(self.group_keys)
+        self.group_ids[group_key] = group_id
+        self.group_keys.append(group_key)
+        self.group_tables.append(array('I'))
+        for tag in group_key[1]:
+            self.tag_groups[tag].append(group_id)
+        self.dataset_groups[group_key[0]].append(group_id)
+
+        return group_id
+
+
+    def add(self, table_index: int, dataset: str, tags: Iterable[str]):
+        group_key = (dataset, tuple(sorted(set(tags))))
+        group_id = self.group_ids.get(group_key)
+        if group_id is None:
+            group_id = self.add_group(group_key)
+        self.group_tables[group_id].append(table_index)
+
+
+    def copy(self):
+        """Writable copy."""
+        index = TagCooccurrenceIndex.from_groups(self.group_keys, [])
+        index.group_tables.extend(array('I', tables) for tables in self.group_tables)
+
+        return index
+
+
+    def get_tables(self, group_ids: Iterable[int]) -> Iterable[int]:
+        return heapq.merge(*(self.group_tables[group_id] for group_id in group_ids))
+
+
+    def get_related(self, dataset: str, tags: Iterable[str], limit: int,
+        min_shared_tags: int, removed_tables: Set[int]) -> List[int]:
+
+        shared_tags = Counter()
+        for tag in set(tags):
+            shared_tags.update(self.tag_groups.get(tag, ()))
+
+        def iter_ranks():
+            # groups sharing enough tags, best first; same dataset groups
+            # below the threshold (down to no shared tag) are only ranked
+            # when the stronger ones did not fill the limit
+            strong = sorted(
+                (item for item in shared_tags.items() if item[1] >= min_shared_tags),
+                key=itemgetter(1), reverse=True
+            )
+            yield from groupby(strong, key=itemgetter(1))
+            weak = sorted(
+                ((group_id, shared_tags.get(group_id, 0)) for group_id in self.dataset_groups.get(dataset, ())
+                 if shared_tags.get(group_id, 0) < min_shared_tags),
+                key=itemgetter(1), reverse=True
+            )
+            yield from groupby(weak, key=itemgetter(1))
+
+        # groups of one rank are merged in table order, same dataset first
+        related = []
+        for _, rank in iter_ranks():
+            rank = [group_id for group_id, _ in rank]
+            same_dataset = [group_id for group_id in rank if self.group_keys[group_id][0] == dataset]
+            other_dataset = [group_id for group_id in rank if self.group_keys[group_id][0] != dataset]
+            for group_ids in (same_dataset, other_dataset):
+                for other_index in self.get_tables(group_ids):
+                    if other_index not in removed_tables:
+                        related.append(other_index)
+                        if len(related) >= limit:
+                            return related
+
+        return related
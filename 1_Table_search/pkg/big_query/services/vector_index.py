@@ -0,0 +1,273 @@
+
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from pkg.big_query.services.index_snapshot import write_sections, map_sections
+from domains.values.constant.index_snapshot_format import VECTOR_INDEX_MAGIC, VECTOR_INDEX_VERSION
+from domains.values.constant.vector_search_parameter import (
+    IVF_MIN_TRAIN_SIZE, IVF_PROBE_LISTS, IVF_REBUILD_RATIO, IVF_TRAIN_ITERATIONS
+)
+
+
+class IVFVectorIndex:
+    """Inverted file index over L2-normalized float32 vectors.
+
+    Vectors live in one contiguous (count, dimension) array, row i being
+    table index i. Once IVF_MIN_TRAIN_SIZE vectors are indexed they are
+    clustered with spherical k-means into about sqrt(count) lists, and a
+    query only scans the vectors of its probe_lists closest lists. Vectors
+    added after training are scanned exhaustively until they outgrow
+    IVF_REBUILD_RATIO of the clustered ones, then the lists are retrained.
+    """
+
+    def __init__(self, dimension: int, probe_lists: int = IVF_PROBE_LISTS,
+        min_train_size: int = IVF_MIN_TRAIN_SIZE, rebuild_ratio: float = IVF_REBUILD_RATIO):
+        self.dimension = dimension
+        self.probe_lists = probe_lists
+        self.min_train_size = min_train_size
+        self.rebuild_ratio = rebuild_ratio
+        # grown by doubling; only the first count rows are vectors
+        self.buffer = np.zeros((0, dimension), dtype=np.float32)
+        self.count = 0
+        # list l holds list_ids[list_offsets[l]:list_offsets[l + 1]]; vectors
+        # from clustered on are not in any list yet
+        self.centroids = np.zeros((0, dimension), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.list_ids = np.zeros(0, dtype=np.uint32)
+        self.clustered = 0
+        self.metadata: Dict = {}
+        # set while the arrays are views of a memory-mapped file
+        self.mapped = None
+        self.path: Optional[str] = None
+
+    def __getstate__(self) -> Dict:
+        # mapped indexes are re-opened from the same file by worker processes
+        if self.mapped is not None:
+            return {'path': self.path, 'probe_lists': self.probe_lists}
+
+        state = self.__dict__.copy()
+        state['buffer'] = self.vectors
+        return state
+
+    def __setstate__(self, state: Dict):
+        if 'buffer' not in state:
+            loaded = self.load(state['path'])
+            loaded.probe_lists = state['probe_lists']
+            self.__dict__.update(loaded.__dict__)
+        else:
+            self.__dict__.update(state)
+
+    def __copy__(self) -> 'IVFVectorIndex':
+        # adds write past count and training replaces the list arrays, so a
+        # shallow copy keeps reading the rows and lists it was taken with
+        index = object.__new__(IVFVectorIndex)
+        index.__dict__.update(self.__dict__)
+        return index
+
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self.buffer[:self.count]
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    def detach(self):
+        self.buffer = np.array(self.vectors)
+        self.centroids = np.array(self.centroids)
+        self.list_offsets = np.array(self.list_offsets)
+        self.list_ids = np.array(self.list_ids)
+        self.mapped = None
+        self.path = None
+
+        return self
+
+
+    def add(self, vectors: np.ndarray) -> range:
+        """Appends vectors, returning their ids."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if self.mapped is not None:
+            self.detach()
+
+        start = self.count
+        if start + len(vectors) > len(self.buffer):
+            buffer = np.zeros((max(start + len(vectors), 2 * len(self.buffer), 64), self.dimension), dtype=np.float32)
+            buffer[:start] = self.vectors
+            self.buffer = buffer
+        self.buffer[start:start + len(vectors)] = vectors
+        self.count += len(vectors)
+
+        pending = self.count - self.clustered
+        if (not self.clustered and self.count >= self.min_train_size) or \
+            (self.clustered and pending > self.rebuild_ratio * self.clustered):
+            self.train()
+
+        return range(start, self.count)
+
+
+    def assign(self, vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            labels[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+
+        return labels
+
+
+    def train(self, seed: int = 0):
+        """(Re)clusters every vector into about sqrt(count) lists."""
+        vectors = self.vectors
+        list_count = max(1, min(int(math.sqrt(self.count)), 4096))
+        rng = np.random.default_rng(seed)
+        # centroids are fitted on a sample, every vector is then assigned
+        sample_size = min(self.count, list_count * 64)
+        sample = vectors[np.sort(rng.choice(self.count, sample_size, replace=False))]
+        centroids = sample[rng.choice(sample_size, list_count, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = self.assign(sample, centroids)
+            counts = np.bincount(labels, minlength=list_count)
+            filled = counts > 0
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[np.argsort(labels, kind='stable')], (np.cumsum(counts) - counts)[filled])
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.where(norms > 0, norms, 1.0), centroids).astype(np.float32)
+
+        labels = self.assign(vectors, centroids)
+        self.set_lists(centroids, labels, np.arange(self.count, dtype=np.uint32), self.count)
+
+        return self
+
+
+    def set_lists(self, centroids: np.ndarray, labels: np.ndarray, ids: np.ndarray, clustered: int):
+        order = np.argsort(labels, kind='stable')
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=list_offsets[1:])
+
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = ids[order].astype(np.uint32)
+        self.clustered = clustered
+
+
+    def get_candidates(self, query_vector: np.ndarray) -> Optional[np.ndarray]:
+        # None when the whole array is scanned
+        if not self.clustered:
+            return None
+
+        list_count = len(self.centroids)
+        probe_lists = min(self.probe_lists, list_count)
+        centroid_scores = self.centroids @ query_vector
+        probed = np.argpartition(-centroid_scores, probe_lists - 1)[:probe_lists] if probe_lists < list_count \
+            else np.arange(list_count)
+
+        offsets = self.list_offsets
+        return np.concatenate(
+            [self.list_ids[offsets[list_id]:offsets[list_id + 1]] for list_id in probed] +
+            [np.arange(self.clustered, self.count, dtype=np.uint32)]
+        )
+
+
+    def search(self, query_vector: np.ndarray, limit: int, filter_ids: Optional[Iterable[int]] = None,
+        excluded_ids: Optional[Iterable[int]] = None, min_similarity: float = 0.0) -> List[Tuple[int, float]]:
+        """Top (id, cosine similarity) pairs above min_similarity, best first
+        and ties by id; filter_ids are scored exactly, without the lists."""
+        if not self.count or limit <= 0:
+            return []
+
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if filter_ids is not None:
+            candidates = np.fromiter(filter_ids, dtype=np.int64)
+            candidates.sort()
+        else:
+            candidates = self.get_candidates(query_vector)
+
+        if candidates is None:
+            scores = self.vectors @ query_vector
+            ids = np.arange(self.count)
+        else:
+            ids = candidates.astype(np.int64)
+            scores = self.vectors[ids] @ query_vector
+
+        keep = scores > min_similarity
+        if excluded_ids:
+            keep &= ~np.isin(ids, np.fromiter(excluded_ids, dtype=np.int64))
+        ids, scores = ids[keep], scores[keep]
+
+        if len(ids) > limit:
+            # keep every id tied with the limit-th score, then order exactly
+            threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            within = scores >= threshold
+            ids, scores = ids[within], scores[within]
+        order = np.lexsort((ids, -scores))[:limit]
+
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+    def take(self, ids: List[int]) -> 'IVFVectorIndex':
+        """A new index holding the given ascending rows renumbered
+        0..len(ids) - 1, keeping the trained lists."""
+        index = IVFVectorIndex(self.dimension, self.probe_lists, self.min_train_size, self.rebuild_ratio)
+        ids = np.asarray(ids, dtype=np.int64)
+        index.buffer = np.array(self.vectors[ids])
+        index.count = len(ids)
+        index.metadata = dict(self.metadata)
+
+        if self.clustered:
+            new_positions = np.full(self.count, -1, dtype=np.int64)
+            new_positions[ids] = np.arange(len(ids))
+            list_count = len(self.centroids)
+            labels = np.repeat(np.arange(list_count), np.diff(self.list_offsets))
+            list_positions = new_positions[self.list_ids.astype(np.int64)]
+            kept = list_positions >= 0
+            # ids are ascending, so kept pending rows still come after the
+            # clustered ones
+            index.set_lists(np.array(self.centroids), labels[kept], list_positions[kept], int(kept.sum()))
+        if not index.clustered and index.count >= index.min_train_size:
+            index.train()
+
+        return index
+
+
+    def save(self, path: str, metadata: Optional[Dict] = None):
+        if metadata is not None:
+            self.metadata = metadata
+
+        write_sections(path, VECTOR_INDEX_MAGIC, VECTOR_INDEX_VERSION, {
+            "dimension": self.dimension,
+            "count": self.count,
+            "clustered": self.clustered,
+            "list_count": len(self.centroids),
+            "metadata": self.metadata
+        }, [
+            ("vectors", array('f', self.vectors.tobytes())),
+            ("centroids", array('f', np.ascontiguousarray(self.centroids, dtype=np.float32).tobytes())),
+            ("list_offsets", array('q', self.list_offsets.astype(np.int64).tobytes())),
+            ("list_ids", array('I', self.list_ids.astype(np.uint32).tobytes()))
+        ])
+
+        return self
+
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFVectorIndex':
+        """Opens a saved index as zero-copy views of the mapped file; it is
+        copied into memory on the first add."""
+        mapped, header, section = map_sections(path, VECTOR_INDEX_MAGIC, VECTOR_INDEX_VERSION, "vector index")
+
+        index = cls(header["dimension"])
+        index.count = header["count"]
+        index.buffer = np.frombuffer(section("vectors"), dtype=np.float32).reshape(index.count, index.dimension)
+        index.centroids = np.frombuffer(section("centroids"), dtype=np.float32).reshape(header["list_count"], index.dimension)
+        index.list_offsets = np.frombuffer(section("list_offsets"), dtype=np.int64)
+        index.list_ids = np.frombuffer(section("list_ids"), dtype=np.uint32)
+        index.clustered = header["clustered"]
+        index.metadata = header["metadata"]
+        index.mapped = mapped
+        index.path = path
+
+        return index